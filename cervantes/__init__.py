@@ -23,6 +23,33 @@ This is the main package of the application.
         This module defines the 'translations' feature of the app as a
         Flask blueprint. Defines the routes prefixed with '/translations'.
 
+    poller.py
+        This module defines the background poller that refreshes the
+        pending translations out of band, as the 'poll-translations'
+        Flask CLI command.
+
+    migrations.py
+        This module defines the database migrations, applied with the
+        'upgrade-db' Flask CLI command.
+
+    cache.py
+        This module defines the caches used for the rendered rows and
+        pages of the translation history: in process, or shared by the
+        processes through files or a SQLite database.
+
+    events.py
+        This module defines the translation events, published on
+        commit to the Server-Sent Events stream of the translations.
+
+    memory.py
+        This module defines the fuzzy translation memory, suggesting
+        completed translations of texts similar to a new one.
+
+    singleflight.py
+        This module coalesces concurrent calls doing the same work,
+        across threads and, with PostgreSQL advisory locks, across
+        processes.
+
     unbabelapi.py
         This module defines the helper methods that make calls to the
         Unbabale API.
@@ -43,6 +70,9 @@ def create_app(testing=False):
     application template, and registers Flask blueprints to namespace
     and handle other application features.
 
+    The database schema is not created here; it is created and kept up
+    to date by the migrations ('flask upgrade-db').
+
     testing : bool = False
         If set to False (default), configure the Flask instance to use
         the configuration scheme for production. This will set the
@@ -61,8 +91,6 @@ def create_app(testing=False):
 
     # Bind the SQLAlchemy database with the app
     db.init_app(app)
-    with app.app_context():
-        db.create_all()
 
     # Root level routes
     @app.route('/')
@@ -73,4 +101,10 @@ def create_app(testing=False):
     import cervantes.translations
     app.register_blueprint(cervantes.translations.bp)
 
+    # CLI commands
+    import cervantes.poller
+    app.cli.add_command(cervantes.poller.poll_command)
+    import cervantes.migrations
+    app.cli.add_command(cervantes.migrations.upgrade_command)
+
     return app
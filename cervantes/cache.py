@@ -0,0 +1,504 @@
+"""
+This module defines the caches used by the app. They share the same
+interface (get, set, clear, stats), so the backend of a cache is a
+matter of configuration (see make_cache).
+
+    class LRUCache
+        Bounded, thread-safe mapping that evicts its least recently used
+        entries, and counts its hits and misses.
+
+    class FileSystemCache
+        Cache stored as files in a directory, shared by every process
+        using the same directory.
+
+    class SQLiteCache
+        Cache stored in a SQLite database file: a local key-value store
+        shared by every process using the same file.
+
+    class HitCounter
+        Thread-safe counters of the hits and misses of a lookup that
+        isn't a cache of its own (e.g. the translation memory).
+
+    function make_cache
+        Create a cache from its backend name.
+"""
+
+
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+
+
+# Names of the cache backends, see make_cache
+BACKENDS = ('memory', 'filesystem', 'sqlite')
+
+
+class LRUCache():
+    """
+    Bounded mapping evicting its least recently used entries. Every
+    lookup counts as a hit or a miss, to help sizing it. Thread-safe.
+
+    Values are shared by every caller, so they should be immutable (or
+    at least never mutated).
+
+        maxsize : int = 1000
+            Maximum number of entries. Can be changed at any time; the
+            extra entries go on the next insertion.
+
+        method get
+            Return the value of a key, None if it isn't cached.
+
+        method set
+            Cache the value of a key.
+
+        method clear
+            Drop every entry and reset the counters.
+
+        method stats
+            Return the counters and the size of the cache.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Return the value of a key, and mark it as the most recently
+        used.
+
+            key : hashable
+
+            Returns : any
+                The cached value, None if the key isn't cached.
+        """
+
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        return value
+
+    def set(self, key, value):
+        """
+        Cache the value of a key, evicting the least recently used
+        entries beyond maxsize.
+
+            key : hashable
+            value : any
+                Anything but None.
+        """
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(0, self.maxsize):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return the counters and the size of the cache.
+
+            Returns : dict
+                hits, misses, hit_rate (None before any lookup), size
+                and maxsize.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+class FileSystemCache():
+    """
+    Cache stored as files in a directory, one per key. Processes using
+    the same directory share the cache. Values are pickled, and written
+    atomically: a reader never sees a partial value. Beyond maxsize,
+    the oldest entries (by time of writing) are deleted.
+
+    Hits and misses are counted per process.
+
+        directory : str
+            Directory of the cache files. Created if needed. Don't put
+            anything else in it.
+        maxsize : int = 1000
+            Maximum number of entries.
+
+        method get
+            Return the value of a key, None if it isn't cached.
+
+        method set
+            Cache the value of a key.
+
+        method clear
+            Delete every entry and reset the counters.
+
+        method stats
+            Return the counters and the size of the cache.
+    """
+
+    suffix = '.cache'
+
+    def __init__(self, directory, maxsize=1000):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._list_files())
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def _list_files(self):
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory) if name.endswith(self.suffix)]
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """
+        Return the value of a key.
+
+            key : str
+
+            Returns : any
+                The cached value, None if the key isn't cached.
+        """
+
+        try:
+            with open(self._path(key), 'rb') as cache_file:
+                value = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            value = None
+
+        self._count(value is not None)
+        return value
+
+    def set(self, key, value):
+        """
+        Cache the value of a key, deleting the oldest entries beyond
+        maxsize.
+
+            key : str
+            value : any
+                Anything picklable but None.
+        """
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as cache_file:
+                pickle.dump(value, cache_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        paths = self._list_files()
+        if len(paths) > self.maxsize:
+            paths.sort(key=_modification_time)
+            for path in paths[:len(paths) - max(0, self.maxsize)]:
+                _remove(path)
+
+    def clear(self):
+        """Delete every entry and reset the counters."""
+
+        for path in self._list_files():
+            _remove(path)
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return the counters and the size of the cache.
+
+            Returns : dict
+                hits, misses, hit_rate (None before any lookup), size
+                and maxsize.
+        """
+
+        return _stats(self)
+
+
+class SQLiteCache():
+    """
+    Cache stored in a SQLite database file, as a key-value table: a
+    stand-in for a key-value server (e.g. memcached, Redis) on a single
+    host. Processes using the same file share the cache. Values are
+    pickled. Beyond maxsize, the oldest entries (by time of writing)
+    are deleted.
+
+    Each thread uses its own connection. Hits and misses are counted
+    per process.
+
+        path : str
+            Path of the database file. Created if needed.
+        maxsize : int = 1000
+            Maximum number of entries.
+
+        method get
+            Return the value of a key, None if it isn't cached.
+
+        method set
+            Cache the value of a key.
+
+        method clear
+            Delete every entry and reset the counters.
+
+        method stats
+            Return the counters and the size of the cache.
+    """
+
+    def __init__(self, path, maxsize=1000):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._execute('PRAGMA journal_mode=WAL')
+        self._execute('CREATE TABLE IF NOT EXISTS cache '
+                      '(key TEXT PRIMARY KEY, value BLOB NOT NULL)')
+
+    def __len__(self):
+        return self._execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def _execute(self, statement, parameters=()):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit, each statement is its own transaction
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.connection = connection
+
+        return connection.execute(statement, parameters)
+
+    def get(self, key):
+        """
+        Return the value of a key.
+
+            key : str
+
+            Returns : any
+                The cached value, None if the key isn't cached.
+        """
+
+        row = self._execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        value = pickle.loads(row[0]) if row is not None else None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, key, value):
+        """
+        Cache the value of a key, deleting the oldest entries beyond
+        maxsize.
+
+            key : str
+            value : any
+                Anything picklable but None.
+        """
+
+        # Replacing a row gives it a new rowid: rowids follow the writes
+        self._execute('INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)',
+                      (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        self._execute('DELETE FROM cache WHERE rowid NOT IN '
+                      '(SELECT rowid FROM cache ORDER BY rowid DESC LIMIT ?)',
+                      (max(0, self.maxsize),))
+
+    def clear(self):
+        """Delete every entry and reset the counters."""
+
+        self._execute('DELETE FROM cache')
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return the counters and the size of the cache.
+
+            Returns : dict
+                hits, misses, hit_rate (None before any lookup), size
+                and maxsize.
+        """
+
+        return _stats(self)
+
+
+class HitCounter():
+    """
+    Counts the hits and misses of a lookup, for lookups that aren't
+    made through one of the caches (e.g. a query of the database).
+    Thread-safe.
+
+        method count
+            Count a hit or a miss.
+
+        method clear
+            Reset the counters.
+
+        method stats
+            Return the counters.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def count(self, hit, times=1):
+        """
+        Count hits or misses.
+
+            hit : bool
+            times : int = 1
+        """
+
+        with self._lock:
+            if hit:
+                self.hits += times
+            else:
+                self.misses += times
+
+    def clear(self):
+        """Reset the counters."""
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return the counters.
+
+            Returns : dict
+                hits, misses and hit_rate (None before any lookup).
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+def _modification_time(path):
+    """Return the modification time of a file, 0 if it is gone."""
+
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    """Delete a file, unless another process already did."""
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _stats(cache):
+    """Return the stats of a cache counting its hits and misses."""
+
+    size = len(cache)
+    with cache._lock:
+        lookups = cache.hits + cache.misses
+        return {
+            'hits': cache.hits,
+            'misses': cache.misses,
+            'hit_rate': cache.hits / lookups if lookups else None,
+            'size': size,
+            'maxsize': cache.maxsize,
+        }
+
+
+def make_cache(backend, maxsize=1000, path=None):
+    """
+    Create a cache from the name of its backend.
+
+        backend : str
+            'memory' for a LRUCache of the process, 'filesystem' for a
+            FileSystemCache or 'sqlite' for a SQLiteCache, shared by
+            the processes using the same path. None for no cache.
+        maxsize : int = 1000
+            Maximum number of entries.
+        path : str = None
+            Directory of the FileSystemCache, or database file of the
+            SQLiteCache. Required by these backends.
+
+        Returns : LRUCache | FileSystemCache | SQLiteCache
+            None if backend is None.
+
+        Raises
+            ValueError
+                When the backend is unknown, or its path is missing.
+    """
+
+    if backend is None:
+        return None
+
+    if backend not in BACKENDS:
+        raise ValueError('Unknown cache backend {!r}, expected one of {}'.format(
+            backend, ', '.join(BACKENDS)))
+
+    if backend == 'memory':
+        return LRUCache(maxsize)
+
+    if not path:
+        raise ValueError('The {} cache backend needs a path'.format(backend))
+
+    if backend == 'filesystem':
+        return FileSystemCache(path, maxsize)
+
+    return SQLiteCache(path, maxsize)
@@ -7,6 +7,18 @@ for configuration.
         Raised when the configuration files are not accessible or hold
         invalid YAML syntax.
 
+    class CachedYAMLFile
+        Parses a YAML file once and keeps the result, re-parsing it only
+        when the file on disk is replaced or modified.
+
+    function cached_yaml_file
+        Return the process-wide CachedYAMLFile for a path, so every
+        caller reading the same file shares one parse.
+
+    function reload_config_files
+        Explicit reload hook. Drops every cached parse, so the next
+        load reads the files from disk again.
+
     function _load_config
         Private function that loads and parses the YAML configuration
         file that brings in common config values.
@@ -19,6 +31,10 @@ for configuration.
 """
 
 
+import os
+import threading
+from types import MappingProxyType
+
 import yaml
 
 
@@ -31,6 +47,135 @@ class ConfigError(Exception):
     pass
 
 
+class CachedYAMLFile():
+    """
+    Parses a YAML file once and keeps the result. Each load only stats
+    the file; it is re-read and re-parsed when its inode, mtime or size
+    changed since the last parse (i.e. the file was edited or replaced),
+    or after an explicit reload.
+
+        path : str
+            Path to the YAML file.
+        build : callable = None
+            Called with the parsed YAML document; its return value is
+            what gets cached and handed back by load. Expected to build
+            an immutable object, since it is shared by every caller.
+            By default the parsed document is frozen into a read-only
+            mapping.
+
+        method load
+            Return the cached value, parsing the file first if needed.
+
+        method reload
+            Drop the cached value so the next load parses the file again.
+    """
+
+    def __init__(self, path, build=None):
+        self.path = path
+        self.build = build or MappingProxyType
+        self._signature = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Return the cached value, parsing the file first if it changed
+        since the last parse.
+
+            Returns : any
+                The value built from the parsed YAML document.
+
+            Raises
+                FileNotFoundError
+                    When path points to a nonexistent file.
+                yaml.YAMLError
+                    When the file being read isn't a valid YAML file or
+                    has syntax errors.
+                Exception
+                    Whatever build raises for an invalid document. The
+                    file is parsed again on the next load.
+        """
+
+        stat = os.stat(self.path)
+        signature = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        if signature == self._signature:
+            return self._value
+
+        with self._lock:
+            # Another thread may have parsed it while we waited
+            if signature != self._signature:
+                with open(self.path, 'r') as yaml_file:
+                    value = self.build(yaml.safe_load(yaml_file))
+                self._value = value
+                self._signature = signature
+
+            return self._value
+
+    def reload(self):
+        """Drop the cached value so the next load parses the file again."""
+        with self._lock:
+            self._signature = None
+            self._value = None
+
+
+_yaml_files = {}
+_yaml_files_lock = threading.Lock()
+
+
+def cached_yaml_file(path, build=None):
+    """
+    Return the process-wide CachedYAMLFile for a path and build callable,
+    creating it on first use.
+
+        path : str
+            Path to the YAML file.
+        build : callable = None
+            See CachedYAMLFile.
+
+        Returns : CachedYAMLFile
+    """
+
+    key = (os.path.abspath(path), build)
+
+    with _yaml_files_lock:
+        if key not in _yaml_files:
+            _yaml_files[key] = CachedYAMLFile(path, build)
+
+        return _yaml_files[key]
+
+
+def reload_config_files():
+    """
+    Drop every cached YAML parse, so the next load of each config file
+    reads it from disk again.
+    """
+
+    with _yaml_files_lock:
+        for yaml_file in _yaml_files.values():
+            yaml_file.reload()
+
+
+def _build_cervantes_config(document):
+    """
+    Pick the production section out of the cervantes config document.
+
+        document : dict
+            Parsed cervantes config file.
+
+        Returns : MappingProxyType
+            Read-only mapping of the production config keys.
+
+        Raises
+            KeyError
+                When the production section is missing.
+            TypeError
+                When the document is not a mapping.
+    """
+
+    return MappingProxyType(dict(document['production']))
+
+
 def _load_config(config_instance, testing=False, path='cervantes.yaml'):
     """
     Returns the configuration values for Flask application instances.
@@ -58,11 +203,38 @@ def _load_config(config_instance, testing=False, path='cervantes.yaml'):
     """
 
     try:
-        with open(path, 'r') as config_file:
-            cervantes_config = yaml.safe_load(config_file)['production']
-            config_instance.SECRET_KEY = cervantes_config['SECRET_KEY']
-            config_instance.SQLALCHEMY_DATABASE_URI = cervantes_config['SQLALCHEMY_DATABASE_URI']
-    except (FileNotFoundError, yaml.YAMLError, KeyError) as exc:
+        # Parsed once per process, and again only if the file changes
+        cervantes_config = cached_yaml_file(path, _build_cervantes_config).load()
+        config_instance.SECRET_KEY = cervantes_config['SECRET_KEY']
+        config_instance.SQLALCHEMY_DATABASE_URI = cervantes_config['SQLALCHEMY_DATABASE_URI']
+        # Optional keys
+        config_instance.TRANSLATIONS_REFRESH_WORKERS = cervantes_config.get(
+            'TRANSLATIONS_REFRESH_WORKERS', 8)
+        config_instance.TRANSLATIONS_REFRESH_BUDGET = cervantes_config.get(
+            'TRANSLATIONS_REFRESH_BUDGET', 5)
+        config_instance.TRANSLATIONS_SUBMIT_WORKERS = cervantes_config.get(
+            'TRANSLATIONS_SUBMIT_WORKERS', 4)
+        config_instance.TRANSLATIONS_PAGE_SIZE = cervantes_config.get(
+            'TRANSLATIONS_PAGE_SIZE', 100)
+        config_instance.TRANSLATIONS_EVENTS_BACKEND = cervantes_config.get(
+            'TRANSLATIONS_EVENTS_BACKEND', 'local')
+        config_instance.TRANSLATIONS_STREAM_HEARTBEAT = cervantes_config.get(
+            'TRANSLATIONS_STREAM_HEARTBEAT', 15)
+        config_instance.TRANSLATIONS_STREAM_TIMEOUT = cervantes_config.get(
+            'TRANSLATIONS_STREAM_TIMEOUT', 300)
+        config_instance.TRANSLATIONS_STREAM_MAX_OPEN = cervantes_config.get(
+            'TRANSLATIONS_STREAM_MAX_OPEN', 50)
+        config_instance.TRANSLATIONS_ROW_CACHE_SIZE = cervantes_config.get(
+            'TRANSLATIONS_ROW_CACHE_SIZE', 10000)
+        config_instance.TRANSLATIONS_LISTING_CACHE = cervantes_config.get(
+            'TRANSLATIONS_LISTING_CACHE', 'memory')
+        config_instance.TRANSLATIONS_LISTING_CACHE_PATH = cervantes_config.get(
+            'TRANSLATIONS_LISTING_CACHE_PATH')
+        config_instance.TRANSLATIONS_LISTING_CACHE_SIZE = cervantes_config.get(
+            'TRANSLATIONS_LISTING_CACHE_SIZE', 100)
+        config_instance.TRANSLATIONS_SUGGEST_SYNC_INTERVAL = cervantes_config.get(
+            'TRANSLATIONS_SUGGEST_SYNC_INTERVAL', 30)
+    except (FileNotFoundError, yaml.YAMLError, KeyError, TypeError) as exc:
         raise ConfigError('Cervantes Config File Error: {}'.format(exc))
 
 
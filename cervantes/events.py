@@ -0,0 +1,304 @@
+"""
+This module defines the translation events: notices that a translation
+was created or that its status changed, pushed to the browsers through
+the Server-Sent Events stream of cervantes.translations.
+
+Events are recorded on the database session by the code making the
+change, and only published once the session commits (never for a
+rollback). They are hints: a subscriber that misses some (e.g. because
+it was disconnected or too slow) catches up by syncing the changes of
+the listing.
+
+Where the events are published depends on the TRANSLATIONS_EVENTS_BACKEND
+app config:
+
+    'local' (default)
+        To the subscribers of the same process only, after the commit.
+    'postgresql'
+        To the subscribers of every process sharing the database, with
+        PostgreSQL's NOTIFY, sent within the committing transaction (so
+        the database delivers them on commit only). Each process listens
+        for them on a dedicated connection, on a background thread.
+
+    CHANNEL : str
+        Name of the PostgreSQL notification channel.
+
+    class Subscription
+        Bounded queue of the events published since subscribing.
+
+    class Broker
+        In-process publish/subscribe hub of the events.
+
+    broker : Broker
+        The process-wide Broker.
+
+    class PostgresListener
+        Background thread relaying the PostgreSQL notifications to a
+        Broker.
+
+    function record
+        Record an event on a session, to be published on commit.
+
+    function start_listener
+        Start relaying the events of other processes, if the app
+        publishes them across processes.
+"""
+
+
+import json
+import queue
+import select
+import threading
+import time
+
+from flask import current_app, has_app_context
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+
+CHANNEL = 'translations'
+
+# Key of the recorded events in Session.info
+_SESSION_KEY = 'translation_events'
+
+
+class Subscription():
+    """
+    Events published since subscribing, waiting to be consumed. The
+    queue is bounded: when the subscriber falls behind, new events are
+    dropped (it catches up with a sync anyway).
+
+        maxsize : int = 100
+            Maximum number of events waiting.
+
+        method get
+            Return the next event, waiting for it up to a timeout.
+    """
+
+    def __init__(self, maxsize=100):
+        self._queue = queue.Queue(maxsize)
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        """
+        Return the next event.
+
+            timeout : float = None
+                Seconds to wait for an event. Waits forever if None.
+
+            Returns : dict
+                The event, None if none came in time.
+        """
+
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker():
+    """
+    In-process publish/subscribe hub of the translation events.
+    Thread-safe.
+
+        method subscribe
+            Return a new Subscription to the events.
+
+        method unsubscribe
+            Stop delivering events to a Subscription.
+
+        method publish
+            Deliver an event to every Subscription.
+
+        property subscribers
+            Number of subscriptions.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, maxsize=100):
+        """
+        Return a new Subscription to the events.
+
+            maxsize : int = 100
+                See Subscription.
+
+            Returns : Subscription
+        """
+
+        subscription = Subscription(maxsize)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering events to a Subscription."""
+
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """
+        Deliver an event to every Subscription, without ever blocking.
+
+            event : dict
+                JSON serializable event.
+        """
+
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            subscription._put(event)
+
+
+broker = Broker()
+
+
+class PostgresListener(threading.Thread):
+    """
+    Background thread listening to the PostgreSQL notifications of the
+    translation events, and publishing them to a Broker. It holds a
+    connection of the engine's pool for as long as it runs, and
+    reconnects when the connection is lost.
+
+        engine : sqlalchemy.engine.Engine
+            Engine of a PostgreSQL database (psycopg2).
+        broker : Broker
+            Broker to publish the events to.
+        channel : str = CHANNEL
+            Notification channel to listen to.
+        reconnect_delay : float = 5
+            Seconds to wait before reconnecting.
+    """
+
+    def __init__(self, engine, broker, channel=CHANNEL, reconnect_delay=5):
+        super().__init__(name='translation-events-listener', daemon=True)
+        self.engine = engine
+        self.broker = broker
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                # Keep relaying whatever happens, subscribers catch up
+                time.sleep(self.reconnect_delay)
+
+    def _listen(self):
+        connection = self.engine.raw_connection()
+        try:
+            connection.set_session(autocommit=True)
+            cursor = connection.cursor()
+            cursor.execute('LISTEN {}'.format(self.channel))
+
+            while True:
+                # Wake up now and then, to notice dead connections
+                if select.select([connection], [], [], 60) == ([], [], []):
+                    cursor.execute('SELECT 1')
+                    continue
+
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    self.broker.publish(json.loads(notify.payload))
+        finally:
+            connection.invalidate()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _get_backend():
+    """Return the events backend of the current app, if any."""
+
+    if not has_app_context():
+        return 'local'
+
+    return current_app.config.get('TRANSLATIONS_EVENTS_BACKEND', 'local')
+
+
+def record(session, event):
+    """
+    Record an event on a session. It is published once the session
+    commits, and discarded if it rolls back.
+
+        session : sqlalchemy.orm.Session
+        event : dict
+            JSON serializable event. Keep it small: PostgreSQL
+            notifications are limited to 8000 bytes.
+    """
+
+    # Make sure a transaction is going on, so that its rollback is seen
+    session.connection()
+    session.info.setdefault(_SESSION_KEY, []).append(event)
+
+
+def start_listener(engine):
+    """
+    Start relaying the events published by other processes to the
+    local broker, if the app's events backend is 'postgresql'. Only the
+    first call starts the listener.
+
+        engine : sqlalchemy.engine.Engine
+            Engine of the app's database.
+    """
+
+    global _listener
+
+    if _get_backend() != 'postgresql':
+        return
+
+    with _listener_lock:
+        if _listener is None:
+            _listener = PostgresListener(engine, broker)
+            _listener.start()
+
+
+@sa.event.listens_for(Session, 'before_commit')
+def _notify_events(session):
+    """Send the recorded events with NOTIFY, within the transaction."""
+
+    events = session.info.get(_SESSION_KEY)
+    if not events or _get_backend() != 'postgresql':
+        return
+
+    for event in events:
+        session.execute(sa.text('SELECT pg_notify(:channel, :payload)'),
+                        {'channel': CHANNEL, 'payload': json.dumps(event)})
+
+
+@sa.event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    """Publish the recorded events to the local broker."""
+
+    events = session.info.pop(_SESSION_KEY, None)
+    if not events or _get_backend() == 'postgresql':
+        # Relayed by the listener, like the events of other processes
+        return
+
+    for event in events:
+        broker.publish(event)
+
+
+@sa.event.listens_for(Session, 'after_soft_rollback')
+def _discard_events(session, previous_transaction):
+    """Forget the recorded events of a rolled back transaction."""
+
+    # Rolling back a savepoint keeps the rest of the transaction
+    if previous_transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,415 @@
+"""
+This module defines the fuzzy translation memory: an in-process index
+of the completed translations, to find the ones whose text is similar
+to a new one (e.g. differing in whitespace, punctuation or a word)
+before asking Unbabel for it.
+
+Texts are normalized (case folded, punctuation dropped, whitespace
+collapsed) and cut into character n-grams (shingles). Each text gets a
+MinHash signature of its shingles (one permutation hashing, in a single
+pass over the shingles), and the signature is cut into bands indexed
+by value (locality-sensitive hashing): similar texts likely share a
+band, unrelated ones hardly ever do. A lookup only compares the
+text to the few translations sharing a band with it, ranked by the
+Jaccard similarity of their shingles.
+
+    function normalize
+        Normalize a text before cutting it into shingles.
+
+    function shingles
+        Return the hashed character n-grams of a text.
+
+    function minhash
+        Return the MinHash signature of a set of shingles.
+
+    class TranslationMemory
+        Index of the completed translations, by language pair, kept in
+        sync with the database.
+
+    class MemorySync
+        Background thread syncing a TranslationMemory with the
+        database as translations complete.
+"""
+
+
+from array import array
+import re
+import threading
+import time
+import unicodedata
+
+from cervantes.models import Translation, TranslationsVersion
+
+
+# Size of the character n-grams
+NGRAM_SIZE = 3
+
+# Length of the MinHash signatures, cut into bands of BAND_SIZE hashes.
+# Texts with a Jaccard similarity of 0.5 share a band about 2 times out
+# of 3, of 0.7 about every time.
+SIGNATURE_SIZE = 64
+BAND_SIZE = 4
+
+# Default lowest similarity of a suggestion
+DEFAULT_MIN_SIMILARITY = 0.5
+
+# Default seconds between two syncs, at most (see MemorySync)
+DEFAULT_SYNC_INTERVAL = 30
+
+# Punctuation and symbols, ignored by the lookups
+_PUNCTUATION = re.compile(r'[^\w\s]|_')
+
+# Shingle hashes are 64 bit: the low bits pick their bin of the
+# signature, the others are compared within the bin. They come from
+# Python's string hash, so they differ from one process to the next:
+# neither they nor the signatures ever leave the process.
+_HASH_MASK = (1 << 64) - 1
+_VALUE_BITS = 64 - (SIGNATURE_SIZE - 1).bit_length()
+
+
+def normalize(text):
+    """
+    Normalize a text: Unicode compatibility normalization, case
+    folding, punctuation (and symbols) replaced by spaces, and
+    whitespace collapsed.
+
+        text : str
+
+        Returns : str
+    """
+
+    text = _PUNCTUATION.sub(' ', unicodedata.normalize('NFKC', text).casefold())
+
+    return ' '.join(text.split())
+
+
+def shingles(text):
+    """
+    Return the character n-grams (NGRAM_SIZE) of a normalized text, as
+    64 bit hashes. Texts shorter than NGRAM_SIZE are a single shingle.
+
+        text : str
+
+        Returns : set<int>
+            Empty if nothing is left of the text once normalized.
+    """
+
+    text = normalize(text)
+    grams = {text[i:i + NGRAM_SIZE] for i in range(max(1, len(text) - NGRAM_SIZE + 1))}
+
+    return {hash(gram) & _HASH_MASK for gram in grams if gram}
+
+
+def minhash(hashes):
+    """
+    Return the MinHash signature of a set of shingles, with one
+    permutation hashing: the hashes are spread over SIGNATURE_SIZE
+    bins, and each bin keeps the smallest of its hashes. Empty bins
+    (short texts) borrow the value of the next bin that isn't empty,
+    tagged with the distance to it, so that two signatures agree on
+    about as many bins as their sets have shingles in common (relative
+    to their union).
+
+        hashes : set<int>
+            Shingles, as returned by shingles. Not empty.
+
+        Returns : tuple<int>
+            SIGNATURE_SIZE hashes.
+    """
+
+    bins = [None] * SIGNATURE_SIZE
+    for shingle in hashes:
+        index, value = shingle % SIGNATURE_SIZE, shingle // SIGNATURE_SIZE
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    signature = list(bins)
+    for index, value in enumerate(bins):
+        if value is None:
+            distance = 1
+            while bins[(index + distance) % SIGNATURE_SIZE] is None:
+                distance += 1
+            signature[index] = (distance << _VALUE_BITS) | \
+                bins[(index + distance) % SIGNATURE_SIZE]
+
+    return tuple(signature)
+
+
+def _band_keys(signature):
+    """Return the bucket keys of the bands of a signature."""
+
+    return [hash((start, signature[start:start + BAND_SIZE]))
+            for start in range(0, SIGNATURE_SIZE, BAND_SIZE)]
+
+
+def _pair_key(source_language, target_language):
+    """Return the key of a language pair, normalized like content_hash."""
+
+    return source_language.strip().lower(), target_language.strip().lower()
+
+
+class _PairIndex():
+    """Translations of a language pair, and the buckets of their bands."""
+
+    def __init__(self):
+        # UID -> (text, translated_text, shingles)
+        self.entries = {}
+        # Band key -> UIDs
+        self.buckets = {}
+
+
+class TranslationMemory():
+    """
+    Index of the completed translations, by language pair, to suggest
+    the ones whose text is similar to a new one. Thread-safe.
+
+    Completed translations never change, so the index only grows: sync
+    adds the translations completed since the version of the listing
+    (see TranslationsVersion) it last synced to, all of them the first
+    time. Each process holds its own index, about a kilobyte per
+    translation (plus its texts).
+
+        method add
+            Index a completed translation.
+
+        method suggest
+            Return the translations whose text is the most similar to a
+            text.
+
+        method sync
+            Index the translations completed since the last sync.
+
+        method clear
+            Drop every translation and reset the counters.
+
+        method stats
+            Return the size of the index and the counters.
+    """
+
+    def __init__(self):
+        # Version of the listing synced to, None before the first sync
+        self.version = None
+        self.lookups = 0
+        self.hits = 0
+        self._pairs = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(pair.entries) for pair in self._pairs.values())
+
+    def add(self, uid, source_language, target_language, text, translated_text):
+        """
+        Index a completed translation. Translations already indexed
+        (by UID) are left as they are.
+
+            uid : str
+            source_language : str
+            target_language : str
+            text : str
+            translated_text : str
+
+            Returns : bool
+                False if the translation was already indexed, or has no
+                text left once normalized.
+        """
+
+        hashes = shingles(text)
+        if not hashes:
+            return False
+
+        band_keys = _band_keys(minhash(hashes))
+
+        with self._lock:
+            pair = self._pairs.setdefault(_pair_key(source_language, target_language),
+                                          _PairIndex())
+            if uid in pair.entries:
+                return False
+
+            pair.entries[uid] = (text, translated_text, array('Q', hashes))
+            for key in band_keys:
+                pair.buckets.setdefault(key, []).append(uid)
+
+        return True
+
+    def suggest(self, source_language, target_language, text, limit=5,
+                min_similarity=DEFAULT_MIN_SIMILARITY):
+        """
+        Return the indexed translations of a language pair whose text
+        is the most similar to a text, by Jaccard similarity of their
+        shingles. Only the translations sharing a band with the text
+        are compared, so the odd similar one may be missed (less likely
+        the more similar it is).
+
+            source_language : str
+            target_language : str
+            text : str
+            limit : int = 5
+                Maximum number of suggestions.
+            min_similarity : float = DEFAULT_MIN_SIMILARITY
+                Lowest similarity of a suggestion, between 0 and 1.
+
+            Returns : list<dict>
+                {uid, text, translated_text, similarity} of each
+                suggestion, the most similar first.
+        """
+
+        hashes = shingles(text)
+        suggestions = []
+
+        if hashes:
+            band_keys = _band_keys(minhash(hashes))
+
+            with self._lock:
+                pair = self._pairs.get(_pair_key(source_language, target_language))
+                candidates = set() if pair is None else {
+                    uid for key in band_keys for uid in pair.buckets.get(key, ())}
+
+                for uid in candidates:
+                    candidate_text, translated_text, candidate_hashes = pair.entries[uid]
+                    shared = len(hashes.intersection(candidate_hashes))
+                    similarity = shared / (len(hashes) + len(candidate_hashes) - shared)
+                    if similarity >= min_similarity:
+                        suggestions.append({
+                            'uid': uid,
+                            'text': candidate_text,
+                            'translated_text': translated_text,
+                            'similarity': round(similarity, 3),
+                        })
+
+        suggestions.sort(key=lambda suggestion: (-suggestion['similarity'], suggestion['uid']))
+        suggestions = suggestions[:limit]
+
+        with self._lock:
+            self.lookups += 1
+            if suggestions:
+                self.hits += 1
+
+        return suggestions
+
+    def sync(self):
+        """
+        Index the translations completed since the last sync (all of
+        them on the first one), unless the listing didn't change since.
+        Reads the database through the session of the app.
+
+            Returns : int
+                Number of translations indexed.
+        """
+
+        with self._sync_lock:
+            # Read first: the translations completed meanwhile are
+            # indexed now or on the next sync
+            version, _ = TranslationsVersion.current()
+            if version == self.version:
+                return 0
+
+            query = Translation.query.with_entities(
+                Translation.uid, Translation.source_language, Translation.target_language,
+                Translation.text, Translation.translated_text,
+            ).filter(
+                Translation.status == 'completed',
+                Translation.translated_text.isnot(None),
+            )
+            if self.version is not None:
+                query = query.filter(Translation.change_seq > self.version)
+
+            added = sum(1 for row in query if self.add(*row))
+            self.version = version
+
+        return added
+
+    def clear(self):
+        """Drop every translation and reset the counters."""
+
+        with self._sync_lock, self._lock:
+            self._pairs.clear()
+            self.version = None
+            self.lookups = 0
+            self.hits = 0
+
+    def stats(self):
+        """
+        Return the size of the index and the counters.
+
+            Returns : dict
+                size (translations indexed), pairs (language pairs),
+                version (synced to), lookups, hits (lookups with a
+                suggestion) and hit_rate (None before any lookup).
+        """
+
+        size = len(self)
+        with self._lock:
+            return {
+                'size': size,
+                'pairs': len(self._pairs),
+                'version': self.version,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else None,
+            }
+
+
+class MemorySync(threading.Thread):
+    """
+    Background thread keeping a TranslationMemory in sync with the
+    database, so that lookups never wait for it: it indexes every
+    completed translation first, then the ones completed since, as
+    soon as a translation event tells one completed (see
+    cervantes.events), and every interval seconds anyway (for the
+    processes whose events aren't relayed here).
+
+        app : flask.Flask
+            App whose database is synced from.
+        memory : TranslationMemory
+        broker : cervantes.events.Broker
+            Broker of the translation events.
+        interval : float = DEFAULT_SYNC_INTERVAL
+            Seconds between two syncs, at most.
+
+        method stop
+            Stop syncing, within a second once the sync in progress is
+            done.
+    """
+
+    def __init__(self, app, memory, broker, interval=DEFAULT_SYNC_INTERVAL):
+        super().__init__(name='translation-memory-sync', daemon=True)
+        self.app = app
+        self.memory = memory
+        self.broker = broker
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._subscription = broker.subscribe()
+
+    def stop(self):
+        """Stop syncing, within a second once the sync in progress is done."""
+
+        self._stopped.set()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    with self.app.app_context():
+                        self.memory.sync()
+                except Exception:
+                    # Keep syncing whatever happens, the next sync catches up
+                    self.app.logger.exception('Translation memory sync failed')
+
+                self._wait_for_completion()
+        finally:
+            self.broker.unsubscribe(self._subscription)
+
+    def _wait_for_completion(self):
+        """Wait for a translation to complete, interval seconds at most."""
+
+        deadline = time.monotonic() + self.interval
+        while not self._stopped.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Wake up every second to notice stop
+            event = self._subscription.get(timeout=min(remaining, 1))
+            if event is not None and event.get('status') == 'completed':
+                return
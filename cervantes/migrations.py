@@ -0,0 +1,279 @@
+"""
+This module defines the database migrations. They bring an existing
+database - whether it was created by an older version of the app or
+not at all - up to the schema of cervantes.models, and record which
+migrations were applied in a 'schema_version' table.
+
+Every migration checks the schema before changing it, so databases
+created with db.create_all() (as older versions of the app did) are
+adopted without errors.
+
+The migrations are applied with a Flask CLI command:
+
+    flask upgrade-db
+
+    MIGRATIONS : tuple<(int, str, callable)>
+        Ordered (version, description, function) migrations. Each
+        function takes a SQLAlchemy connection.
+
+    function current_version
+        Return the version of the last migration applied to a database.
+
+    function upgrade
+        Apply every migration that wasn't applied yet, in a single
+        transaction.
+
+    upgrade_command : click.Command
+        The 'upgrade-db' Flask CLI command.
+"""
+
+
+import click
+from flask.cli import with_appcontext
+import sqlalchemy as sa
+
+from cervantes.models import PENDING_PREDICATE, content_hash, db
+
+
+def _has_table(connection, table_name):
+    """Check if a table exists in the database."""
+    return table_name in sa.inspect(connection).get_table_names()
+
+
+def _column_names(connection, table_name):
+    """Return the names of the columns of a table."""
+    return {column['name'] for column in sa.inspect(connection).get_columns(table_name)}
+
+
+def _index_names(connection, table_name):
+    """Return the names of the indexes of a table."""
+    return {index['name'] for index in sa.inspect(connection).get_indexes(table_name)}
+
+
+def _create_translations_table(connection):
+    """Create the 'translations' table, as first released."""
+
+    translations = sa.Table(
+        'translations', sa.MetaData(),
+        sa.Column('uid', sa.String(10), primary_key=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('source_language', sa.String(), nullable=False),
+        sa.Column('target_language', sa.String(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('translated_text', sa.Text()),
+        sa.Column('text_length', sa.Integer()),
+        sa.Column('date_created', sa.DateTime(timezone=True)),
+        sa.Column('date_updated', sa.DateTime(timezone=True)))
+
+    translations.create(connection, checkfirst=True)
+
+
+def _add_check_schedule(connection):
+    """
+    Add the polling schedule columns (next_check_at, check_count) of
+    the pending translations, and the index to select the due ones.
+    """
+
+    columns = _column_names(connection, 'translations')
+
+    if 'next_check_at' not in columns:
+        column_type = sa.DateTime(timezone=True).compile(dialect=connection.dialect)
+        connection.execute(sa.text(
+            'ALTER TABLE translations ADD COLUMN next_check_at {}'.format(column_type)))
+        # Every existing translation is due right away
+        connection.execute(sa.text(
+            'UPDATE translations SET next_check_at = CURRENT_TIMESTAMP'))
+        # SQLite can't add constraints to existing columns
+        if connection.dialect.name != 'sqlite':
+            connection.execute(sa.text(
+                'ALTER TABLE translations ALTER COLUMN next_check_at SET NOT NULL'))
+
+    if 'check_count' not in columns:
+        connection.execute(sa.text(
+            'ALTER TABLE translations ADD COLUMN check_count INTEGER NOT NULL DEFAULT 0'))
+
+    if 'ix_translations_status_next_check_at' not in _index_names(connection, 'translations'):
+        connection.execute(sa.text(
+            'CREATE INDEX ix_translations_status_next_check_at '
+            'ON translations (status, next_check_at)'))
+
+
+def _add_hot_query_indexes(connection):
+    """
+    Index the two hot queries: a partial index on the pending
+    translations (replacing the full status / next_check_at index), and
+    a composite index matching the listing order.
+    """
+
+    indexes = _index_names(connection, 'translations')
+
+    if 'ix_translations_pending_next_check_at' not in indexes:
+        connection.execute(sa.text(
+            'CREATE INDEX ix_translations_pending_next_check_at '
+            'ON translations (next_check_at) WHERE {}'.format(PENDING_PREDICATE)))
+
+    if 'ix_translations_status_next_check_at' in indexes:
+        connection.execute(sa.text(
+            'DROP INDEX ix_translations_status_next_check_at'))
+
+    if 'ix_translations_listing' not in indexes:
+        connection.execute(sa.text(
+            'CREATE INDEX ix_translations_listing '
+            'ON translations (text_length, date_updated, uid)'))
+
+
+def _add_translations_version(connection):
+    """
+    Add the 'translations_version' table, counting the changes made to
+    the translation listing, and start counting.
+    """
+
+    translations_version = sa.Table(
+        'translations_version', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('date_updated', sa.DateTime(timezone=True), nullable=False))
+
+    translations_version.create(connection, checkfirst=True)
+
+    if connection.execute(sa.text(
+            'SELECT COUNT(*) FROM translations_version')).scalar() == 0:
+        connection.execute(sa.text(
+            'INSERT INTO translations_version (id, version, date_updated) '
+            'VALUES (1, 1, CURRENT_TIMESTAMP)'))
+
+
+def _add_change_seq(connection):
+    """
+    Add the version of the listing that last changed each translation
+    (change_seq), and its index.
+    """
+
+    if 'change_seq' not in _column_names(connection, 'translations'):
+        # Existing translations predate every version
+        connection.execute(sa.text(
+            'ALTER TABLE translations ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0'))
+
+    if 'ix_translations_change_seq' not in _index_names(connection, 'translations'):
+        connection.execute(sa.text(
+            'CREATE INDEX ix_translations_change_seq ON translations (change_seq)'))
+
+
+# Number of existing translations hashed at a time, see _add_content_hash
+CONTENT_HASH_BATCH_SIZE = 1000
+
+
+def _add_content_hash(connection):
+    """
+    Add the hash of the normalized content of each translation
+    (content_hash), computed for the existing ones, and its index.
+    """
+
+    if 'content_hash' not in _column_names(connection, 'translations'):
+        connection.execute(sa.text(
+            'ALTER TABLE translations ADD COLUMN content_hash VARCHAR(64)'))
+
+    # Hashed in Python, like new translations are (see models.content_hash),
+    # a page at a time by UID, not to load the whole history at once
+    after = ''
+    while True:
+        rows = connection.execute(sa.text(
+            'SELECT uid, source_language, target_language, text FROM translations '
+            'WHERE content_hash IS NULL AND uid > :after ORDER BY uid LIMIT :limit'),
+            {'after': after, 'limit': CONTENT_HASH_BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        connection.execute(
+            sa.text('UPDATE translations SET content_hash = :content_hash WHERE uid = :uid'),
+            [{'uid': uid, 'content_hash': content_hash(source_language, target_language, text)}
+             for uid, source_language, target_language, text in rows])
+        after = rows[-1][0]
+
+    if 'ix_translations_content_hash' not in _index_names(connection, 'translations'):
+        connection.execute(sa.text(
+            'CREATE INDEX ix_translations_content_hash ON translations (content_hash)'))
+
+
+MIGRATIONS = (
+    (1, 'Create the translations table', _create_translations_table),
+    (2, 'Add the polling schedule of pending translations', _add_check_schedule),
+    (3, 'Index the pending and listing queries', _add_hot_query_indexes),
+    (4, 'Count the changes made to the translation listing', _add_translations_version),
+    (5, 'Track the version that last changed each translation', _add_change_seq),
+    (6, 'Hash the content of each translation', _add_content_hash),
+)
+
+
+def current_version(connection):
+    """
+    Return the version of the last migration applied to the database.
+
+        connection : sqlalchemy.engine.Connection
+
+        Returns : int
+            0 if no migration was ever applied.
+    """
+
+    if not _has_table(connection, 'schema_version'):
+        return 0
+
+    version = connection.execute(sa.text(
+        'SELECT MAX(version) FROM schema_version')).scalar()
+
+    return version or 0
+
+
+def upgrade(engine=None, target=None):
+    """
+    Apply every migration that wasn't applied to the database yet, in
+    order, within a single transaction.
+
+        engine : sqlalchemy.engine.Engine = None
+            Engine of the database to upgrade. Defaults to the engine
+            of the app's database (needs an application context).
+        target : int = None
+            Version to stop at. Upgrades to the latest version if None.
+
+        Returns : list<int>
+            Versions of the migrations applied.
+    """
+
+    if engine is None:
+        engine = db.engine
+
+    applied = []
+
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            'CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        version = current_version(connection)
+
+        for migration_version, description, migrate in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            if target is not None and migration_version > target:
+                break
+
+            migrate(connection)
+            connection.execute(sa.text(
+                'INSERT INTO schema_version (version) VALUES (:version)'),
+                {'version': migration_version})
+            applied.append(migration_version)
+
+    return applied
+
+
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_command():
+    """Apply the pending database migrations."""
+
+    applied = upgrade()
+
+    for version, description, _ in MIGRATIONS:
+        if version in applied:
+            click.echo('Applied migration {}: {}'.format(version, description))
+
+    if not applied:
+        click.echo('Database is up to date')
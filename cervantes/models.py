@@ -13,17 +13,112 @@ for the data stored in the database.
     class Translation
         Extends SQLAlchemy.Model. Model abstraction on top of the
         'translations' table in the database.
+
+    class TranslationsVersion
+        Extends SQLAlchemy.Model. Single record counting the changes
+        made to the translation listing, in the 'translations_version'
+        table.
+
+    function content_hash
+        Hash the normalized content of a translation request, to find
+        the earlier requests of the same text.
+
+    TRANSLATIONS_WRITTEN : str
+        Key of Session.info set to True once Translation records are
+        inserted or updated in the session's transaction, until it ends.
+        Whoever acts on committed writes (e.g. dropping cached listings)
+        pops it in an after_commit listener.
 """
 
 
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import unicodedata
 
 from flask_sqlalchemy import SQLAlchemy
 import sqlalchemy as sa
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 
 db = SQLAlchemy()
 
+# Statuses of translations that are still waiting on Unbabel
+PENDING_STATUSES = ('new', 'translating')
+
+# The same statuses as a SQL predicate. Spelled out with literals
+# rather than bound parameters, so the query planner can match it with
+# the predicate of the partial index on pending translations.
+PENDING_PREDICATE = "status IN ({})".format(
+    ', '.join("'{}'".format(status) for status in PENDING_STATUSES))
+
+# Columns of a serialized translation (see Translation.dictify)
+SERIALIZED_COLUMNS = ('uid', 'status', 'source_language', 'target_language', 'text',
+                      'translated_text', 'text_length', 'date_created', 'date_updated')
+
+# Statuses of the translations an identical request can reuse, rather
+# than asking Unbabel again: done, or on their way
+REUSABLE_STATUSES = ('completed',) + PENDING_STATUSES
+
+# Flag of the sessions that wrote translations, in Session.info
+TRANSLATIONS_WRITTEN = 'translations_written'
+
+# Polling schedule of pending translations. The delay between two
+# checks of a translation starts at CHECK_DELAY_BASE (stretched for
+# long texts and old requests) and doubles with every check that finds
+# nothing new, up to CHECK_DELAY_MAX.
+CHECK_DELAY_BASE = timedelta(seconds=30)
+CHECK_DELAY_MAX = timedelta(hours=1)
+# Extra delay per 1000 characters of text to translate
+CHECK_DELAY_PER_KCHAR = timedelta(seconds=60)
+# The delay is never shorter than this fraction of the request's age
+CHECK_DELAY_AGE_FRACTION = 0.1
+
+
+def content_hash(source_language, target_language, text):
+    """
+    Hash the content of a translation request, normalized so that
+    requests differing only in Unicode normalization or in whitespace
+    (around and between the words), or in the case of the language
+    codes, get the same hash.
+
+        source_language : str
+        target_language : str
+        text : str
+
+        Returns : str
+            SHA-256 hex digest (64 characters).
+    """
+
+    content = '\0'.join((
+        source_language.strip().lower(),
+        target_language.strip().lower(),
+        ' '.join(unicodedata.normalize('NFC', text).split())))
+
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _default_content_hash(context):
+    """Column default of Translation.content_hash, from the inserted values."""
+
+    parameters = context.get_current_parameters()
+    return content_hash(parameters['source_language'], parameters['target_language'],
+                        parameters['text'])
+
+
+def _as_naive_utc(date):
+    """
+    Return a timezone-aware datetime as a naive UTC one, as produced by
+    datetime.utcnow. Naive datetimes are returned as they are.
+    """
+
+    if date is None or date.tzinfo is None:
+        return date
+
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class Translation(db.Model):
     """
@@ -63,12 +158,77 @@ class Translation(db.Model):
         date_updated : datetime
             Timestamp of the last update done to this translation
             request.
+        next_check_at : datetime
+            When the translation is next due to be checked against the
+            Unbabel API, if it is pending.
+        check_count : int
+            Number of checks in a row that found no change in status.
+            Drives the backoff of next_check_at.
+        change_seq : int
+            Version of the listing (see TranslationsVersion) that last
+            changed the translation: its creation or last status
+            change.
+        content_hash : str
+            Hash of the normalized source and target languages and
+            text (see content_hash), set on insert. Finds the earlier
+            requests of the same text.
 
         classmethod get_all
-            Return all the translations in the database.
+            Return the translations in the database, a page at a time
+            if asked to.
+
+        classmethod query_all
+            Return the query behind get_all, to be refined or executed
+            differently.
+
+        classmethod query_all_rows
+            Return the query behind get_all, selecting the serialized
+            columns as plain rows instead of Translation instances.
+
+        classmethod dictify_rows
+            Turn rows from query_all_rows into the dictionaries
+            dictify would give for the same translations.
+
+        classmethod encode_cursor
+            Turn a listing key into an opaque pagination cursor.
+
+        classmethod decode_cursor
+            Turn a pagination cursor back into the listing key it
+            encodes.
 
         classmethod get_all_pending
-            Return all the pending translations in the database.
+            Return the pending translations in the database that are
+            due to be checked.
+
+        classmethod query_all_pending
+            Return the query behind get_all_pending.
+
+        classmethod get_changed_since
+            Return the translations created or changed after a version
+            of the listing.
+
+        classmethod bulk_update
+            Write new values to many translations at once, with batched
+            UPDATE statements instead of one per record.
+
+        classmethod bulk_insert
+            Insert many new translations at once, with a single INSERT
+            statement instead of one per record.
+
+        classmethod find_by_content_hashes
+            Return the translations that identical requests can reuse,
+            by content hash.
+
+        method next_check
+            Compute when the translation is next due to be checked,
+            backing off exponentially while its status doesn't change.
+
+        method schedule_next_check
+            Set the result of next_check on the translation.
+
+        property cursor
+            Opaque pagination cursor pointing right after this
+            translation in the listing order.
 
         method dictify
             Turn a Translation instance into a Python dictionary
@@ -76,6 +236,22 @@ class Translation(db.Model):
     """
 
     __tablename__ = 'translations'
+    # Kept in sync with cervantes.migrations, which creates them on
+    # existing databases
+    __table_args__ = (
+        # Selecting the pending translations that are due to be checked.
+        # Partial, so it only holds the (few) pending translations.
+        sa.Index('ix_translations_pending_next_check_at', 'next_check_at',
+                 postgresql_where=sa.text(PENDING_PREDICATE),
+                 sqlite_where=sa.text(PENDING_PREDICATE)),
+        # Listing order. Scanned backwards for the descending order.
+        sa.Index('ix_translations_listing',
+                 'text_length', 'date_updated', 'uid'),
+        # Changes since a version of the listing
+        sa.Index('ix_translations_change_seq', 'change_seq'),
+        # Earlier requests of the same text
+        sa.Index('ix_translations_content_hash', 'content_hash'),
+    )
 
     uid = sa.Column(sa.String(10), primary_key=True)
     status = sa.Column(sa.String(), nullable=False)
@@ -91,29 +267,406 @@ class Translation(db.Model):
     date_updated = sa.Column(sa.DateTime(timezone=True),
                              default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    next_check_at = sa.Column(sa.DateTime(timezone=True), nullable=False,
+                              default=datetime.utcnow)
+    check_count = sa.Column(sa.Integer(), nullable=False, default=0)
+
+    change_seq = sa.Column(sa.BigInteger(), nullable=False, default=0)
+
+    content_hash = sa.Column(sa.String(64), default=_default_content_hash)
+
     @classmethod
-    def get_all(cls):
+    def query_all(cls, limit=None, after=None):
         """
-        Return all translations, ordered by length of translated
-        text (desc), and then date of last update (desc).
+        Return the query behind get_all. See get_all for the arguments.
         """
 
-        return cls.query.order_by(
+        query = cls.query
+
+        if after is not None:
+            query = query.filter(
+                sa.tuple_(cls.text_length, cls.date_updated, cls.uid)
+                < sa.tuple_(*after))
+
+        query = query.order_by(
             sa.desc(cls.text_length)
         ).order_by(
             sa.desc(cls.date_updated)
-        ).all()
+        ).order_by(
+            sa.desc(cls.uid)
+        )
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query
 
     @classmethod
-    def get_all_pending(cls):
+    def get_all(cls, limit=None, after=None):
         """
-        Return all translations that are in a pending status
-        ('new', 'translating').
+        Return all translations, ordered by length of translated
+        text (desc), and then date of last update (desc), with the
+        UID (desc) as a tie-breaker.
+
+        Pages are selected with keyset pagination: the page after a
+        given translation starts where the listing key
+        (text_length, date_updated, uid) drops below its key, so no
+        rows are ever scanned and skipped like with an OFFSET.
+
+            limit : int = None
+                Maximum number of translations to return. All of them
+                are returned if None.
+            after : (int, datetime, str) = None
+                Listing key of the last translation of the previous
+                page, as returned by decode_cursor. Starts from the
+                top of the listing if None.
         """
 
-        return cls.query.filter(
-            cls.status.in_(['new', 'translating'])
-        ).all()
+        return cls.query_all(limit=limit, after=after).all()
+
+    @classmethod
+    def query_all_rows(cls, limit=None, after=None):
+        """
+        Return the query behind get_all, selecting only the
+        SERIALIZED_COLUMNS as plain rows. Skipping the hydration of
+        Translation instances (identity map, attribute instrumentation)
+        makes large listings much cheaper to serialize. See get_all for
+        the arguments.
+        """
+
+        return cls.query_all(limit=limit, after=after).with_entities(
+            *[getattr(cls, column) for column in SERIALIZED_COLUMNS])
+
+    @staticmethod
+    def dictify_rows(rows):
+        """
+        Transform rows of query_all_rows into dictionaries, equal to
+        the ones dictify returns for the same translations.
+
+            rows : list<tuple>
+                Rows with the SERIALIZED_COLUMNS, in that order.
+
+            Returns : list<dict>
+        """
+
+        # isoformat is a lot cheaper than strftime, and its first 19
+        # characters are the same 'YYYY-MM-DD HH:MM:SS'
+        return [
+            dict(zip(SERIALIZED_COLUMNS, (
+                uid, status, source_language, target_language, text,
+                translated_text, text_length,
+                date_created.isoformat(' ')[:19], date_updated.isoformat(' ')[:19])))
+            for (uid, status, source_language, target_language, text,
+                 translated_text, text_length, date_created, date_updated) in rows
+        ]
+
+    @staticmethod
+    def encode_cursor(text_length, date_updated, uid):
+        """
+        Turn a listing key into an opaque pagination cursor.
+
+            text_length : int
+            date_updated : datetime
+            uid : str
+
+            Returns : str
+        """
+
+        key = json.dumps([text_length, date_updated.isoformat(), uid],
+                         separators=(',', ':'))
+        return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Turn a pagination cursor back into the listing key it encodes.
+
+            cursor : str
+                Cursor, as given by Translation.cursor.
+
+            Returns : (int, datetime, str)
+                (text_length, date_updated, uid) listing key.
+
+            Raises
+                ValueError
+                    When the cursor is malformed.
+        """
+
+        try:
+            padded_cursor = cursor + '=' * (-len(cursor) % 4)
+            text_length, date_updated, uid = json.loads(
+                base64.urlsafe_b64decode(padded_cursor.encode('ascii')))
+            return int(text_length), datetime.fromisoformat(date_updated), str(uid)
+        except (TypeError, ValueError, UnicodeError) as exc:
+            raise ValueError('Invalid cursor: {}'.format(exc))
+
+    @property
+    def cursor(self):
+        """
+        Opaque pagination cursor pointing right after this translation
+        in the listing order.
+        """
+
+        return self.encode_cursor(self.text_length, self.date_updated, self.uid)
+
+    @classmethod
+    def query_all_pending(cls, now=None, limit=None, after=None):
+        """
+        Return the query behind get_all_pending. See get_all_pending
+        for the arguments.
+        """
+
+        if now is None:
+            now = datetime.utcnow()
+
+        query = cls.query.filter(
+            sa.text(PENDING_PREDICATE)
+        ).filter(
+            cls.next_check_at <= now
+        )
+
+        if after is not None:
+            query = query.filter(
+                sa.tuple_(cls.next_check_at, cls.uid) > sa.tuple_(*after))
+
+        query = query.order_by(cls.next_check_at, cls.uid)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query
+
+    @classmethod
+    def get_all_pending(cls, now=None, limit=None, after=None):
+        """
+        Return the translations that are in a pending status
+        ('new', 'translating') and whose next check is due, most
+        overdue first (then by UID).
+
+            now : datetime = None
+                Point in time to check against. Defaults to the
+                current UTC time.
+            limit : int = None
+                Maximum number of translations to return. All of the
+                due translations are returned if None.
+            after : (datetime, str) = None
+                next_check_at and UID of the last translation of the
+                previous batch: only the ones after it are returned.
+                Starts from the most overdue if None.
+        """
+
+        return cls.query_all_pending(now=now, limit=limit, after=after).all()
+
+    @classmethod
+    def get_changed_since(cls, version, after_uid=None, limit=None):
+        """
+        Return the translations created or changed after a version of
+        the listing, in the order of the changes (then of their UIDs,
+        as one version can change many translations).
+
+            version : int
+                Version of the listing (see TranslationsVersion) the
+                caller is up to date with.
+            after_uid : str = None
+                If given, the caller is only up to date with the
+                translations of that version up to this UID: the
+                following ones are returned too.
+            limit : int = None
+                Maximum number of translations to return. All of them
+                are returned if None.
+
+            Returns : list<Translation>
+        """
+
+        if after_uid is None:
+            query = cls.query.filter(cls.change_seq > version)
+        else:
+            query = cls.query.filter(
+                sa.tuple_(cls.change_seq, cls.uid) > sa.tuple_(version, after_uid))
+
+        query = query.order_by(cls.change_seq, cls.uid)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query.all()
+
+    @classmethod
+    def bulk_update(cls, updates):
+        """
+        Write new values to many translations at once. Translations
+        getting the same set of columns are written together, with a
+        single executemany UPDATE statement, instead of one UPDATE per
+        record through the session's unit of work.
+
+        The values are also set on the instances as their committed
+        state, so they stay in sync with the database without being
+        flushed again. The statements run within the session's
+        transaction; committing it is up to the caller. They flag the
+        session with TRANSLATIONS_WRITTEN, like a flush would.
+
+        date_updated is only changed when it is among the values:
+        writing other columns (e.g. the polling schedule) doesn't count
+        as an update of the translation.
+
+            updates : list<(Translation, dict<str, object>)>
+                Persistent Translation instances, each with the new
+                values of its columns, by column name.
+        """
+
+        table = cls.__table__
+        batches = {}
+
+        for translation, values in updates:
+            if values:
+                batches.setdefault(tuple(sorted(values)), []).append(
+                    (translation, values))
+
+        for columns, batch in batches.items():
+            assignments = {column: sa.bindparam('new_' + column)
+                           for column in columns}
+            # Keep the onupdate default from kicking in
+            assignments.setdefault('date_updated', table.c.date_updated)
+
+            statement = table.update().where(
+                table.c.uid == sa.bindparam('old_uid')).values(assignments)
+            db.session.execute(statement, [
+                dict({'new_' + column: value for column, value in values.items()},
+                     old_uid=translation.uid)
+                for translation, values in batch])
+
+            for translation, values in batch:
+                for column, value in values.items():
+                    set_committed_value(translation, column, value)
+
+        if batches:
+            db.session.info[TRANSLATIONS_WRITTEN] = True
+
+    @classmethod
+    def bulk_insert(cls, translations):
+        """
+        Insert many new translations at once, with a single executemany
+        INSERT statement, instead of one per record through the
+        session's unit of work. The instances aren't added to the
+        session. The statement runs within the session's transaction;
+        committing it is up to the caller. It flags the session with
+        TRANSLATIONS_WRITTEN, like a flush would.
+
+        Columns left to None get their default; both dates default to
+        the same current time for the whole batch.
+
+            translations : list<Translation>
+                Transient Translation instances.
+        """
+
+        if not translations:
+            return
+
+        now = datetime.utcnow()
+        table = cls.__table__
+        rows = []
+
+        for translation in translations:
+            row = {column.name: getattr(translation, column.name)
+                   for column in table.columns}
+            row['text_length'] = row['text_length'] or 0
+            row['date_created'] = row['date_created'] or now
+            row['date_updated'] = row['date_updated'] or now
+            row['check_count'] = row['check_count'] or 0
+            row['change_seq'] = row['change_seq'] or 0
+            row['content_hash'] = row['content_hash'] or content_hash(
+                row['source_language'], row['target_language'], row['text'])
+            rows.append(row)
+
+        db.session.execute(table.insert(), rows)
+        db.session.info[TRANSLATIONS_WRITTEN] = True
+
+    @classmethod
+    def find_by_content_hashes(cls, hashes):
+        """
+        Return the translations that new requests with the given
+        content hashes can reuse instead of asking Unbabel again: a
+        completed translation of the same content, or else one still
+        pending. Failed or canceled translations aren't reused.
+
+            hashes : list<str>
+                Content hashes, see content_hash.
+
+            Returns : dict<str, Translation>
+                The translation to reuse by content hash, for the
+                hashes that have one.
+        """
+
+        if not hashes:
+            return {}
+
+        matches = {}
+        candidates = cls.query.filter(
+            cls.content_hash.in_(sorted(set(hashes))),
+            cls.status.in_(REUSABLE_STATUSES),
+        ).order_by(cls.date_created, cls.uid)
+
+        for translation in candidates:
+            match = matches.get(translation.content_hash)
+            # The oldest completed one, or else the oldest pending one
+            if match is None or (match.status != 'completed'
+                                 and translation.status == 'completed'):
+                matches[translation.content_hash] = translation
+
+        return matches
+
+    def next_check(self, reset=False, now=None):
+        """
+        Compute when the translation is next due to be checked against
+        the Unbabel API. The instance is left untouched.
+
+        The delay starts at CHECK_DELAY_BASE, plus CHECK_DELAY_PER_KCHAR
+        for every 1000 characters of text, and is never shorter than
+        CHECK_DELAY_AGE_FRACTION of the age of the request. It doubles
+        with every check that finds nothing new, capped at
+        CHECK_DELAY_MAX.
+
+            reset : bool = False
+                If set to True, the status just changed (or the
+                translation was just requested), so the backoff starts
+                over. Otherwise the last check found nothing new, and
+                the backoff grows.
+            now : datetime = None
+                Point in time to schedule from. Defaults to the current
+                UTC time.
+
+            Returns : dict<str, object>
+                The new check_count and next_check_at values.
+        """
+
+        if now is None:
+            now = datetime.utcnow()
+
+        check_count = 0 if reset else (self.check_count or 0) + 1
+
+        delay = CHECK_DELAY_BASE + CHECK_DELAY_PER_KCHAR * \
+            (len(self.text or '') / 1000)
+
+        date_created = _as_naive_utc(self.date_created)
+        if date_created is not None:
+            delay = max(delay, (now - date_created) * CHECK_DELAY_AGE_FRACTION)
+
+        # Cap the exponent too, so a long-pending request can't overflow
+        delay = min(delay * 2 ** min(check_count, 16), CHECK_DELAY_MAX)
+
+        return {'check_count': check_count, 'next_check_at': now + delay}
+
+    def schedule_next_check(self, reset=False, now=None):
+        """
+        Set when the translation is next due to be checked against the
+        Unbabel API. See next_check.
+
+            reset : bool = False
+            now : datetime = None
+        """
+
+        for column, value in self.next_check(reset, now).items():
+            setattr(self, column, value)
 
     def dictify(self):
         """
@@ -144,3 +697,101 @@ class Translation(db.Model):
             target_lang=self.target_language,
             text=self.text
         )
+
+
+class TranslationsVersion(db.Model):
+    """
+    A single record holding the version of the translation listing: a
+    counter bumped, in the same transaction, by every write that
+    changes what the listing shows (a new translation, a status
+    change). It makes a cheap validator of the listing, read with a
+    primary key lookup instead of scanning the translations.
+
+    Bumping the counter locks its record until the transaction ends,
+    so concurrent writers are serialized on it, and versions follow
+    the commit order.
+
+    Attributes:
+        __tablename__ : str = 'translations_version'
+        id : int
+            Always 1.
+        version : int
+            Number of changes made to the listing.
+        date_updated : datetime
+            Timestamp of the last change made to the listing.
+
+        classmethod current
+            Return the current version and the time of its change.
+
+        classmethod bump
+            Count a change of the listing.
+    """
+
+    __tablename__ = 'translations_version'
+
+    id = sa.Column(sa.Integer(), primary_key=True)
+    version = sa.Column(sa.BigInteger(), nullable=False, default=0)
+    date_updated = sa.Column(sa.DateTime(timezone=True), nullable=False,
+                             default=datetime.utcnow)
+
+    @classmethod
+    def current(cls):
+        """
+        Return the current version of the listing.
+
+            Returns : (int, datetime)
+                Version, and timestamp of the last change. (0, None) if
+                the listing never changed.
+        """
+
+        row = cls.query.with_entities(
+            cls.version, cls.date_updated).filter(cls.id == 1).first()
+
+        return (row[0], row[1]) if row is not None else (0, None)
+
+    @classmethod
+    def bump(cls, now=None):
+        """
+        Count a change of the listing, within the session's
+        transaction. Committing it is up to the caller.
+
+            now : datetime = None
+                Timestamp of the change. Defaults to the current UTC
+                time.
+
+            Returns : int
+                The new version.
+        """
+
+        if now is None:
+            now = datetime.utcnow()
+
+        table = cls.__table__
+        result = db.session.execute(table.update().where(table.c.id == 1).values(
+            version=table.c.version + 1, date_updated=now))
+
+        if result.rowcount == 0:
+            # Never counted yet (e.g. a database made with create_all)
+            db.session.execute(table.insert().values(id=1, version=1, date_updated=now))
+
+        return cls.query.with_entities(cls.version).filter(cls.id == 1).scalar()
+
+
+@sa.event.listens_for(Session, 'after_flush')
+def _flag_translations_written(session, flush_context):
+    """Flag the session if the flush inserted or updated translations."""
+
+    # The new and dirty instances are still listed after the flush
+    if any(isinstance(instance, Translation) for instance in session.new) or \
+            any(isinstance(instance, Translation) and session.is_modified(instance)
+                for instance in session.dirty):
+        session.info[TRANSLATIONS_WRITTEN] = True
+
+
+@sa.event.listens_for(Session, 'after_soft_rollback')
+def _unflag_translations_written(session, previous_transaction):
+    """Forget the writes of a rolled back transaction."""
+
+    # Rolling back a savepoint keeps the rest of the transaction
+    if previous_transaction.parent is None:
+        session.info.pop(TRANSLATIONS_WRITTEN, None)
@@ -0,0 +1,145 @@
+"""
+This module defines the background poller that keeps the pending
+translations up to date, out of band from the web requests. It picks
+up the pending Translation records, refreshes them against the Unbabel
+API in batches and commits each batch, so page views only read from
+the database.
+
+The poller runs as a Flask CLI command, in its own process:
+
+    flask poll-translations [--interval 30] [--batch-size 50] [--once]
+
+    function poll_once
+        Refresh every pending translation once, in batches, committing
+        after each batch.
+
+    function run_poller
+        Call poll_once periodically until stopped, whatever goes wrong
+        in a poll.
+
+    poll_command : click.Command
+        The 'poll-translations' Flask CLI command.
+"""
+
+
+from datetime import datetime
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from cervantes.models import Translation, db
+import cervantes.unbabelapi as unbabelapi
+from cervantes.translations import _update_translations
+
+
+def poll_once(batch_size=50):
+    """
+    Refresh every pending translation once against the Unbabel API.
+    Pending records are loaded and refreshed batch_size at a time, and
+    each batch is committed on its own, so a failing batch doesn't hold
+    back the others (nor the successful records within it).
+
+    Nothing is refreshed while the Unbabel API is down (see
+    unbabelapi.CircuitBreaker): the poll stops there, and the records
+    left are polled on the next one.
+
+    Needs an application context.
+
+        batch_size : int = 50
+            Number of translations refreshed and committed together.
+
+        Returns : (int, int)
+            Number of translations refreshed, and number of batches
+            where at least one Unbabel API call failed.
+    """
+
+    # Records due after this point wait for the next poll, and the ones
+    # left due by a batch (e.g. locked by another process) aren't
+    # loaded again: batches follow each other in the order of the query
+    now = datetime.utcnow()
+    refreshed, failed_batches = 0, 0
+    after = None
+
+    while unbabelapi.is_available():
+        batch = Translation.get_all_pending(now=now, limit=batch_size, after=after)
+        if not batch:
+            break
+
+        after = (batch[-1].next_check_at, batch[-1].uid)
+        refreshed += len(batch)
+
+        try:
+            _update_translations(batch)
+        except unbabelapi.UnbabelAPIError as exc:
+            failed_batches += 1
+            current_app.logger.warning('Translation poll failed: %s', exc)
+
+        # Whatever was refreshed before a failure is still worth keeping
+        db.session.commit()
+
+    return refreshed, failed_batches
+
+
+def run_poller(interval=30, batch_size=50, cycles=None, sleep=time.sleep):
+    """
+    Call poll_once every interval seconds, until stopped (or until
+    cycles polls have been made). A poll that fails (e.g. the database
+    restarting) is logged and rolled back, and the poller carries on
+    with the next one.
+
+    Needs an application context.
+
+        interval : float = 30
+            Seconds between the start of two consecutive polls.
+        batch_size : int = 50
+            See poll_once.
+        cycles : int = None
+            Number of polls to make before returning. Runs forever if
+            None.
+        sleep : callable = time.sleep
+            Called with the number of seconds to wait between polls.
+
+        Returns : int
+            Number of polls made.
+    """
+
+    polls = 0
+
+    while cycles is None or polls < cycles:
+        started = time.monotonic()
+        try:
+            refreshed, failed_batches = poll_once(batch_size)
+        except Exception:
+            current_app.logger.exception('Translation poll failed')
+            db.session.rollback()
+        else:
+            click.echo('Refreshed {} pending translation(s), {} failed batch(es)'.format(
+                refreshed, failed_batches))
+        polls += 1
+
+        # Don't keep the session (and its identity map) between polls
+        db.session.remove()
+
+        if cycles is None or polls < cycles:
+            sleep(max(0, interval - (time.monotonic() - started)))
+
+    return polls
+
+
+@click.command('poll-translations')
+@click.option('--interval', default=30.0, show_default=True,
+              help='Seconds between polls.')
+@click.option('--batch-size', default=50, show_default=True,
+              help='Translations refreshed and committed together.')
+@click.option('--once', is_flag=True,
+              help='Poll a single time and exit.')
+@with_appcontext
+def poll_command(interval, batch_size, once):
+    """Keep the pending translations up to date with the Unbabel API."""
+
+    try:
+        run_poller(interval, batch_size, cycles=1 if once else None)
+    except KeyboardInterrupt:
+        click.echo('Poller stopped')
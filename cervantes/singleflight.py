@@ -0,0 +1,189 @@
+"""
+This module coalesces duplicate work: concurrent calls for the same
+thing share a single execution and its result, instead of each doing
+it (e.g. ten page views refreshing the same pending translations at
+once).
+
+Within a process, the calls are coalesced with a SingleFlight. Across
+processes (e.g. the web workers and the poller), PostgreSQL advisory
+locks tell which process does the work: the others skip it, or wait
+for its transaction to end. The locks are transaction-level, so they
+are released when the session commits or rolls back, along with the
+writes they guard. On other databases, every lock is granted (there is
+a single process writing, in development).
+
+    class SingleFlight
+        Coalesce concurrent calls by key, across threads.
+
+    function try_advisory_locks
+        Try to take the advisory locks of some keys, for the session's
+        transaction, without waiting.
+
+    function wait_advisory_lock
+        Wait for the advisory lock of a key to be released by whoever
+        holds it.
+"""
+
+
+import threading
+
+import sqlalchemy as sa
+
+
+class _Call():
+    """A call in flight, and its outcome once done."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    """
+    Coalesce concurrent calls by key: while a call for a key is in
+    flight, other calls for the same key wait for it and get its
+    result (or its exception) instead of making their own. Once it is
+    done, the next call for the key runs again: nothing is cached.
+    Thread-safe.
+
+        method do
+            Call a function, or share the result of the call in flight
+            for the same key.
+
+        method stats
+            Return the number of calls made and shared.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Call function(*args, **kwargs), unless a call for the same key
+        is in flight, in which case wait for it and share its outcome.
+
+            key : hashable
+            function : callable
+
+            Returns : any
+                What the function returned.
+
+            Raises
+                Exception
+                    Whatever the function raised, in every caller
+                    sharing the call.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call.result = function(*args, **kwargs)
+            except Exception as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+
+        return call.result
+
+    def stats(self):
+        """
+        Return the number of calls made and shared.
+
+            Returns : dict
+                calls (made), shared (calls that waited for another
+                one instead) and in_flight.
+        """
+
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared,
+                    'in_flight': len(self._calls)}
+
+
+def _is_postgresql(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def try_advisory_locks(session, namespace, keys):
+    """
+    Try to take the PostgreSQL advisory locks of some keys, without
+    waiting, for the rest of the session's transaction. Locks held by
+    other transactions (i.e. other processes or threads) aren't taken.
+    On other databases, every lock is taken.
+
+    Keys are hashed to 32 bits, so two keys may share their lock: at
+    worst, one of them is skipped when the other is locked.
+
+        session : sqlalchemy.orm.Session
+        namespace : int
+            32 bit integer, telling apart the locks of each kind of
+            work.
+        keys : list<str>
+
+        Returns : set<str>
+            The keys locked.
+    """
+
+    if not keys or not _is_postgresql(session):
+        return set(keys)
+
+    rows = session.execute(sa.text(
+        'SELECT key FROM unnest(CAST(:keys AS TEXT[])) AS key '
+        'WHERE pg_try_advisory_xact_lock(:namespace, hashtext(key))'),
+        {'keys': sorted(set(keys)), 'namespace': namespace})
+
+    return {row[0] for row in rows}
+
+
+def wait_advisory_lock(session, namespace, key, timeout=None):
+    """
+    Wait until the PostgreSQL advisory lock of a key is released by
+    the transaction holding it, if any. Meanwhile, it can't be taken
+    by anyone else either, until the session's transaction ends (e.g.
+    on its next commit). Does nothing on other databases.
+
+        session : sqlalchemy.orm.Session
+        namespace : int
+        key : str
+            See try_advisory_locks.
+        timeout : float = None
+            Seconds to wait at most. Waits as long as it takes if None.
+
+        Returns : bool
+            False if the lock was still held after timeout seconds.
+    """
+
+    if not _is_postgresql(session):
+        return True
+
+    try:
+        # A lock timeout aborts the statement: only roll back to here
+        with session.begin_nested():
+            if timeout is not None:
+                session.execute(sa.text("SELECT set_config('lock_timeout', :timeout, true)"),
+                                {'timeout': '{}ms'.format(max(1, int(timeout * 1000)))})
+            session.execute(sa.text(
+                'SELECT pg_advisory_xact_lock_shared(:namespace, hashtext(:key))'),
+                {'namespace': namespace, 'key': key})
+    except sa.exc.OperationalError:
+        return False
+
+    return True
@@ -4,11 +4,28 @@
 // Wait for the DOM to load
 document.addEventListener('DOMContentLoaded', fetchTranslations);
 
-function fetchTranslations() {
+// Milliseconds between two syncs of the changes to the history, when
+// the browser can't be told about them (no Server-Sent Events)
+const SYNC_INTERVAL = 30000;
+
+// Where to sync the changes from, as given by the server
+let syncCursor = null;
+
+// Sync in flight, and whether another one was asked for meanwhile
+let syncing = null;
+let syncAgain = false;
+
+// Async call to the server to get a page of the translation history.
+// Without a cursor, the first page comes as a whole table, and every
+// following page comes as rows to append to it.
+function fetchTranslationsPage(cursor) {
     const { origin } = window.location;
-    const translationHistoryDiv = document.querySelector('#translation-history');
+    const query = cursor ? `?after=${encodeURIComponent(cursor)}` : '';
 
-    fetch(`${origin}/translations/`
+    // Always revalidate: the browser sends the ETag and Last-Modified
+    // of its cached copy, and the server answers 304 Not Modified (and
+    // the cached copy is used) if the history didn't change since
+    return fetch(`${origin}/translations/${query}`, { cache: 'no-cache' }
     ).then(response => {
         if (response.status !== 200) {
             document.querySelector('#alerts').appendChild(
@@ -17,12 +34,187 @@ function fetchTranslations() {
             return;
         }
 
-        return response.text();
-    }).then(text => translationHistoryDiv.innerHTML = text
-    ).catch(error => {
+        const nextCursor = response.headers.get('X-Next-Cursor');
+        if (!cursor) {
+            syncCursor = response.headers.get('X-Sync-Cursor');
+        }
+        return response.text().then(html => ({ html, nextCursor }));
+    });
+}
+
+// Show a "Load more" button below the table as long as there are
+// more pages to load
+function updateLoadMoreButton(nextCursor) {
+    const translationHistoryDiv = document.querySelector('#translation-history');
+    let loadMoreButton = document.querySelector('#load-more-translations');
+
+    if (!nextCursor) {
+        if (loadMoreButton) {
+            loadMoreButton.remove();
+        }
+        return;
+    }
+
+    if (!loadMoreButton) {
+        loadMoreButton = document.createElement('button');
+        loadMoreButton.id = 'load-more-translations';
+        loadMoreButton.className = 'btn btn-outline-primary';
+        loadMoreButton.innerText = 'Load more';
+        loadMoreButton.addEventListener('click', loadMoreTranslations);
+        translationHistoryDiv.appendChild(loadMoreButton);
+    }
+
+    loadMoreButton.dataset.cursor = nextCursor;
+    loadMoreButton.disabled = false;
+}
+
+function loadMoreTranslations(event) {
+    const loadMoreButton = event.target;
+    loadMoreButton.disabled = true;
+
+    fetchTranslationsPage(loadMoreButton.dataset.cursor
+    ).then(page => {
+        if (!page) {
+            return;
+        }
+
+        document.querySelector('#translation-history tbody'
+        ).insertAdjacentHTML('beforeend', page.html);
+        updateLoadMoreButton(page.nextCursor);
+    }).catch(error => {
+        console.error(error);
+        loadMoreButton.disabled = false;
+        document.querySelector('#alerts').appendChild(
+            createDangerAlert('Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.')
+        );
+    });
+}
+
+// Listing order of two rows: by length of the translated text, then
+// by date of last update, then by UID, all descending
+function compareRows(row, otherRow) {
+    const lengthDifference = Number(otherRow.dataset.textLength) - Number(row.dataset.textLength);
+    if (lengthDifference !== 0) {
+        return lengthDifference;
+    }
+
+    for (const key of ['dateUpdated', 'uid']) {
+        if (row.dataset[key] !== otherRow.dataset[key]) {
+            return row.dataset[key] > otherRow.dataset[key] ? -1 : 1;
+        }
+    }
+
+    return 0;
+}
+
+// Put a fresh row in place of its previous version, at its position in
+// the listing. A row that belongs to a page that isn't loaded yet is
+// left for the "Load more" button.
+function mergeTranslationRow(row) {
+    const tbody = document.querySelector('#translation-history tbody');
+    const previousRow = tbody.querySelector(`tr[data-uid="${row.dataset.uid}"]`);
+    if (previousRow) {
+        previousRow.remove();
+    }
+
+    const nextRow = Array.from(tbody.rows).find(otherRow => compareRows(row, otherRow) < 0);
+    if (nextRow) {
+        tbody.insertBefore(row, nextRow);
+    } else if (!document.querySelector('#load-more-translations')) {
+        tbody.appendChild(row);
+    }
+}
+
+// Sync the changes, one sync at a time: asking for a sync while one is
+// in flight runs another one right after it
+function requestSync() {
+    if (syncing) {
+        syncAgain = true;
+        return syncing;
+    }
+
+    syncing = syncTranslations().then(() => {
+        syncing = null;
+        if (syncAgain) {
+            syncAgain = false;
+            return requestSync();
+        }
+    });
+    return syncing;
+}
+
+// Get told about every translation change as it happens, and sync the
+// changed rows. Syncing on (re)connection catches up on anything
+// missed while disconnected. When the server turns the stream down
+// (too many open), sync now and then instead, and try again later.
+function subscribeToTranslationEvents() {
+    if (!window.EventSource) {
+        setInterval(requestSync, SYNC_INTERVAL);
+        return;
+    }
+
+    const { origin } = window.location;
+    const events = new EventSource(`${origin}/translations/stream`);
+    events.addEventListener('open', requestSync);
+    events.addEventListener('translation', requestSync);
+    events.addEventListener('error', () => {
+        // Closed for good: the browser won't reconnect on its own
+        if (events.readyState === EventSource.CLOSED) {
+            requestSync();
+            setTimeout(subscribeToTranslationEvents, SYNC_INTERVAL);
+        }
+    });
+}
+
+// Fetch the translations created or changed since the last sync, and
+// merge them into the table
+function syncTranslations() {
+    const { origin } = window.location;
+
+    if (!syncCursor || !document.querySelector('#translation-history tbody')) {
+        return Promise.resolve();
+    }
+
+    return fetch(`${origin}/translations/?since=${encodeURIComponent(syncCursor)}`, { cache: 'no-cache' }
+    ).then(response => {
+        if (response.status !== 200) {
+            return;
+        }
+
+        const cursor = response.headers.get('X-Sync-Cursor');
+        const more = response.headers.get('X-Sync-More') === 'true';
+
+        return response.text().then(html => {
+            const template = document.createElement('template');
+            template.innerHTML = `<table><tbody>${html}</tbody></table>`;
+            template.content.querySelectorAll('tr').forEach(mergeTranslationRow);
+
+            syncCursor = cursor || syncCursor;
+            if (more) {
+                return syncTranslations();
+            }
+        });
+    }).catch(error => console.error(error));
+}
+
+function fetchTranslations() {
+    const translationHistoryDiv = document.querySelector('#translation-history');
+
+    fetchTranslationsPage(
+    ).then(page => {
+        if (!page) {
+            return;
+        }
+
+        translationHistoryDiv.innerHTML = page.html;
+        updateLoadMoreButton(page.nextCursor);
+
+        // From now on, only fetch what changed
+        subscribeToTranslationEvents();
+    }).catch(error => {
         console.error(error);
         document.querySelector('#alerts').appendChild(
             createDangerAlert('Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.')
         );
     });
-}
\ No newline at end of file
+}
@@ -15,6 +15,13 @@ tests in this package.
         to the test cases by accepting their function names in the
         test case parameters.
 
+    test_benchmarks.py
+        This module benchmarks the hot paths on large tables. Skipped
+        unless the CERVANTES_BENCHMARK environment variable is set.
+
+    test_cache.py
+        This module tests the cervantes.cache module.
+
     test_cervantes.py
         This module tests the cervantes (main app) package, namely the
         application factory and the routes defined directly in the
@@ -23,9 +30,25 @@ tests in this package.
     test_config.py
         This module tests the cervantes.config module.
 
+    test_events.py
+        This module tests the cervantes.events module.
+
+    test_memory.py
+        This module tests the cervantes.memory module.
+
+    test_migrations.py
+        This module tests the cervantes.migrations module, including
+        the query plans of the hot queries on a large table.
+
     test_models.py
         This module tests the cervantes.models module.
 
+    test_poller.py
+        This module tests the cervantes.poller module.
+
+    test_singleflight.py
+        This module tests the cervantes.singleflight module.
+
     test_translations.py
         This module tests the cervantes.translations module.
         cervantes.translations is a blueprint, with its own helper
@@ -2,7 +2,10 @@ import pytest
 
 from cervantes import create_app
 from cervantes.models import db as _db, Translation
-from .mocks.data import MOCK_TRANSLATIONS
+import cervantes.translations as translations
+import cervantes.unbabelapi as unbabelapi
+from .mocks.data import MOCK_TRANSLATIONS, MOCK_UNBABELAPI_CONFIG
+from .mocks.server import MockUnbabelServer
 
 
 @pytest.fixture()
@@ -11,8 +14,19 @@ def app():
 
     app = create_app(testing=True)
     with app.app_context():
+        # The app doesn't create the schema itself (see
+        # cervantes.migrations), make sure the tables exist
+        _db.create_all()
         yield app
 
+    # Don't let cached data leak between tests
+    unbabelapi.language_pairs.clear()
+    translations.row_html_cache.clear()
+    translations.row_json_cache.clear()
+    translations.translation_memory.clear()
+    translations._stop_fuzzy_memory_sync()
+    translations.fuzzy_memory.clear()
+
 
 @pytest.fixture()
 def db(app):
@@ -41,3 +55,26 @@ def client(app):
     """Create a test client for testing fake requests"""
 
     return app.test_client()
+
+
+@pytest.fixture()
+def unbabel_server(monkeypatch):
+    """
+    Start a local stand-in for the Unbabel API and point the Unbabel
+    client at it.
+    """
+
+    server = MockUnbabelServer().start()
+
+    unbabel_config = unbabelapi.UnbabelConfig.from_dict(dict(
+        MOCK_UNBABELAPI_CONFIG,
+        UNBABEL_API_URL=server.url,
+        UNBABEL_READ_TIMEOUT=2,
+        UNBABEL_RETRIES=0))
+    monkeypatch.setattr(unbabelapi, '_load_config',
+                        lambda *args, **kwargs: unbabel_config)
+
+    yield server
+
+    unbabelapi.reset_client()
+    server.stop()
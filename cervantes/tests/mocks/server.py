@@ -0,0 +1,166 @@
+"""
+This module holds a local stand-in for the Unbabel API. It is a real
+HTTP/1.1 server running on a background thread, so that the pooled
+UnbabelClient can be driven end to end (connections, keep-alive,
+timeouts, retries) without touching the network.
+
+    class MockUnbabelServer
+        Threaded HTTP server that answers the Unbabel API endpoints
+        used by the app with the mocked data, and records every
+        request and connection it sees.
+"""
+
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+
+from .data import MOCK_LANGUAGE_PAIRS, MOCK_NEW_TRANSLATION, MOCK_UPDATED_TRANSLATION
+
+
+class _UnbabelHandler(BaseHTTPRequestHandler):
+    """Request handler for MockUnbabelServer."""
+
+    # Keep-alive is only possible with HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.stand_in._record_connection()
+
+    def log_message(self, *args, **kwargs):
+        # Keep the test output clean
+        pass
+
+    def _respond(self, method):
+        stand_in = self.server.stand_in
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+        stand_in._record_request(method, self.path, self.headers, body)
+
+        status, content = stand_in._route(method, self.path, body)
+
+        latency = stand_in._next_latency()
+        if latency:
+            time.sleep(latency)
+
+        payload = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_POST(self):
+        self._respond('POST')
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    """HTTP server for MockUnbabelServer."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early (e.g. on timeouts) are expected
+        pass
+
+
+class MockUnbabelServer():
+    """
+    Local stand-in for the Unbabel API.
+
+        url : str
+            Root URL of the stand-in API, to be used as the
+            UNBABEL_API_URL config value.
+        latency : float = 0
+            Seconds to wait before answering each request.
+        latencies : list<float>
+            Queue of latencies to answer with before falling back to
+            latency.
+        statuses : list<int>
+            Queue of HTTP statuses to answer with before falling back
+            to 200 (or 201 for POSTs).
+        translations : dict<str, dict>
+            Body returned for 'GET /translation/:uid', by UID. UIDs
+            that are not in it get MOCK_UPDATED_TRANSLATION with
+            their own UID.
+        requests : list<(str, str, dict, dict)>
+            Every (method, path, headers, body) received.
+        connections : int
+            Number of TCP connections accepted.
+
+        method start
+            Start serving on a random free port on a background thread.
+
+        method stop
+            Stop serving and close the listening socket.
+    """
+
+    def __init__(self):
+        self.latency = 0
+        self.latencies = []
+        self.statuses = []
+        self.translations = {}
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd = _StandInHTTPServer(('127.0.0.1', 0), _UnbabelHandler)
+        self._httpd.stand_in = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/tapi/v2/'.format(self._httpd.server_port)
+
+    def _record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _record_request(self, method, path, headers, body):
+        with self._lock:
+            self.requests.append((method, path, dict(headers), body))
+
+    def _next_latency(self):
+        with self._lock:
+            return self.latencies.pop(0) if self.latencies else self.latency
+
+    def _route(self, method, path, body):
+        with self._lock:
+            forced_status = self.statuses.pop(0) if self.statuses else None
+
+        if forced_status is not None and forced_status >= 400:
+            return forced_status, {'error': forced_status}
+
+        if method == 'GET' and path == '/tapi/v2/language_pair/':
+            return 200, MOCK_LANGUAGE_PAIRS
+
+        if method == 'POST' and path == '/tapi/v2/translation/':
+            translation = dict(MOCK_NEW_TRANSLATION)
+            translation.update(body or {})
+            return 201, translation
+
+        match = re.match(r'^/tapi/v2/translation/(\w+)$', path)
+        if method == 'GET' and match:
+            uid = match.group(1)
+            translation = dict(MOCK_UPDATED_TRANSLATION, uid=uid)
+            return 200, self.translations.get(uid, translation)
+
+        return 404, {'error': 'Not Found'}
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={'poll_interval': 0.01},
+            daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -8,7 +8,7 @@ with the cervantes.unbabelapi module.
 """
 
 
-from cervantes.unbabelapi import UnbabelAPIError
+from cervantes.unbabelapi import UnbabelAPIError, UnbabelConfig
 
 from .data import MOCK_UNBABELAPI_CONFIG, MOCK_INCOMPLETE_UNBABELAPI_CONFIG
 
@@ -19,27 +19,27 @@ class UnababelAPIMocks:
     cervantes.unbabelapi module.
 
         staticmethod _returnConfig
-            Return a mocked config dict for accessing the Unbabel API.
+            Return a mocked config for accessing the Unbabel API.
         staticmethod _returnIncompleteConfig
-            Return a mocked config dict for accessing the Unbabel API
-            with missing keys.
+            Load a mocked config for accessing the Unbabel API with
+            missing keys, which raises KeyError.
         staticmethod _raiseUnbabelAPIError
             Raise an UnbabelAPIError.
     """
 
     @staticmethod
     def _returnConfig(*args, **kwargs):
-        """Return a mocked config dict for accessing the Unbabel API."""
-        return MOCK_UNBABELAPI_CONFIG
+        """Return a mocked config for accessing the Unbabel API."""
+        return UnbabelConfig.from_dict(MOCK_UNBABELAPI_CONFIG)
 
     @staticmethod
     def _returnIncompleteConfig(*args, **kwargs):
         """
-        Return a mocked config dict for accessing the Unbabel API with
-        missing keys.
+        Load a mocked config for accessing the Unbabel API with
+        missing keys, which raises KeyError like the real loader.
         """
 
-        return MOCK_INCOMPLETE_UNBABELAPI_CONFIG
+        return UnbabelConfig.from_dict(MOCK_INCOMPLETE_UNBABELAPI_CONFIG)
 
     @staticmethod
     def _raiseUnbabelAPIError(*args, **kwargs):
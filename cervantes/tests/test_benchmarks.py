@@ -0,0 +1,139 @@
+"""
+Benchmarks of the hot paths, on large tables. They take a while, so
+they only run when the CERVANTES_BENCHMARK environment variable is set:
+
+    CERVANTES_BENCHMARK=1 pytest -s cervantes/tests/test_benchmarks.py
+"""
+
+
+from datetime import datetime, timedelta
+import os
+import random
+import time
+
+from flask import jsonify
+import pytest
+
+from cervantes.memory import TranslationMemory
+import cervantes.translations as translations
+from cervantes.models import Translation, db as _db
+
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('CERVANTES_BENCHMARK'),
+    reason='Set CERVANTES_BENCHMARK to run the benchmarks')
+
+
+def _fill_translations(rows):
+    """Replace the translations with rows completed ones."""
+
+    _db.drop_all()
+    _db.create_all()
+
+    now = datetime(2019, 12, 30, 15, 30, 45)
+    _db.session.execute(Translation.__table__.insert(), [
+        {
+            'uid': 'uid{:07}'.format(i),
+            'status': 'completed',
+            'source_language': 'en',
+            'target_language': 'es',
+            'text': 'Sample text {}'.format(i),
+            'translated_text': 'Texto de ejemplo {}'.format(i),
+            'text_length': 16 + len(str(i)),
+            'date_created': now - timedelta(seconds=i),
+            'date_updated': now - timedelta(seconds=i, microseconds=i),
+            'next_check_at': now,
+            'check_count': 0,
+        }
+        for i in range(rows)
+    ])
+    _db.session.commit()
+
+
+def _best_of(runs, function):
+    """Return the best wall time of a few runs of function."""
+
+    timings = []
+    for _ in range(runs):
+        _db.session.expunge_all()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+@pytest.mark.parametrize('rows', [10000, 100000])
+def test_json_listing(app, monkeypatch, rows):
+    """
+    Serializing the JSON listing from plain rows beats hydrating
+    Translation instances and dictifying them, for the same bytes.
+    """
+
+    # Debug mode pretty prints, and leaves it all to jsonify
+    monkeypatch.setitem(app.config, 'DEBUG', False)
+
+    _fill_translations(rows)
+
+    def with_dictify():
+        return jsonify([t.dictify() for t in Translation.get_all()]).get_data()
+
+    def with_rows():
+        return translations._json_response(
+            Translation.dictify_rows(Translation.query_all_rows().all())).get_data()
+
+    with app.test_request_context():
+        assert with_dictify() == with_rows()
+
+        dictify_time = _best_of(3, with_dictify)
+        rows_time = _best_of(3, with_rows)
+
+    print('\n{} rows: dictify {:.3f}s, rows {:.3f}s ({:.1f}x, orjson {})'.format(
+        rows, dictify_time, rows_time, dictify_time / rows_time,
+        'on' if translations.orjson is not None else 'off'))
+
+    assert rows_time < dictify_time
+
+    _db.session.remove()
+    _db.drop_all()
+
+
+def test_fuzzy_memory_lookup():
+    """
+    A lookup of the fuzzy translation memory takes well under a
+    millisecond on 100000 translations, and finds the near-duplicates.
+    """
+
+    ROWS = 100000
+    LOOKUPS = 1000
+
+    generator = random.Random(0)
+    words = [''.join(generator.choice('abcdefghijklmnopqrstuvwxyz')
+                     for _ in range(generator.randint(2, 9))) for _ in range(5000)]
+    texts = [' '.join(generator.choice(words) for _ in range(generator.randint(4, 15)))
+             for _ in range(ROWS)]
+
+    memory = TranslationMemory()
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        memory.add('uid{:07}'.format(i), 'en', 'es', text, text)
+    build_time = time.perf_counter() - start
+
+    # One word changed
+    lookups = []
+    for i, text in enumerate(texts[:LOOKUPS]):
+        text_words = text.split()
+        text_words[0] = generator.choice(words)
+        lookups.append(('uid{:07}'.format(i), ' '.join(text_words)))
+
+    found = 0
+    start = time.perf_counter()
+    for uid, text in lookups:
+        found += uid in [s['uid'] for s in memory.suggest('en', 'es', text)]
+    lookup_time = (time.perf_counter() - start) / LOOKUPS
+
+    print('\n{} rows: build {:.1f}s, lookup {:.3f}ms, recall {:.3f}'.format(
+        ROWS, build_time, lookup_time * 1000, found / LOOKUPS))
+
+    assert lookup_time < 0.001
+    assert found / LOOKUPS > 0.95
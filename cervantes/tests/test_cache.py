@@ -0,0 +1,114 @@
+import pytest
+
+from cervantes.cache import FileSystemCache, HitCounter, LRUCache, SQLiteCache, make_cache
+
+
+class TestLRUCache():
+    def test_get(self):
+        """Cached values are returned, and lookups counted."""
+
+        cache = LRUCache()
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats() == {
+            'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 1, 'maxsize': 1000}
+
+    def test_eviction(self):
+        """The least recently used entries are evicted first."""
+
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert len(cache) == 2
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+    def test_clear(self):
+        """Clearing drops the entries and the counters."""
+
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.clear()
+
+        assert cache.stats() == {
+            'hits': 0, 'misses': 0, 'hit_rate': None, 'size': 0, 'maxsize': 1000}
+
+
+@pytest.fixture(params=['filesystem', 'sqlite'])
+def shared_cache(request, tmp_path):
+    """Create an empty cache of each shared backend."""
+
+    return make_cache(request.param, maxsize=2, path=str(tmp_path / 'cache'))
+
+
+class TestSharedCaches():
+    def test_get(self, shared_cache):
+        """Cached values are returned, and lookups counted."""
+
+        shared_cache.set('a', (b'body', 'text/html', None))
+
+        assert shared_cache.get('a') == (b'body', 'text/html', None)
+        assert shared_cache.get('b') is None
+        assert shared_cache.stats() == {
+            'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 1, 'maxsize': 2}
+
+    def test_eviction(self, shared_cache, monkeypatch):
+        """The oldest entries are deleted first."""
+
+        times = iter(range(10))
+        monkeypatch.setattr('cervantes.cache._modification_time', lambda path: next(times))
+
+        shared_cache.set('a', 1)
+        shared_cache.set('b', 2)
+        shared_cache.set('c', 3)
+
+        assert len(shared_cache) == 2
+        assert shared_cache.get('a') is None
+        assert shared_cache.get('c') == 3
+
+    def test_shared(self, shared_cache, tmp_path):
+        """Caches using the same path share their entries."""
+
+        other_cache = type(shared_cache)(str(tmp_path / 'cache'))
+        shared_cache.set('a', 1)
+
+        assert other_cache.get('a') == 1
+
+        other_cache.clear()
+        assert shared_cache.get('a') is None
+
+
+def test_hit_counter():
+    """Hits and misses are counted, and cleared."""
+
+    counter = HitCounter()
+    assert counter.stats() == {'hits': 0, 'misses': 0, 'hit_rate': None}
+
+    counter.count(True)
+    counter.count(False, 3)
+    assert counter.stats() == {'hits': 1, 'misses': 3, 'hit_rate': 0.25}
+
+    counter.clear()
+    assert counter.stats()['hits'] == 0
+
+
+def test_make_cache(tmp_path):
+    """Caches are made from the name of their backend."""
+
+    assert make_cache(None) is None
+    assert isinstance(make_cache('memory'), LRUCache)
+    assert isinstance(make_cache('filesystem', path=str(tmp_path / 'files')),
+                      FileSystemCache)
+    assert isinstance(make_cache('sqlite', path=str(tmp_path / 'cache.db')), SQLiteCache)
+
+    with pytest.raises(ValueError):
+        make_cache('redis')
+    with pytest.raises(ValueError):
+        make_cache('sqlite')
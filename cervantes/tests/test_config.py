@@ -1,5 +1,6 @@
-from cervantes.config import ConfigError, _load_config, ProductionConfig, TestingConfig
+from cervantes.config import ConfigError, _load_config, reload_config_files, ProductionConfig, TestingConfig
 import pytest
+import yaml
 
 
 def test_load_config_non_existent_file_production():
@@ -20,3 +21,55 @@ def test_load_config_non_existent_file_testing():
 
     with pytest.raises(ConfigError):
         _load_config(TestingConfig(), path='non-existent-config-file.yaml')
+
+
+def test_load_config_is_cached(tmp_path, monkeypatch):
+    """
+    Building several config objects parses the config file once, and
+    only parses it again after it changes or an explicit reload.
+    """
+
+    YAML = (
+        "production:\n"
+        "  SECRET_KEY: 'secret'\n"
+        "  SQLALCHEMY_DATABASE_URI: 'sqlite://'\n"
+    )
+
+    temp_config_file = tmp_path / 'cervantes.yaml'
+    temp_config_file.write_text(YAML)
+
+    parses = []
+    safe_load = yaml.safe_load
+    monkeypatch.setattr(yaml, 'safe_load',
+                        lambda stream: parses.append(stream) or safe_load(stream))
+
+    first_config, second_config = ProductionConfig(), TestingConfig()
+    _load_config(first_config, path=str(temp_config_file))
+    _load_config(second_config, testing=True, path=str(temp_config_file))
+
+    assert first_config.SECRET_KEY == second_config.SECRET_KEY == 'secret'
+    assert len(parses) == 1
+
+    temp_config_file.write_text(YAML.replace("'secret'", "'new-secret'"))
+    _load_config(first_config, path=str(temp_config_file))
+
+    assert first_config.SECRET_KEY == 'new-secret'
+    assert len(parses) == 2
+
+    reload_config_files()
+    _load_config(first_config, path=str(temp_config_file))
+
+    assert len(parses) == 3
+
+
+def test_load_config_missing_key(tmp_path):
+    """
+    Check if a ConfigError exception is raised if the config file
+    is missing a key.
+    """
+
+    temp_config_file = tmp_path / 'cervantes.yaml'
+    temp_config_file.write_text("production:\n  SECRET_KEY: 'secret'\n")
+
+    with pytest.raises(ConfigError):
+        _load_config(ProductionConfig(), path=str(temp_config_file))
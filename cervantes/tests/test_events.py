@@ -0,0 +1,73 @@
+import cervantes.events as events
+from cervantes.models import db as _db
+
+
+class TestBroker():
+    def test_publish(self):
+        """Every subscription gets the events published after it."""
+
+        broker = events.Broker()
+        first, second = broker.subscribe(), broker.subscribe()
+
+        broker.publish({'uid': 'uid0000001'})
+
+        assert first.get(timeout=0) == {'uid': 'uid0000001'}
+        assert second.get(timeout=0) == {'uid': 'uid0000001'}
+        assert first.get(timeout=0) is None
+
+    def test_unsubscribe(self):
+        """An unsubscribed subscription gets no more events."""
+
+        broker = events.Broker()
+        subscription = broker.subscribe()
+        broker.unsubscribe(subscription)
+
+        broker.publish({'uid': 'uid0000001'})
+
+        assert subscription.get(timeout=0) is None
+        assert broker.subscribers == 0
+
+    def test_slow_subscriber(self):
+        """Publishing never blocks: a full subscription drops events."""
+
+        broker = events.Broker()
+        subscription = broker.subscribe(maxsize=2)
+
+        for i in range(5):
+            broker.publish({'uid': i})
+
+        assert subscription.get(timeout=0) == {'uid': 0}
+        assert subscription.get(timeout=0) == {'uid': 1}
+        assert subscription.get(timeout=0) is None
+
+
+class TestRecord():
+    def test_published_on_commit(self, db, monkeypatch):
+        """Recorded events are published once the session commits."""
+
+        broker = events.Broker()
+        monkeypatch.setattr(events, 'broker', broker)
+        subscription = broker.subscribe()
+
+        events.record(_db.session, {'uid': 'uid0000001'})
+        assert subscription.get(timeout=0) is None
+
+        _db.session.commit()
+        assert subscription.get(timeout=0) == {'uid': 'uid0000001'}
+
+        # Only once
+        _db.session.commit()
+        assert subscription.get(timeout=0) is None
+
+    def test_discarded_on_rollback(self, db, monkeypatch):
+        """Recorded events of a rolled back session are never published."""
+
+        broker = events.Broker()
+        monkeypatch.setattr(events, 'broker', broker)
+        subscription = broker.subscribe()
+
+        events.record(_db.session, {'uid': 'uid0000001'})
+        _db.session.rollback()
+        _db.session.commit()
+
+        assert subscription.get(timeout=0) is None
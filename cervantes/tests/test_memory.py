@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+import cervantes.events as events
+from cervantes.memory import MemorySync, TranslationMemory, normalize, shingles
+from cervantes.models import Translation, TranslationsVersion
+
+from .mocks.data import MOCK_TRANSLATIONS
+
+
+def test_normalize():
+    """Case, punctuation and whitespace don't matter."""
+
+    assert normalize('  Hello,   WORLD!\n') == 'hello world'
+    assert normalize('Straße') == normalize('STRASSE')
+    assert shingles('Hello, world') == shingles('hello world!')
+    assert shingles('...') == set()
+
+
+class TestTranslationMemory():
+    def test_suggest(self):
+        """
+        Near-duplicates of an indexed text are suggested, the most
+        similar first, within its language pair only.
+        """
+
+        memory = TranslationMemory()
+        memory.add('uid0000001', 'en', 'es', 'The cat sat on the mat.', 'El gato')
+        memory.add('uid0000002', 'en', 'es', 'The cat sat on the red mat.', 'El gato rojo')
+        memory.add('uid0000003', 'en', 'es', 'Something else entirely', 'Otra cosa')
+        memory.add('uid0000004', 'en', 'pt', 'The cat sat on the mat.', 'O gato')
+
+        suggestions = memory.suggest('en', 'es', 'the cat  sat on the mat')
+
+        assert [s['uid'] for s in suggestions] == ['uid0000001', 'uid0000002']
+        assert suggestions[0]['similarity'] == 1
+        assert suggestions[0]['translated_text'] == 'El gato'
+        assert 0.5 <= suggestions[1]['similarity'] < 1
+
+        assert memory.suggest('en', 'es', 'the cat sat on the mat', limit=1)[0]['uid'] == \
+            'uid0000001'
+        assert memory.suggest('en', 'fr', 'The cat sat on the mat.') == []
+        assert memory.suggest('en', 'es', '?!') == []
+
+        assert memory.stats() == {'size': 4, 'pairs': 2, 'version': None,
+                                  'lookups': 4, 'hits': 2, 'hit_rate': 0.5}
+
+    def test_add_once(self):
+        """A translation is only indexed once."""
+
+        memory = TranslationMemory()
+
+        assert memory.add('uid0000001', 'en', 'es', 'Sample text', 'Texto')
+        assert not memory.add('uid0000001', 'en', 'es', 'Sample text', 'Texto')
+        assert not memory.add('uid0000002', 'en', 'es', '!', 'Texto')
+        assert len(memory) == 1
+
+    def test_sync(self, db):
+        """
+        Syncing indexes the completed translations, then only the ones
+        completed since, and nothing while the listing doesn't change.
+        """
+
+        memory = TranslationMemory()
+
+        assert memory.sync() == 4
+        assert memory.sync() == 0
+        assert memory.suggest('en', 'es', 'Sample text 5') != []
+        assert 'uid0000005' not in [s['uid'] for s in memory.suggest('en', 'es', 'Sample text 5')]
+
+        translation = Translation.query.get('uid0000005')
+        translation.status = 'completed'
+        translation.translated_text = 'El sample text cinco'
+        translation.change_seq = TranslationsVersion.bump()
+        db.session.commit()
+
+        assert memory.sync() == 1
+        assert memory.suggest('en', 'es', 'Sample text 5')[0] == {
+            'uid': 'uid0000005', 'text': 'Sample text 5',
+            'translated_text': 'El sample text cinco', 'similarity': 1}
+
+        memory.clear()
+        assert len(memory) == 0
+        assert memory.sync() == len(MOCK_TRANSLATIONS)
+
+    def test_background_sync(self, app, db):
+        """
+        The sync thread indexes the completed translations, then the
+        ones completed since as soon as their event is published.
+        """
+
+        memory = TranslationMemory()
+        broker = events.Broker()
+        sync = MemorySync(app, memory, broker, interval=60)
+        sync.start()
+
+        try:
+            deadline = time.monotonic() + 5
+            while len(memory) < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(memory) == 4
+
+            translation = Translation.query.get('uid0000005')
+            translation.status = 'completed'
+            translation.translated_text = 'El sample text cinco'
+            translation.change_seq = TranslationsVersion.bump()
+            db.session.commit()
+            broker.publish({'uid': 'uid0000005', 'status': 'completed',
+                            'change_seq': translation.change_seq})
+
+            deadline = time.monotonic() + 5
+            while len(memory) < 5 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(memory) == 5
+        finally:
+            sync.stop()
+            sync.join()
+
+        assert broker.subscribers == 0
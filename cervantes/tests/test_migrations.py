@@ -0,0 +1,205 @@
+import cervantes.migrations as migrations
+from cervantes.models import Translation, TranslationsVersion, content_hash, db as _db
+
+from .mocks.data import MOCK_TRANSLATIONS
+
+from datetime import datetime
+import json
+import pytest
+import sqlalchemy as sa
+
+
+@pytest.fixture()
+def empty_db(app):
+    """Start from a database without any table, and leave it that way."""
+
+    def drop_everything():
+        _db.session.remove()
+        _db.drop_all()
+        with _db.engine.begin() as connection:
+            connection.execute(sa.text('DROP TABLE IF EXISTS schema_version'))
+
+    drop_everything()
+    yield _db.engine
+    drop_everything()
+
+
+def _schema(engine):
+    """Return the columns and index names of the translations table."""
+
+    inspector = sa.inspect(engine)
+    columns = {column['name'] for column in inspector.get_columns('translations')}
+    indexes = {index['name'] for index in inspector.get_indexes('translations')}
+
+    return columns, indexes
+
+
+def test_upgrade_empty_database(empty_db):
+    """Migrating an empty database yields the schema of the models."""
+
+    EXPECTED_COLUMNS = {column.name for column in Translation.__table__.columns}
+    EXPECTED_INDEXES = {index.name for index in Translation.__table__.indexes}
+
+    applied = migrations.upgrade(empty_db)
+
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+    assert _schema(empty_db) == (EXPECTED_COLUMNS, EXPECTED_INDEXES)
+
+    # Nothing left to apply
+    assert migrations.upgrade(empty_db) == []
+
+    # The listing changes are counted from the start
+    assert TranslationsVersion.current()[0] == 1
+
+
+def test_upgrade_existing_database(empty_db):
+    """
+    Migrating a database of the first release keeps its records and
+    makes them due for a check, their content hashed.
+    """
+
+    migrations.upgrade(empty_db, target=1)
+
+    with empty_db.begin() as connection:
+        connection.execute(sa.text(
+            'INSERT INTO translations (uid, status, source_language, target_language, text) '
+            "VALUES ('uid0000005', 'new', 'en', 'es', 'Sample text 5')"))
+
+    assert migrations.upgrade(empty_db) == [2, 3, 4, 5, 6]
+
+    pending_translations = Translation.get_all_pending(
+        now=datetime(9999, 1, 1))
+
+    assert [t.uid for t in pending_translations] == ['uid0000005']
+    assert pending_translations[0].check_count == 0
+    assert pending_translations[0].content_hash == content_hash('en', 'es', 'Sample text 5')
+
+
+def test_upgrade_hashes_in_pages(empty_db, monkeypatch):
+    """Existing translations are hashed a page of rows at a time."""
+
+    monkeypatch.setattr(migrations, 'CONTENT_HASH_BATCH_SIZE', 2)
+    migrations.upgrade(empty_db, target=5)
+
+    with empty_db.begin() as connection:
+        connection.execute(sa.text(
+            'INSERT INTO translations (uid, status, source_language, target_language, text) '
+            "VALUES (:uid, 'new', 'en', 'es', :text)"),
+            [{'uid': 'uid000000{}'.format(i), 'text': 'Sample text {}'.format(i)}
+             for i in range(1, 6)])
+
+    selects = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT uid, source_language'):
+            selects.append(statement)
+
+    sa.event.listen(empty_db, 'before_cursor_execute', record_statement)
+    try:
+        assert migrations.upgrade(empty_db) == [6]
+    finally:
+        sa.event.remove(empty_db, 'before_cursor_execute', record_statement)
+
+    # 3 pages, and an empty one
+    assert len(selects) == 4
+    with empty_db.connect() as connection:
+        hashes = dict(connection.execute(sa.text(
+            'SELECT uid, content_hash FROM translations')).fetchall())
+    assert hashes == {'uid000000{}'.format(i): content_hash('en', 'es', 'Sample text {}'.format(i))
+                      for i in range(1, 6)}
+
+
+def test_upgrade_created_database(empty_db):
+    """A database created with db.create_all() is adopted as is."""
+
+    _db.create_all()
+    schema = _schema(empty_db)
+
+    migrations.upgrade(empty_db)
+
+    assert _schema(empty_db) == schema
+    with empty_db.connect() as connection:
+        assert migrations.current_version(connection) == migrations.MIGRATIONS[-1][0]
+
+
+def test_upgrade_command(app, empty_db):
+    """The 'upgrade-db' CLI command applies the migrations."""
+
+    result = app.test_cli_runner().invoke(args=['upgrade-db'])
+
+    assert result.exit_code == 0
+    assert 'Applied migration 3' in result.output
+
+    result = app.test_cli_runner().invoke(args=['upgrade-db'])
+
+    assert 'Database is up to date' in result.output
+
+
+def _explain(engine, query):
+    """
+    Return the query plan of a query, as a list of plan node
+    descriptions.
+    """
+
+    statement = query.statement.compile()
+
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            plan = connection.execute(sa.text(
+                'EXPLAIN (FORMAT JSON) ' + str(statement)), statement.params).scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+
+            nodes, pending = [], [plan[0]['Plan']]
+            while pending:
+                node = pending.pop()
+                nodes.append(node['Node Type'])
+                pending.extend(node.get('Plans', []))
+            return nodes
+
+        return [row[-1] for row in connection.execute(sa.text(
+            'EXPLAIN QUERY PLAN ' + str(statement)), statement.params)]
+
+
+def _is_sequential_scan(node):
+    """Check if a query plan node is a sequential scan of the table."""
+
+    return (node == 'Seq Scan'
+            or (node.startswith('SCAN translations') and 'USING' not in node))
+
+
+def test_hot_queries_use_indexes(empty_db):
+    """
+    On a large table, neither the pending translations query nor the
+    listing query fall back to a sequential scan.
+    """
+
+    ROWS = 20000
+
+    migrations.upgrade(empty_db)
+
+    now = datetime.utcnow()
+    translations = [dict(MOCK_TRANSLATIONS[0],
+                         uid='uid{:07}'.format(i),
+                         # Only a few translations are pending
+                         status='new' if i % 100 == 0 else 'completed',
+                         text_length=i % 500,
+                         next_check_at=now,
+                         check_count=0)
+                    for i in range(ROWS)]
+
+    with empty_db.begin() as connection:
+        connection.execute(Translation.__table__.insert(), translations)
+        connection.execute(sa.text('ANALYZE'))
+
+    last_translation = Translation.get_all(limit=50)[-1]
+
+    queries = {
+        'pending': Translation.query_all_pending(now=now),
+        'listing': Translation.query_all(limit=50),
+        'listing page': Translation.query_all(
+            limit=50, after=Translation.decode_cursor(last_translation.cursor)),
+    }
+
+    for name, query in queries.items():
+        plan = _explain(empty_db, query)
+        assert not any(_is_sequential_scan(node) for node in plan), (name, plan)
@@ -1,6 +1,10 @@
 import pytest
+from datetime import datetime, timedelta
 
-from cervantes.models import Translation
+import cervantes.models as models
+from cervantes.models import Translation, TranslationsVersion
+
+from .mocks.data import MOCK_TRANSLATIONS
 
 
 class TestTranslation():
@@ -66,3 +70,176 @@ class TestTranslation():
 
         assert translations[0].dictify() == completed_translation
         assert translations[4].dictify() == new_translation
+
+    def test_get_all_pending_only_due(self, db):
+        """Pending translations are only returned once their check is due."""
+
+        pending_translation = Translation.query.get('uid0000005')
+        NOW = datetime.utcnow()
+
+        pending_translation.next_check_at = NOW + timedelta(minutes=5)
+        db.session.commit()
+
+        assert Translation.get_all_pending(now=NOW) == []
+        assert Translation.get_all_pending(
+            now=NOW + timedelta(minutes=5)) == [pending_translation]
+
+    def test_schedule_next_check_backoff(self, db):
+        """
+        The delay between checks doubles while nothing changes, is
+        capped, and starts over when the status changes.
+        """
+
+        translation = Translation(**MOCK_TRANSLATIONS[4])
+        NOW = translation.date_created
+
+        translation.schedule_next_check(reset=True, now=NOW)
+        first_delay = translation.next_check_at - NOW
+
+        translation.schedule_next_check(now=NOW)
+        assert translation.next_check_at - NOW == first_delay * 2
+        assert translation.check_count == 1
+
+        translation.schedule_next_check(now=NOW)
+        assert translation.next_check_at - NOW == first_delay * 4
+
+        for _ in range(30):
+            translation.schedule_next_check(now=NOW)
+        assert translation.next_check_at - NOW == models.CHECK_DELAY_MAX
+
+        translation.schedule_next_check(reset=True, now=NOW)
+        assert translation.next_check_at - NOW == first_delay
+        assert translation.check_count == 0
+
+    def test_schedule_next_check_seed(self, db):
+        """Long texts and old requests start with a longer delay."""
+
+        short_translation = Translation(**MOCK_TRANSLATIONS[4])
+        long_translation = Translation(**dict(MOCK_TRANSLATIONS[4], text='a' * 5000))
+        NOW = short_translation.date_created
+
+        short_translation.schedule_next_check(reset=True, now=NOW)
+        long_translation.schedule_next_check(reset=True, now=NOW)
+
+        assert short_translation.next_check_at - NOW < timedelta(seconds=31)
+        assert long_translation.next_check_at - NOW == timedelta(seconds=330)
+
+        short_translation.schedule_next_check(
+            reset=True, now=NOW + timedelta(hours=2))
+
+        assert short_translation.next_check_at - NOW == timedelta(hours=2, minutes=12)
+
+    def test_get_all_paginated(self, db):
+        """
+        Walking the listing a page at a time, with the cursor of the
+        last record of each page, yields the whole listing in order.
+        """
+
+        expected_order = [t.uid for t in Translation.get_all()]
+
+        translation_ids = []
+        after = None
+        while True:
+            page = Translation.get_all(limit=2, after=after)
+            if not page:
+                break
+            translation_ids.extend(t.uid for t in page)
+            after = Translation.decode_cursor(page[-1].cursor)
+
+        assert translation_ids == expected_order
+
+    def test_decode_cursor(self, db):
+        """A cursor decodes back into the listing key of its record."""
+
+        translation = Translation.query.get('uid0000004')
+
+        assert Translation.decode_cursor(translation.cursor) == (
+            translation.text_length, translation.date_updated, translation.uid)
+
+        with pytest.raises(ValueError):
+            Translation.decode_cursor('not a cursor')
+
+    def test_bulk_insert(self, db):
+        """
+        New translations are inserted together, with the defaults of
+        the columns they leave unset, and flag the session as written.
+        """
+
+        new_translations = [
+            Translation(**dict(MOCK_TRANSLATIONS[4], uid='uid0000b0{}'.format(i),
+                               date_created=None, date_updated=None))
+            for i in range(3)]
+        for translation in new_translations:
+            translation.schedule_next_check(reset=True)
+
+        Translation.bulk_insert(new_translations)
+
+        assert db.session.info[models.TRANSLATIONS_WRITTEN]
+        db.session.commit()
+
+        inserted = Translation.query.filter(Translation.uid.like('uid0000b0%')).all()
+        assert sorted(t.uid for t in inserted) == ['uid0000b00', 'uid0000b01', 'uid0000b02']
+        assert all(t.date_created is not None and t.date_created == t.date_updated
+                   for t in inserted)
+        assert all(t.change_seq == 0 for t in inserted)
+
+    def test_content_hash(self, db):
+        """
+        Requests differing only in whitespace, Unicode normalization or
+        the case of the language codes share their content hash.
+        """
+
+        assert models.content_hash('en', 'es', 'Sample text 1') == \
+            models.content_hash(' EN', 'es ', '  Sample\ttext \n 1 ')
+        assert models.content_hash('en', 'es', 'Caf\u00e9') == \
+            models.content_hash('en', 'es', 'Cafe\u0301')
+
+        assert models.content_hash('en', 'es', 'Sample text 1') != \
+            models.content_hash('en', 'es', 'sample text 1')
+        assert models.content_hash('en', 'es', 'Sample text 1') != \
+            models.content_hash('en', 'pt', 'Sample text 1')
+
+        # Set on insert
+        translation = Translation.query.get('uid0000001')
+        assert translation.content_hash == models.content_hash('en', 'es', 'Sample text 1')
+
+    def test_find_by_content_hashes(self, db):
+        """
+        Completed translations of the same content are reused first,
+        then pending ones; failed ones never are.
+        """
+
+        for uid, status in (('uid0000f01', 'failed'), ('uid0000f02', 'completed')):
+            db.session.add(Translation(**dict(MOCK_TRANSLATIONS[4], uid=uid, status=status)))
+        db.session.add(Translation(**dict(MOCK_TRANSLATIONS[4], uid='uid0000f03',
+                                          text='Sample text 6', status='failed')))
+        db.session.commit()
+
+        hashes = [models.content_hash('en', 'es', 'Sample text {}'.format(i))
+                  for i in (4, 5, 6)]
+        matches = Translation.find_by_content_hashes(hashes)
+
+        assert {content: translation.uid for content, translation in matches.items()} == {
+            hashes[0]: 'uid0000004', hashes[1]: 'uid0000f02'}
+
+        db.session.delete(Translation.query.get('uid0000f02'))
+        db.session.commit()
+
+        assert Translation.find_by_content_hashes(hashes[1:])[hashes[1]].uid == 'uid0000005'
+        assert Translation.find_by_content_hashes([]) == {}
+
+
+class TestTranslationsVersion():
+    def test_bump(self, db):
+        """Every bump counts one more change of the listing."""
+
+        assert TranslationsVersion.current() == (0, None)
+
+        now = datetime(2019, 12, 30, 15, 30, 45)
+        assert TranslationsVersion.bump(now) == 1
+        assert TranslationsVersion.bump(now + timedelta(seconds=1)) == 2
+        db.session.commit()
+
+        version, date_updated = TranslationsVersion.current()
+        assert version == 2
+        assert date_updated.replace(tzinfo=None) == now + timedelta(seconds=1)
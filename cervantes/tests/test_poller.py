@@ -0,0 +1,122 @@
+import cervantes.poller as poller
+from cervantes.models import Translation
+
+import sqlalchemy as sa
+
+from .mocks.data import MOCK_TRANSLATIONS
+
+import pytest
+
+
+def _add_pending_translations(db, count):
+    """Add count pending translations on top of the mocked ones."""
+
+    for i in range(count):
+        db.session.add(Translation(**dict(
+            MOCK_TRANSLATIONS[4], uid='uid00002{:02}'.format(i))))
+    db.session.commit()
+
+
+def test_poll_once(db, unbabel_server):
+    """Every pending translation is refreshed and committed, in batches."""
+
+    _add_pending_translations(db, 4)
+
+    refreshed, failed_batches = poller.poll_once(batch_size=2)
+
+    assert (refreshed, failed_batches) == (5, 0)
+
+    db.session.remove()
+    assert Translation.get_all_pending() == []
+
+
+def test_poll_once_loads_batches(db, unbabel_server, monkeypatch):
+    """
+    Pending translations are loaded a batch at a time, and the ones
+    left due by a batch aren't loaded again.
+    """
+
+    _add_pending_translations(db, 4)
+
+    limits = []
+    get_all_pending = Translation.get_all_pending
+
+    def spy_get_all_pending(**kwargs):
+        limits.append(kwargs['limit'])
+        return get_all_pending(**kwargs)
+
+    monkeypatch.setattr(Translation, 'get_all_pending', spy_get_all_pending)
+    # Somebody else holds every lock: nothing is refreshed, all stay due
+    monkeypatch.setattr(poller, '_update_translations', lambda batch: batch)
+
+    refreshed, failed_batches = poller.poll_once(batch_size=2)
+
+    assert (refreshed, failed_batches) == (5, 0)
+    assert limits == [2, 2, 2, 2]
+
+
+def test_poll_once_circuit_open(db, unbabel_server, monkeypatch):
+    """Nothing is polled while the Unbabel API is down."""
+
+    monkeypatch.setattr(poller.unbabelapi, 'is_available', lambda: False)
+
+    assert poller.poll_once() == (0, 0)
+    assert unbabel_server.requests == []
+
+
+def test_poll_once_failed_batch(db, unbabel_server):
+    """A failing batch doesn't hold back the other batches."""
+
+    _add_pending_translations(db, 3)
+
+    # Only the first request to the stand-in API fails
+    unbabel_server.statuses = [500]
+
+    refreshed, failed_batches = poller.poll_once(batch_size=2)
+
+    assert (refreshed, failed_batches) == (4, 1)
+
+    db.session.remove()
+    statuses = sorted(t.status for t in Translation.query.all()
+                      if t.uid.startswith('uid00002') or t.uid == 'uid0000005')
+    assert statuses == ['completed', 'completed', 'completed', 'new']
+    # The failed translation backs off instead of being retried right away
+    assert Translation.get_all_pending() == []
+
+
+def test_run_poller(db, unbabel_server):
+    """The poller polls the given number of cycles, sleeping in between."""
+
+    sleeps = []
+
+    polls = poller.run_poller(interval=10, cycles=3, sleep=sleeps.append)
+
+    assert polls == 3
+    assert len(sleeps) == 2
+    assert all(0 < seconds <= 10 for seconds in sleeps)
+
+
+def test_run_poller_database_error(app, db, unbabel_server, monkeypatch):
+    """A poll failing on the database doesn't stop the poller."""
+
+    polls = []
+
+    def poll_once(batch_size):
+        polls.append(batch_size)
+        if len(polls) == 1:
+            raise sa.exc.OperationalError('SELECT 1', {}, Exception('server closed'))
+        return 0, 0
+
+    monkeypatch.setattr(poller, 'poll_once', poll_once)
+
+    assert poller.run_poller(interval=0, cycles=2, sleep=lambda seconds: None) == 2
+    assert len(polls) == 2
+
+
+def test_poll_command(app, db, unbabel_server):
+    """The 'poll-translations' CLI command polls once with --once."""
+
+    result = app.test_cli_runner().invoke(args=['poll-translations', '--once'])
+
+    assert result.exit_code == 0
+    assert 'Refreshed 1 pending translation(s), 0 failed batch(es)' in result.output
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from cervantes.models import db as _db
+from cervantes.singleflight import SingleFlight, try_advisory_locks, wait_advisory_lock
+
+
+def _call_in_threads(count, function):
+    """Call function in count threads started one after the other."""
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(function()))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+class TestSingleFlight():
+    def test_do(self):
+        """Concurrent calls for the same key share a single call."""
+
+        single_flight = SingleFlight()
+        calls = []
+
+        def slow_call():
+            calls.append(None)
+            time.sleep(0.2)
+            return len(calls)
+
+        results = _call_in_threads(3, lambda: single_flight.do('key', slow_call))
+
+        assert results == [1, 1, 1]
+        assert single_flight.stats() == {'calls': 1, 'shared': 2, 'in_flight': 0}
+
+    def test_do_keys(self):
+        """Calls for different keys don't wait for each other."""
+
+        single_flight = SingleFlight()
+
+        assert single_flight.do('a', lambda: 1) == 1
+        assert single_flight.do('b', lambda: 2) == 2
+        # Nothing is cached once done
+        assert single_flight.do('a', lambda: 3) == 3
+
+    def test_do_error(self):
+        """The exception of a call is raised in every caller sharing it."""
+
+        single_flight = SingleFlight()
+
+        def failing_call():
+            time.sleep(0.2)
+            raise ValueError('Nope')
+
+        def call():
+            try:
+                single_flight.do('key', failing_call)
+            except ValueError as exc:
+                return str(exc)
+
+        assert _call_in_threads(2, call) == ['Nope', 'Nope']
+        assert single_flight.stats()['in_flight'] == 0
+
+
+def test_advisory_locks(app):
+    """Without PostgreSQL, every advisory lock is taken."""
+
+    assert try_advisory_locks(_db.session, 1, ['a', 'b']) == {'a', 'b'}
+    assert try_advisory_locks(_db.session, 1, []) == set()
+    wait_advisory_lock(_db.session, 1, 'a')
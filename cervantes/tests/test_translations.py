@@ -1,17 +1,25 @@
+import flask
 from flask import get_flashed_messages, jsonify
 
+from cervantes.cache import make_cache
+import cervantes.events as events
 import cervantes.translations as translations
 import cervantes.unbabelapi as unbabelapi
-from cervantes.models import Translation
+from cervantes.models import Translation, TranslationsVersion
 
-from .mocks.data import MOCK_TRANSLATIONS, MOCK_UPDATED_TRANSLATION, MOCK_LANGUAGE_PAIRS
+from .mocks.data import MOCK_TRANSLATIONS, MOCK_NEW_TRANSLATION, MOCK_UPDATED_TRANSLATION, MOCK_LANGUAGE_PAIRS
 from .mocks import _returnNone
 from .mocks.unbabelapi import UnababelAPIMocks
 from .mocks.translations import TranslationsMocks
 
 import pytest
+import sqlalchemy as sa
+import io
 import json
-from datetime import datetime
+import math
+import threading
+import time
+from datetime import datetime, timezone
 
 
 class TestTranslationsViews():
@@ -67,6 +75,259 @@ class TestTranslationsViews():
 
         assert translation_ids == EXPECTED_IDS
 
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_index_json_same_as_dictify(self, app, client, db, monkeypatch, use_orjson):
+        """
+        The JSON listing is built from plain rows (and with orjson, if
+        installed), but is byte for byte what jsonify makes of the
+        dictified Translation instances, non-ASCII text included.
+        """
+
+        # Debug mode pretty prints, and leaves it all to jsonify
+        monkeypatch.setitem(app.config, 'DEBUG', False)
+        if not use_orjson:
+            monkeypatch.setattr(translations, 'orjson', None)
+
+        db.session.add(Translation(**dict(
+            MOCK_TRANSLATIONS[3], uid='uid0000006',
+            text='Caf\u00e9 \u2028 \U0001f600 \x7f "quoted"\n',
+            translated_text='Caf\u00e9 \u00f1and\u00fa',
+            date_updated=datetime(2019, 12, 30, 15, 30, 45, 123456))))
+        db.session.commit()
+
+        EXPECTED_BODY = jsonify(
+            [t.dictify() for t in Translation.get_all(limit=100)]).get_data()
+
+        response = client.get('/translations/?format=json')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        assert response.get_data() == EXPECTED_BODY
+
+    def test_index_json_streamed(self, app, client, db, monkeypatch):
+        """
+        GET request to /translations?format=json&stream=true streams
+        the whole listing, as the same JSON array.
+        """
+
+        monkeypatch.setitem(app.config, 'DEBUG', False)
+        # Several batches, the last one partial
+        monkeypatch.setattr(translations, 'STREAM_BATCH_SIZE', 2)
+
+        EXPECTED_BODY = client.get('/translations/?format=json').get_data()
+
+        response = client.get('/translations/?format=json&stream=true')
+
+        assert response.is_streamed
+        assert response.mimetype == 'application/json'
+        assert response.get_data() == EXPECTED_BODY
+        assert 'X-Next-Cursor' not in response.headers
+
+    def test_index_ndjson(self, client, db):
+        """
+        GET request to /translations?format=ndjson streams one
+        translation object per line, in listing order.
+        """
+
+        EXPECTED_TRANSLATIONS = [t.dictify() for t in Translation.get_all()]
+
+        response = client.get('/translations/?format=ndjson')
+
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines] == EXPECTED_TRANSLATIONS
+
+    def test_index_ndjson_paginated(self, client, db):
+        """A streamed listing starts after the given cursor, if any."""
+
+        EXPECTED_TRANSLATIONS = [t.dictify() for t in Translation.get_all()][2:4]
+        cursor = Translation.get_all()[1].cursor
+
+        response = client.get(
+            '/translations/?format=ndjson&limit=2&after={}'.format(cursor))
+
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines] == EXPECTED_TRANSLATIONS
+
+    def test_index_html_streamed(self, client, db):
+        """
+        GET request to /translations?stream=true streams the same HTML
+        table.
+        """
+
+        EXPECTED_BODY = client.get('/translations/').get_data()
+
+        response = client.get('/translations/?stream=true')
+
+        assert response.is_streamed
+        assert response.mimetype == 'text/html'
+        assert response.get_data() == EXPECTED_BODY
+
+    def test_index_not_modified(self, client, db, monkeypatch):
+        """
+        GET request to /translations with the validators of the last
+        response gets a 304 Not Modified, without loading any
+        translation.
+        """
+
+        response = client.get('/translations/?format=json')
+        etag = response.headers['ETag']
+
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert response.last_modified is not None
+
+        def load_translations(*args, **kwargs):
+            pytest.fail('The translations were loaded')
+
+        monkeypatch.setattr(Translation, 'query_all_rows', load_translations)
+
+        response = client.get('/translations/?format=json',
+                              headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['ETag'] == etag
+
+    def test_index_modified(self, client, db, monkeypatch):
+        """
+        A new translation changes the validators of the listing, so
+        the conditional request gets the whole listing again.
+        """
+
+        INPUTS = {
+            'source-language': 'en',
+            'target-language': 'es',
+            'text': 'Example text'
+        }
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi,
+                            'request_translation', TranslationsMocks._returnNewTranslation)
+
+        etag = client.get('/translations/?format=json').headers['ETag']
+
+        client.post('/translations/', data=INPUTS)
+
+        response = client.get('/translations/?format=json',
+                              headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert len(json.loads(response.get_data())) == len(MOCK_TRANSLATIONS) + 1
+
+    def test_index_since(self, client, db, monkeypatch):
+        """
+        GET request to /translations?since=<cursor> only returns the
+        translations created or changed since the cursor.
+        """
+
+        INPUTS = {
+            'source-language': 'en',
+            'target-language': 'es',
+            'text': 'Example text'
+        }
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi,
+                            'request_translation', TranslationsMocks._returnNewTranslation)
+
+        cursor = client.get('/translations/?format=json').headers['X-Sync-Cursor']
+
+        response = client.get('/translations/?format=json&since={}'.format(cursor))
+        assert json.loads(response.get_data()) == []
+        assert response.headers['X-Sync-Cursor'] == cursor
+
+        client.post('/translations/', data=INPUTS)
+
+        response = client.get('/translations/?format=json&since={}'.format(cursor))
+        assert [t['uid'] for t in json.loads(response.get_data())] == [MOCK_NEW_TRANSLATION['uid']]
+        assert response.headers['X-Sync-Cursor'] != cursor
+        assert 'X-Sync-More' not in response.headers
+
+        cursor = response.headers['X-Sync-Cursor']
+        response = client.get('/translations/?since={}'.format(cursor))
+        assert response.status_code == 200
+        assert b'<tr' not in response.get_data()
+
+    def test_index_since_paginated(self, client, db, unbabel_server):
+        """
+        The changes are sent limit at a time, even when a single
+        version changed more translations than that.
+        """
+
+        cursor = client.get('/translations/?format=json').headers['X-Sync-Cursor']
+
+        for i in range(4):
+            db.session.add(Translation(**dict(
+                MOCK_TRANSLATIONS[4], uid='uid00001{:02}'.format(i))))
+        db.session.commit()
+
+        # A single refresh completes the 5 pending translations
+        client.get('/translations/?refresh=true&format=json')
+
+        synced_uids = []
+        more = 'true'
+        while more == 'true':
+            response = client.get('/translations/?format=json&limit=2&since={}'.format(cursor))
+            page = json.loads(response.get_data())
+            assert len(page) <= 2
+            synced_uids.extend(t['uid'] for t in page)
+            cursor = response.headers['X-Sync-Cursor']
+            more = response.headers.get('X-Sync-More')
+
+        assert sorted(synced_uids) == ['uid0000005'] + [
+            'uid00001{:02}'.format(i) for i in range(4)]
+
+    @pytest.mark.parametrize('since', ['x', '-1', '1.', '1.u-1'])
+    def test_index_since_invalid(self, client, db, since):
+        """GET request to /translations with an invalid 'since' cursor."""
+
+        response = client.get('/translations/?since={}'.format(since))
+
+        assert response.status_code == 400
+
+    def test_index_paginated(self, client, db):
+        """
+        GET request to /translations a page at a time, following the
+        next page cursor.
+        """
+
+        EXPECTED_ORDER = [t.uid for t in Translation.get_all()]
+
+        response = client.get('/translations/?format=json&limit=3')
+        first_page = json.loads(response.get_data())
+        next_cursor = response.headers['X-Next-Cursor']
+
+        assert [t['uid'] for t in first_page] == EXPECTED_ORDER[:3]
+        assert 'after={}'.format(next_cursor) in response.headers['Link']
+
+        response = client.get(
+            '/translations/?format=json&limit=3&after={}'.format(next_cursor))
+        second_page = json.loads(response.get_data())
+
+        assert [t['uid'] for t in second_page] == EXPECTED_ORDER[3:]
+        assert 'X-Next-Cursor' not in response.headers
+
+        # Following HTML pages are only rows, no table
+        last_cursor = Translation.query.get(EXPECTED_ORDER[-1]).cursor
+        response = client.get('/translations/?after={}'.format(last_cursor))
+
+        assert response.status_code == 200
+        assert b'<table' not in response.get_data()
+
+    def test_index_paginated_invalid_args(self, client, db):
+        """
+        GET request to /translations with invalid pagination arguments
+        is a bad request.
+        """
+
+        assert client.get('/translations/?limit=ten').status_code == 400
+        assert client.get('/translations/?after=notacursor').status_code == 400
+
     def test_index_update_translations_API_error(self, client, monkeypatch):
         """
         GET request to /translations flashes a message into the session
@@ -80,10 +341,28 @@ class TestTranslationsViews():
         EXPECTED_FLASH = 'Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.'
 
         with client:
-            response = client.get('/translations', follow_redirects=True)
+            response = client.get('/translations?refresh=true', follow_redirects=True)
 
             assert EXPECTED_FLASH in get_flashed_messages()
 
+    def test_index_does_not_refresh(self, client, monkeypatch, db):
+        """
+        GET request to /translations only reads from the database,
+        unless a refresh is asked for.
+        """
+
+        refreshed = []
+        monkeypatch.setattr(translations, '_update_translations',
+                            lambda pending, **kwargs: refreshed.append(pending))
+
+        client.get('/translations/?format=json')
+
+        assert refreshed == []
+
+        client.get('/translations/?format=json&refresh=true')
+
+        assert [[t.uid for t in pending] for pending in refreshed] == [['uid0000005']]
+
     def test_add_translation(self, client, monkeypatch):
         """
         POST request to /translations with valid inputs.
@@ -108,6 +387,38 @@ class TestTranslationsViews():
 
             assert len(get_flashed_messages()) == 0
 
+    def test_add_translation_language_pairs_cached(self, client, monkeypatch, db):
+        """
+        POST requests to /translations validate the language pair
+        against the cached pairs, so only the first one fetches them.
+        """
+
+        INPUTS = {
+            'source-language': 'en',
+            'target-language': 'es',
+            'text': 'Example text'
+        }
+
+        language_pair_calls = []
+
+        def request_language_pairs():
+            language_pair_calls.append(1)
+            return MOCK_LANGUAGE_PAIRS
+
+        new_translations = iter([dict(MOCK_NEW_TRANSLATION, uid='uid0000n01'),
+                                 dict(MOCK_NEW_TRANSLATION, uid='uid0000n02')])
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', request_language_pairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation',
+                            lambda *args: next(new_translations))
+
+        client.post('/translations/', data=INPUTS)
+        client.post('/translations/', data=INPUTS)
+
+        assert len(language_pair_calls) == 1
+        assert Translation.query.get('uid0000n02') is not None
+
     def test_add_translation_no_inputs_provided(self, client):
         """
         POST request to /translations with none of the required inputs.
@@ -204,6 +515,569 @@ class TestTranslationsViews():
 
             assert EXPECTED_FLASH in get_flashed_messages()
 
+    def test_circuit_open(self, client, db, unbabel_server):
+        """
+        While the Unbabel API is down, the listing is served from the
+        database right away, and new translations fail fast.
+        """
+
+        EXPECTED_FLASH = 'Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.'
+
+        breaker = unbabelapi.get_client().breaker
+        for _ in range(breaker.minimum_calls):
+            breaker.record(0, failed=True)
+        assert not unbabelapi.is_available()
+
+        with client:
+            response = client.get('/translations/?refresh=true&format=json')
+
+            assert EXPECTED_FLASH in get_flashed_messages()
+            rows = json.loads(response.get_data())
+            assert len(rows) == len(MOCK_TRANSLATIONS)
+            assert response.headers['X-Stale-Translations'] == '*'
+            # Any pending translation may be out of date
+            assert [t['uid'] for t in rows if t.get('stale')] == ['uid0000005']
+
+        # Pages with stale rows flagged aren't served to other requests
+        rows = json.loads(client.get('/translations/?format=json').get_data())
+        assert not any('stale' in t for t in rows)
+
+        with client:
+            client.post('/translations/', data={
+                'source-language': 'en', 'target-language': 'es', 'text': 'Example text'})
+
+            assert EXPECTED_FLASH in get_flashed_messages()
+
+        assert unbabel_server.requests == []
+        metrics = json.loads(client.get('/translations/metrics').get_data())
+        assert metrics['unbabel']['circuit_breaker']['state'] == 'open'
+
+    @staticmethod
+    def _request_translation(source_lang, target_lang, text, wait=None):
+        """Stand-in for request_translation, the UID taken from the text."""
+
+        if text == 'Fail':
+            raise unbabelapi.UnbabelAPIError('Unbabel is down')
+
+        return dict(MOCK_NEW_TRANSLATION, uid='uid00bat{:02}'.format(int(text.split()[-1])),
+                    source_language=source_lang, target_language=target_lang, text=text)
+
+    def test_add_translations(self, app, client, db, monkeypatch):
+        """
+        POST request to /translations/batch with a JSON array validates
+        the language pairs once, submits the valid items, and inserts
+        the new translations with a single statement, reporting the
+        outcome of each item.
+        """
+
+        ITEMS = [
+            {'source': 'en', 'target': 'es', 'text': 'Text 1'},
+            ['en', 'es', 'Text 2'],
+            {'source_language': 'en', 'target_language': 'es', 'text': 'Text 3'},
+            {'source': 'en', 'target': 'languagecodethatdefinitelydoesnotexist',
+             'text': 'Text 4'},
+            {'source': 'en', 'target': 'es'},
+            ['en', 'es', 'Fail'],
+        ]
+
+        language_pair_calls = []
+
+        def request_language_pairs():
+            language_pair_calls.append(1)
+            return MOCK_LANGUAGE_PAIRS
+
+        monkeypatch.setattr(unbabelapi, 'request_language_pairs', request_language_pairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith('INSERT INTO translations '):
+                statements.append(statement)
+
+        subscription = events.broker.subscribe()
+        sa.event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            response = client.post('/translations/batch', json=ITEMS)
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', record_statement)
+            events.broker.unsubscribe(subscription)
+
+        body = json.loads(response.get_data())
+
+        assert response.status_code == 200
+        assert (body['submitted'], body['failed']) == (3, 3)
+        assert [result['ok'] for result in body['results']] == [True] * 3 + [False] * 3
+        assert [result['uid'] for result in body['results'][:3]] == [
+            'uid00bat01', 'uid00bat02', 'uid00bat03']
+        assert body['results'][3]['error'] == 'Language pair not available'
+        assert body['results'][4]['error'] == 'Missing source, target or text'
+        assert body['results'][5]['error'] == 'Unbabel is down'
+
+        assert len(language_pair_calls) == 1
+        assert len(statements) == 1
+
+        new_translations = Translation.query.filter(Translation.uid.like('uid00bat%')).all()
+        assert len(new_translations) == 3
+        assert len({t.change_seq for t in new_translations}) == 1
+        assert all(t.next_check_at > t.date_created for t in new_translations)
+        assert {subscription.get(timeout=0)['uid'] for _ in range(3)} == {
+            'uid00bat01', 'uid00bat02', 'uid00bat03'}
+
+    def test_add_translations_chunked(self, app, client, db, monkeypatch):
+        """
+        New translations are committed BATCH_COMMIT_SIZE at a time, and
+        the ones of a chunk that can't be saved are reported as failed.
+        """
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+        monkeypatch.setattr(translations, 'BATCH_COMMIT_SIZE', 2)
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_SUBMIT_WORKERS', 1)
+
+        bulk_insert = Translation.bulk_insert
+        chunks = []
+
+        def failing_bulk_insert(new_records):
+            chunks.append([t.uid for t in new_records])
+            if len(chunks) == 2:
+                raise sa.exc.OperationalError('INSERT', {}, Exception('database is locked'))
+            bulk_insert(new_records)
+
+        monkeypatch.setattr(Translation, 'bulk_insert', failing_bulk_insert)
+
+        response = client.post('/translations/batch', json=[
+            ['en', 'es', 'Text {}'.format(i)] for i in range(1, 6)])
+        body = json.loads(response.get_data())
+
+        assert chunks == [['uid00bat01', 'uid00bat02'], ['uid00bat03', 'uid00bat04'],
+                          ['uid00bat05']]
+        assert (body['submitted'], body['failed']) == (3, 2)
+        assert body['results'][2] == {
+            'index': 2, 'ok': False, 'uid': 'uid00bat03',
+            'error': 'The translation couldn\'t be saved (OperationalError)'}
+
+        saved = Translation.query.filter(Translation.uid.like('uid00bat%')).all()
+        assert sorted(t.uid for t in saved) == ['uid00bat01', 'uid00bat02', 'uid00bat05']
+        assert len({t.change_seq for t in saved}) == 2
+
+    @pytest.mark.parametrize('filename, document', [
+        ('batch.csv', 'source,target,text\nen,es,Text 1\nen,es,"Text, 2"\n'),
+        ('batch.csv', 'en,es,Text 1\n\nen,es,"Text, 2"\n'),
+        ('batch.ndjson', '{"source": "en", "target": "es", "text": "Text 1"}\n'
+                         '["en", "es", "Text, 2"]\n'),
+        ('batch.json', '[["en", "es", "Text 1"], ["en", "es", "Text, 2"]]'),
+    ])
+    def test_add_translations_file(self, client, db, monkeypatch, filename, document):
+        """A batch can be uploaded as a CSV, NDJSON or JSON file."""
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+
+        response = client.post('/translations/batch', data={
+            'file': (io.BytesIO(document.encode('utf-8')), filename)})
+        body = json.loads(response.get_data())
+
+        assert body['submitted'] == 2
+        assert Translation.query.get('uid00bat02').text == 'Text, 2'
+
+    def test_add_translations_ndjson_body(self, client, db, monkeypatch):
+        """A CSV or NDJSON batch can be the request body itself."""
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+
+        response = client.post('/translations/batch', data='["en", "es", "Text 1"]\n',
+                               content_type='application/x-ndjson')
+
+        assert json.loads(response.get_data())['submitted'] == 1
+
+    def test_add_translations_ndjson_invalid_line(self, client, db, monkeypatch):
+        """An NDJSON line that isn't JSON only fails its own item."""
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+
+        response = client.post('/translations/batch',
+                               data='["en", "es", "Text 1"]\n\n{"source": "en",\n'
+                                    '["en", "es", "Text 2"]\n',
+                               content_type='application/x-ndjson')
+        body = json.loads(response.get_data())
+
+        assert response.status_code == 200
+        assert (body['submitted'], body['failed']) == (2, 1)
+        assert body['results'][1]['error'].startswith('Invalid JSON on line 3')
+
+    def test_add_translations_invalid(self, client, db, monkeypatch):
+        """Batches that can't be read, or are too large, are rejected whole."""
+
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+
+        assert client.post('/translations/batch', data='[',
+                           content_type='application/json').status_code == 400
+        assert client.post('/translations/batch', json={'text': 'Text 1'}).status_code == 400
+        assert client.post('/translations/batch', json=[]).status_code == 400
+        assert client.post('/translations/batch', data='Text 1',
+                           content_type='text/plain').status_code == 400
+        assert client.post('/translations/batch', json=[
+            ['en', 'es', 'Text {}'.format(i)]
+            for i in range(translations.MAX_BATCH_SIZE + 1)]).status_code == 413
+
+        assert Translation.query.count() == len(MOCK_TRANSLATIONS)
+
+    def test_add_translations_API_error(self, client, db, monkeypatch):
+        """Without the language pairs, or while the Unbabel API is down, nothing is submitted."""
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', UnababelAPIMocks._raiseUnbabelAPIError)
+        monkeypatch.setattr(unbabelapi, 'request_translation', self._request_translation)
+
+        response = client.post('/translations/batch', json=[['en', 'es', 'Text 1']])
+        assert response.status_code == 503
+
+        monkeypatch.setattr(unbabelapi, 'is_available', lambda: False)
+
+        response = client.post('/translations/batch', json=[['en', 'es', 'Text 1']])
+        assert response.status_code == 503
+
+        assert Translation.query.get('uid00bat01') is None
+
+    def test_add_translation_memory(self, client, db, monkeypatch):
+        """
+        POST request to /translations with content translated (or
+        being translated) already reuses that translation, without
+        calling the Unbabel API, and counts as a hit of the memory.
+        """
+
+        new_translations = []
+
+        def request_translation(*args):
+            new_translations.append(args)
+            return MOCK_NEW_TRANSLATION
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', request_translation)
+
+        for text in ('Sample text 1', ' Sample  text 5', 'New text please', 'New text please'):
+            client.post('/translations/', data={
+                'source-language': 'en', 'target-language': 'es', 'text': text})
+
+        assert new_translations == [('en', 'es', 'New text please')]
+        assert Translation.query.count() == len(MOCK_TRANSLATIONS) + 1
+
+        metrics = json.loads(client.get('/translations/metrics').get_data())
+        assert metrics['translation_memory'] == {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+
+    def test_add_translations_memory(self, client, db, monkeypatch):
+        """
+        A batch doesn't request the content translated already, nor the
+        same content twice.
+        """
+
+        submitted = []
+
+        def request_translation(*args, **kwargs):
+            submitted.append(args)
+            return self._request_translation(*args, **kwargs)
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi, 'request_translation', request_translation)
+
+        response = client.post('/translations/batch', json=[
+            ['en', 'es', 'Sample text 1'], ['en', 'es', 'Text 1'], ['en', 'es', 'Text  1 ']])
+        body = json.loads(response.get_data())
+
+        assert submitted == [('en', 'es', 'Text 1')]
+        assert (body['submitted'], body['failed']) == (1, 0)
+        assert [(result['uid'], result['reused']) for result in body['results']] == [
+            ('uid0000001', True), ('uid00bat01', False), ('uid00bat01', True)]
+
+        metrics = json.loads(client.get('/translations/metrics').get_data())
+        assert metrics['translation_memory']['hits'] == 2
+
+    @staticmethod
+    def _wait_for(condition, timeout=5):
+        """Wait for a condition to hold, timeout seconds at most."""
+
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        return condition()
+
+    def test_get_suggestions(self, app, client, db, monkeypatch):
+        """
+        GET request to /translations/suggest returns the completed
+        translations of similar texts, the most similar first, without
+        calling the Unbabel API nor syncing the memory.
+        """
+
+        monkeypatch.setitem(app.config, 'DEBUG', False)
+        monkeypatch.setattr(unbabelapi,
+                            'request_translation', UnababelAPIMocks._raiseUnbabelAPIError)
+
+        translations._start_fuzzy_memory_sync()
+        assert self._wait_for(lambda: translations.fuzzy_memory.version is not None)
+
+        syncs = []
+        monkeypatch.setattr(translations.fuzzy_memory, 'sync', lambda: syncs.append(1))
+
+        response = client.get('/translations/suggest', query_string={
+            'source': 'en', 'target': 'es', 'text': 'sample  text 3!', 'limit': 2})
+        suggestions = json.loads(response.get_data())
+
+        assert response.mimetype == 'application/json'
+        assert suggestions[0] == {'uid': 'uid0000003', 'text': 'Sample text 3',
+                                  'translated_text': 'El sample text tres', 'similarity': 1}
+        assert len(suggestions) == 2
+        assert 'uid0000005' not in [s['uid'] for s in suggestions]
+
+        response = client.get('/translations/suggest', query_string={
+            'source': 'en', 'target': 'pt', 'text': 'Sample text 3'})
+        assert json.loads(response.get_data()) == []
+
+        metrics = json.loads(client.get('/translations/metrics').get_data())
+        assert metrics['fuzzy_memory']['size'] == 4
+        assert metrics['fuzzy_memory']['hit_rate'] == 0.5
+        assert syncs == []
+
+    def test_get_suggestions_synced_on_completion(self, app, client, db):
+        """Translations are suggested as soon as their completion commits."""
+
+        client.get('/translations/suggest', query_string={
+            'source': 'en', 'target': 'es', 'text': 'Sample text 5'})
+        assert self._wait_for(lambda: translations.fuzzy_memory.version is not None)
+
+        translation = Translation.query.get('uid0000005')
+        translation.status = 'completed'
+        translation.translated_text = 'El sample text cinco'
+        translation.change_seq = TranslationsVersion.bump()
+        events.record(db.session, {'uid': translation.uid, 'status': 'completed',
+                                   'change_seq': translation.change_seq})
+        db.session.commit()
+
+        def suggested():
+            response = client.get('/translations/suggest', query_string={
+                'source': 'en', 'target': 'es', 'text': 'Sample text 5'})
+            return json.loads(response.get_data())[0]['uid'] == 'uid0000005'
+
+        assert self._wait_for(suggested)
+
+    @pytest.mark.parametrize('query_string', [
+        {'target': 'es', 'text': 'Sample text 3'},
+        {'source': 'en', 'target': 'es', 'text': ' '},
+        {'source': 'en', 'target': 'es', 'text': 'Sample text 3', 'limit': 'many'},
+    ])
+    def test_get_suggestions_invalid_args(self, client, db, query_string):
+        """GET request to /translations/suggest without valid arguments."""
+
+        response = client.get('/translations/suggest', query_string=query_string)
+
+        assert response.status_code == 400
+
+    def test_stream_translation_events(self, app, client, db, monkeypatch):
+        """
+        GET request to /translations/stream pushes the committed
+        translation events as Server-Sent Events, until the stream
+        times out.
+        """
+
+        broker = events.Broker()
+        monkeypatch.setattr(events, 'broker', broker)
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_STREAM_TIMEOUT', 0.3)
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_STREAM_HEARTBEAT', 0.1)
+
+        response = client.get('/translations/stream')
+
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert broker.subscribers == 1
+
+        EVENT = {'uid': 'uid0000005', 'status': 'completed', 'change_seq': 7}
+        events.record(db.session, EVENT)
+        db.session.commit()
+
+        body = response.get_data(as_text=True)
+
+        assert body.startswith('retry: ')
+        assert 'id: 7\nevent: translation\ndata: {}\n\n'.format(json.dumps(EVENT)) in body
+        assert ': keep-alive' in body
+        assert broker.subscribers == 0
+
+    def test_stream_translation_events_capped(self, app, client, db, monkeypatch):
+        """
+        Beyond TRANSLATIONS_STREAM_MAX_OPEN open streams, new ones get a
+        503, until a stream closes (even unread).
+        """
+
+        broker = events.Broker()
+        monkeypatch.setattr(events, 'broker', broker)
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_STREAM_MAX_OPEN', 2)
+
+        streams = [client.get('/translations/stream') for _ in range(2)]
+        busy_response = client.get('/translations/stream')
+
+        assert [response.status_code for response in streams] == [200, 200]
+        assert busy_response.status_code == 503
+        assert busy_response.headers['Retry-After'] == str(translations.STREAM_BUSY_RETRY_AFTER)
+        assert broker.subscribers == 2
+        metrics = json.loads(client.get('/translations/metrics').get_data())
+        assert metrics['open_streams'] == 2
+
+        streams[0].close()
+        streams[0].close()
+        assert broker.subscribers == 1
+
+        response = client.get('/translations/stream')
+        assert response.status_code == 200
+
+        for response in streams[1:] + [response]:
+            response.close()
+        assert translations._open_streams == 0
+        assert broker.subscribers == 0
+
+    def test_add_translation_event(self, client, db, monkeypatch):
+        """A new translation is published as a translation event."""
+
+        INPUTS = {
+            'source-language': 'en',
+            'target-language': 'es',
+            'text': 'Example text'
+        }
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+        monkeypatch.setattr(unbabelapi,
+                            'request_translation', TranslationsMocks._returnNewTranslation)
+
+        subscription = events.broker.subscribe()
+        try:
+            client.post('/translations/', data=INPUTS)
+            event = subscription.get(timeout=0)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+        assert event['uid'] == MOCK_NEW_TRANSLATION['uid']
+        assert event['status'] == MOCK_NEW_TRANSLATION['status']
+
+    def test_row_cache(self, app):
+        """
+        Rows of finished translations are rendered once, rows of
+        pending ones every time.
+        """
+
+        date = datetime(2019, 12, 30, 15, 30, 45, tzinfo=timezone.utc)
+        completed_translation = Translation(**dict(
+            MOCK_TRANSLATIONS[3], date_created=date, date_updated=date))
+        pending_translation = Translation(**dict(
+            MOCK_TRANSLATIONS[4], date_created=date, date_updated=date))
+
+        with app.test_request_context():
+            for _ in range(3):
+                completed_html = translations._render_row(completed_translation)
+                pending_html = translations._render_row(pending_translation)
+
+        assert 'data-uid="uid0000004"' in completed_html
+        assert 'Translated' in completed_html
+        assert 'data-uid="uid0000005"' in pending_html
+        assert 'stale' not in pending_html
+        assert translations.row_html_cache.stats()['hits'] == 2
+        assert translations.row_html_cache.stats()['misses'] == 1
+
+        # Rows the refresh of the request couldn't get to are flagged
+        with app.test_request_context():
+            flask.g.stale_uids = {'uid0000005'}
+            assert 'class="stale' in translations._render_row(pending_translation)
+            assert 'stale' not in translations._render_row(completed_translation)
+
+    def test_row_cache_json(self, app, client, db, monkeypatch):
+        """
+        The JSON listing serves the rows of finished translations from
+        the cache, with the same bytes.
+        """
+
+        monkeypatch.setitem(app.config, 'DEBUG', False)
+        # Rendering the page twice, not serving it from the listing cache
+        monkeypatch.setattr(translations, 'listing_cache', None)
+
+        first_body = client.get('/translations/?format=json').get_data()
+        second_body = client.get('/translations/?format=json').get_data()
+
+        # 4 completed translations, 1 pending
+        assert first_body == second_body
+        assert translations.row_json_cache.stats()['misses'] == 4
+        assert translations.row_json_cache.stats()['hits'] == 4
+
+        metrics = json.loads(client.get('/translations/metrics').get_data())
+        assert metrics['row_cache']['json']['hit_rate'] == 0.5
+
+    @pytest.mark.parametrize('backend', ['memory', 'filesystem', 'sqlite'])
+    def test_listing_cache(self, app, client, db, monkeypatch, tmp_path, backend):
+        """
+        Pages of the listing are served from the listing cache until a
+        translation is written, whatever the backend.
+        """
+
+        monkeypatch.setattr(translations, 'listing_cache', make_cache(
+            backend, path=str(tmp_path / 'cache')))
+
+        first_response = client.get('/translations/?format=json&limit=2')
+        second_response = client.get('/translations/?format=json&limit=2')
+
+        assert translations.listing_cache.stats()['hits'] == 1
+        assert second_response.get_data() == first_response.get_data()
+        assert second_response.headers['X-Next-Cursor'] == \
+            first_response.headers['X-Next-Cursor']
+        assert 'rel="next"' in second_response.headers['Link']
+
+        # A write to the translations, even one the listing doesn't show
+        translation = Translation.query.filter_by(uid='uid0000005').one()
+        translation.check_count += 1
+        db.session.commit()
+
+        assert len(translations.listing_cache) == 0
+
+        client.get('/translations/?format=json&limit=2')
+        assert translations.listing_cache.stats()['hits'] == 0
+
+    def test_listing_cache_rollback(self, app, client, db):
+        """Writes rolled back leave the listing cache alone."""
+
+        client.get('/translations/?format=json')
+
+        translation = Translation.query.filter_by(uid='uid0000005').one()
+        translation.check_count += 1
+        db.session.flush()
+        db.session.rollback()
+        # Nothing written to the translations
+        db.session.commit()
+
+        assert len(translations.listing_cache) == 1
+
+    def test_listing_cache_race(self, app, client, db, monkeypatch):
+        """A page rendered across a commit isn't cached."""
+
+        render_page = translations._render_page
+
+        def render_page_then_commit(*args):
+            response = render_page(*args)
+            translation = Translation.query.filter_by(uid='uid0000005').one()
+            translation.check_count += 1
+            db.session.commit()
+            return response
+
+        monkeypatch.setattr(translations, '_render_page', render_page_then_commit)
+
+        client.get('/translations/?format=json')
+
+        assert len(translations.listing_cache) == 0
+
     def test_get_language_pairs(self, client, monkeypatch):
         """
         GET request to /translations/language_pairs but something goes
@@ -221,6 +1095,35 @@ class TestTranslationsViews():
 
         assert EXPECTED_LANGUAGE_PAIRS == json.loads(response.get_data())
 
+    def test_get_language_pairs_conditional(self, client, monkeypatch):
+        """
+        GET request to /translations/language_pairs carries caching
+        headers, and answers 304 Not Modified to a matching
+        If-None-Match.
+        """
+
+        monkeypatch.setattr(unbabelapi,
+                            'request_language_pairs', TranslationsMocks._returnLanguagePairs)
+
+        response = client.get('/translations/language_pairs')
+        etag = response.headers['ETag']
+
+        assert response.status_code == 200
+        assert etag == '"{}"'.format(unbabelapi.language_pairs.get().etag)
+        assert 'max-age=3600' in response.headers['Cache-Control']
+        assert 'stale-while-revalidate=86400' in response.headers['Cache-Control']
+
+        response = client.get('/translations/language_pairs',
+                              headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.get_data() == b''
+
+        response = client.get('/translations/language_pairs',
+                              headers={'If-None-Match': '"stale-etag"'})
+
+        assert response.status_code == 200
+
     def test_get_language_pairs_API_error(self, client, monkeypatch):
         """
         GET request to /translations/language_pairs but something goes
@@ -269,7 +1172,15 @@ class TestTranslationsHelpers():
         translations._update_translations(PENDING_TRANSLATIONS)
 
         for expected_translation, pending_translation in zip(EXPECTED_TRANSLATIONS, PENDING_TRANSLATIONS):
-            assert expected_translation.dictify() == pending_translation.dictify()
+            expected = expected_translation.dictify()
+            updated = pending_translation.dictify()
+            # The status changed, so it counts as an update
+            assert updated.pop('date_updated') > expected.pop('date_updated')
+            assert expected == updated
+
+        # Written to the database, not only to the instances
+        db.session.expire_all()
+        assert Translation.query.get('uid0000005').status == 'completed'
 
     def test_update_translations_not_updated(self, client, monkeypatch, db):
         """
@@ -292,6 +1203,60 @@ class TestTranslationsHelpers():
         for expected_translation, pending_translation in zip(EXPECTED_TRANSLATIONS, PENDING_TRANSLATIONS):
             assert expected_translation.dictify() == pending_translation.dictify()
 
+        # Only the polling schedule moved
+        db.session.expire_all()
+        stored_translation = Translation.query.get('uid0000005')
+        assert stored_translation.dictify() == EXPECTED_TRANSLATIONS[0].dictify()
+        assert stored_translation.check_count == 1
+
+    def test_update_translations_batched(self, client, db, unbabel_server):
+        """
+        The fresh data is written with one UPDATE statement for the
+        translations whose status changed and one for the schedule of
+        the others, however many translations there are.
+        """
+
+        for i in range(6):
+            db.session.add(Translation(**dict(
+                MOCK_TRANSLATIONS[4], uid='uid00001{:02}'.format(i))))
+        db.session.commit()
+
+        pending_translations = Translation.get_all_pending()
+        assert len(pending_translations) == 7
+
+        # Half of them are still being translated
+        for translation in pending_translations[::2]:
+            unbabel_server.translations[translation.uid] = dict(
+                MOCK_UPDATED_TRANSLATION, uid=translation.uid, status='new')
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith('UPDATE translations SET'):
+                statements.append((statement, executemany))
+
+        engine = db.engine
+        sa.event.listen(engine, 'before_cursor_execute', record_statement)
+        try:
+            translations._update_translations(pending_translations)
+            db.session.commit()
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', record_statement)
+
+        assert len(statements) == 2
+        assert all(executemany for _, executemany in statements)
+
+        db.session.expire_all()
+        for translation in Translation.query.filter(
+                Translation.uid.in_([t.uid for t in pending_translations])):
+            if translation.status == 'new':
+                assert translation.check_count == 1
+                assert translation.dictify()['date_updated'] == '2019-12-30 15:30:45'
+            else:
+                assert translation.status == 'completed'
+                assert translation.check_count == 0
+                assert translation.dictify()['date_updated'] != '2019-12-30 15:30:45'
+
     def test_update_translations_API_error(self, client, monkeypatch, db):
         """
         An API error gets raised on the call to the Unbabel API to
@@ -306,3 +1271,196 @@ class TestTranslationsHelpers():
 
         with pytest.raises(unbabelapi.UnbabelAPIError):
             translations._update_translations(pending_translations)
+
+    def test_update_translations_concurrent(self, client, db, unbabel_server):
+        """
+        The Unbabel API calls for the pending translations run
+        concurrently, so the refresh takes about
+        ceil(pending / workers) * latency instead of
+        pending * latency.
+        """
+
+        PENDING = 8
+        WORKERS = 4
+        LATENCY = 0.2
+
+        for i in range(PENDING - 1):
+            db.session.add(Translation(**dict(
+                MOCK_TRANSLATIONS[4], uid='uid00001{:02}'.format(i))))
+        db.session.commit()
+
+        pending_translations = Translation.get_all_pending()
+        assert len(pending_translations) == PENDING
+
+        unbabel_server.latency = LATENCY
+
+        start = time.perf_counter()
+        translations._update_translations(
+            pending_translations, max_in_flight=WORKERS)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed >= math.ceil(PENDING / WORKERS) * LATENCY
+        assert elapsed < PENDING * LATENCY / 2
+        assert all(t.status == 'completed' for t in pending_translations)
+
+    def test_fetch_translation_updates_coalesced(self, app, unbabel_server):
+        """Concurrent lookups of the same UID share one Unbabel API call."""
+
+        unbabel_server.latency = 0.2
+
+        updates, errors = translations._fetch_translation_updates(
+            ['uid0000005'] * 4, max_in_flight=4)
+
+        assert updates['uid0000005']['status'] == 'completed'
+        assert not errors
+        assert len(unbabel_server.requests) == 1
+
+    def test_refresh_coalesced(self, app, db, unbabel_server):
+        """
+        Concurrent refreshes of the listing share the one in flight:
+        each pending translation is looked up once, and every listing
+        shows the fresh data.
+        """
+
+        unbabel_server.latency = 0.3
+        shared = translations.refreshes.stats()['shared']
+        bodies = []
+
+        def get_refreshed_listing():
+            with app.test_client() as client:
+                bodies.append(json.loads(client.get(
+                    '/translations/?refresh=true&format=json').get_data()))
+
+        threads = [threading.Thread(target=get_refreshed_listing) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+        assert translations.refreshes.stats()['shared'] - shared == 2
+        assert [request[1] for request in unbabel_server.requests] == \
+            ['/tapi/v2/translation/uid0000005']
+        assert len(bodies) == 3
+        assert all(all(t['status'] == 'completed' for t in body) for body in bodies)
+
+    def test_refresh_budget(self, app, client, db, unbabel_server, monkeypatch):
+        """
+        A refresh stops when its time budget runs out: what was fetched
+        is committed, and the rest is listed as stale.
+        """
+
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_REFRESH_BUDGET', 1)
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_REFRESH_WORKERS', 1)
+
+        for i in range(2):
+            db.session.add(Translation(**dict(
+                MOCK_TRANSLATIONS[4], uid='uid00001{:02}'.format(i))))
+        db.session.commit()
+        # 3 pending translations, refreshed in order: the last one
+        # answers long after the budget runs out
+        unbabel_server.latencies = [0, 0, 10]
+
+        start = time.monotonic()
+        response = client.get('/translations/?refresh=true&format=json')
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 5
+        assert response.headers['X-Stale-Translations'] == 'uid0000101'
+        rows = json.loads(response.get_data())
+        statuses = {t['uid']: t['status'] for t in rows}
+        assert statuses['uid0000005'] == 'completed'
+        assert statuses['uid0000100'] == 'completed'
+        assert statuses['uid0000101'] == 'new'
+        assert [t['uid'] for t in rows if t.get('stale')] == ['uid0000101']
+
+    def test_stale_header_capped(self, app, monkeypatch):
+        """Beyond MAX_STALE_HEADER_UIDS stale translations, the header says '*'."""
+
+        monkeypatch.setattr(translations, 'MAX_STALE_HEADER_UIDS', 2)
+
+        def stale_header(stale_uids):
+            response = translations._add_stale_header(app.response_class(), stale_uids)
+            return response.headers.get('X-Stale-Translations')
+
+        assert stale_header([]) is None
+        assert stale_header(['uid0000001', 'uid0000002']) == 'uid0000001,uid0000002'
+        assert stale_header(['uid0000001', 'uid0000002', 'uid0000003']) == '*'
+        assert stale_header(None) == '*'
+
+    def test_refresh_lock_timeout(self, client, db, unbabel_server, monkeypatch):
+        """
+        When another process holds the refresh past the budget, any
+        pending translation is flagged stale, and the page isn't cached.
+        """
+
+        monkeypatch.setattr(translations, 'listing_cache', make_cache('memory'))
+        monkeypatch.setattr(translations, 'try_advisory_locks', lambda *args: set())
+        monkeypatch.setattr(translations, 'wait_advisory_lock', lambda *args: False)
+
+        response = client.get('/translations/?refresh=true&format=json')
+
+        assert response.headers['X-Stale-Translations'] == '*'
+        rows = json.loads(response.get_data())
+        assert [t['uid'] for t in rows if t.get('stale')] == ['uid0000005']
+        assert len(translations.listing_cache) == 0
+        assert unbabel_server.requests == []
+
+    def test_refresh_no_budget(self, app, client, db, unbabel_server, monkeypatch):
+        """Without a budget, every pending translation is refreshed."""
+
+        monkeypatch.setitem(app.config, 'TRANSLATIONS_REFRESH_BUDGET', 0)
+        unbabel_server.latency = 0.1
+
+        response = client.get('/translations/?refresh=true&format=json')
+
+        assert 'X-Stale-Translations' not in response.headers
+        assert all(t['status'] == 'completed' for t in json.loads(response.get_data()))
+
+    @pytest.mark.parametrize('error', [unbabelapi.CircuitOpen, unbabelapi.RateLimitExceeded])
+    def test_update_translations_unsent(self, client, db, monkeypatch, error):
+        """
+        Calls turned down by the circuit breaker or the rate limiter
+        were never sent: the translations stay due, without backing off.
+        """
+
+        def request_translation_update(uid, **kwargs):
+            raise error('Not sent')
+
+        monkeypatch.setattr(unbabelapi, 'request_translation_update',
+                            request_translation_update)
+
+        pending_translations = Translation.get_all_pending()
+        next_check_at = pending_translations[0].next_check_at
+
+        with pytest.raises(translations.RefreshError):
+            translations._update_translations(pending_translations)
+        db.session.commit()
+
+        db.session.expire_all()
+        translation = Translation.query.get(pending_translations[0].uid)
+        assert translation.check_count == 0
+        assert translation.next_check_at == next_check_at
+        assert Translation.get_all_pending() != []
+
+    def test_update_translations_partial_failure(self, client, db, unbabel_server):
+        """
+        One failing Unbabel API call doesn't throw away the results of
+        the calls that succeeded.
+        """
+
+        for i in range(3):
+            db.session.add(Translation(**dict(
+                MOCK_TRANSLATIONS[4], uid='uid00001{:02}'.format(i))))
+        db.session.commit()
+
+        pending_translations = Translation.get_all_pending()
+
+        # Only the first request to the stand-in API fails
+        unbabel_server.statuses = [500]
+
+        with pytest.raises(unbabelapi.UnbabelAPIError):
+            translations._update_translations(pending_translations)
+
+        statuses = sorted(t.status for t in pending_translations)
+        assert statuses == ['completed', 'completed', 'completed', 'new']
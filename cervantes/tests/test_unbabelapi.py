@@ -13,14 +13,14 @@ from .mocks.data import (
 from .mocks import _returnNone, _raiseFileNotFoundError
 from .mocks.unbabelapi import UnababelAPIMocks
 from .mocks.translations import TranslationsMocks
-from .mocks.requests import RequestsMocks
 
+import json
 import pytest
-import requests
+import time
 import yaml
 
 
-def test_request_language_pairs(monkeypatch):
+def test_request_language_pairs(unbabel_server):
     """
     Config is loaded, all the keys accounted for, successful HTTP
     status code returned.
@@ -28,15 +28,6 @@ def test_request_language_pairs(monkeypatch):
 
     EXPECTED_LANGUAGE_PAIRS = MOCK_LANGUAGE_PAIRS
 
-    # Monkeypatch the config file loading so it returns the right keys
-    monkeypatch.setattr(unbabelapi,
-                        '_load_config', UnababelAPIMocks._returnConfig)
-
-    # Monkeypatch the requests object so it returns successfully without
-    # making an actual HTTP request
-    monkeypatch.setattr(
-        requests, 'get', RequestsMocks._returnResponseWithLanguagePairs)
-
     language_pairs = unbabelapi.request_language_pairs()
 
     assert EXPECTED_LANGUAGE_PAIRS == language_pairs
@@ -59,50 +50,46 @@ def test_request_language_pairs_config_error(monkeypatch):
         unbabelapi.request_language_pairs()
 
 
-def test_request_language_pairs_unsuccessful_http_response(monkeypatch):
+def test_request_language_pairs_unsuccessful_http_response(unbabel_server):
     """
     Config is loaded, all the keys accounted for, but unsuccessful
     HTTP status code returned.
     """
 
-    # Monkeypatch the config file loading so it returns the right keys
-    monkeypatch.setattr(unbabelapi,
-                        '_load_config', UnababelAPIMocks._returnConfig)
-
-    # Monkeypatch the requests object so it doesn't make an HTTP request
-    monkeypatch.setattr(
-        requests, 'get', RequestsMocks._returnUnsuccessfulResponse)
+    # Make the stand-in API answer with an error
+    unbabel_server.statuses = [500]
 
     with pytest.raises(unbabelapi.UnbabelAPIError):
         unbabelapi.request_language_pairs()
 
 
-def test_request_translation(monkeypatch):
+def test_request_translation(unbabel_server):
     """
     Config is loaded, all the keys accounted for, successful HTTP
     status code returned.
     """
 
-    EXPECTED_NEW_TRANSLATION = MOCK_NEW_TRANSLATION
-
     INPUTS = (
         MOCK_NEW_TRANSLATION['source_language'],
         MOCK_NEW_TRANSLATION['target_language'],
         MOCK_NEW_TRANSLATION['text'],
     )
 
-    # Monkeypatch the config file loading so it returns the right keys
-    monkeypatch.setattr(unbabelapi,
-                        '_load_config', UnababelAPIMocks._returnConfig)
-
-    # Monkeypatch the requests object so it returns successfully without
-    # making an actual HTTP request
-    monkeypatch.setattr(
-        requests, 'post', RequestsMocks._returnResponseWithNewTranslation)
-
     new_translation = unbabelapi.request_translation(*INPUTS)
 
-    assert EXPECTED_NEW_TRANSLATION == new_translation
+    assert new_translation['uid'] == MOCK_NEW_TRANSLATION['uid']
+    assert new_translation['text'] == MOCK_NEW_TRANSLATION['text']
+
+    method, path, headers, body = unbabel_server.requests[-1]
+    assert method == 'POST'
+    assert path == '/tapi/v2/translation/'
+    assert headers['Authorization'] == 'ApiKey unbabel-username:secret-unbabel-api-key'
+    assert body == {
+        'text': MOCK_NEW_TRANSLATION['text'],
+        'source_language': MOCK_NEW_TRANSLATION['source_language'],
+        'target_language': MOCK_NEW_TRANSLATION['target_language'],
+        'text_format': 'text'
+    }
 
 
 def test_request_translation_config_error(monkeypatch):
@@ -128,7 +115,7 @@ def test_request_translation_config_error(monkeypatch):
         unbabelapi.request_translation(*INPUTS)
 
 
-def test_request_translation_unsuccessful_http_response(monkeypatch):
+def test_request_translation_unsuccessful_http_response(unbabel_server):
     """
     Config is loaded, all the keys accounted for, but unsuccessful
     HTTP status code returned.
@@ -140,19 +127,14 @@ def test_request_translation_unsuccessful_http_response(monkeypatch):
         MOCK_NEW_TRANSLATION['text'],
     )
 
-    # Monkeypatch the config file loading so it returns the right keys
-    monkeypatch.setattr(unbabelapi,
-                        '_load_config', UnababelAPIMocks._returnConfig)
-
-    # Monkeypatch the requests object so it doesn't make an HTTP request
-    monkeypatch.setattr(
-        requests, 'get', RequestsMocks._returnUnsuccessfulResponse)
+    # Make the stand-in API answer with an error
+    unbabel_server.statuses = [400]
 
     with pytest.raises(unbabelapi.UnbabelAPIError):
         unbabelapi.request_translation(*INPUTS)
 
 
-def test_request_translation_update(monkeypatch):
+def test_request_translation_update(unbabel_server):
     """
     Config is loaded, all the keys accounted for, successful HTTP
     status code returned.
@@ -162,21 +144,12 @@ def test_request_translation_update(monkeypatch):
     EXPECTED_UPDATED_TRANSLATION = MOCK_UPDATED_TRANSLATION
     EXPECTED_NONUPDATED_TRANSLATION = MOCK_NONUPDATED_TRANSLATION
 
-    # Monkeypatch the config file loading so it returns the right keys
-    monkeypatch.setattr(unbabelapi,
-                        '_load_config', UnababelAPIMocks._returnConfig)
-
-    # Monkeypatch the requests object so it doesn't make an HTTP request
-    monkeypatch.setattr(
-        requests, 'get', RequestsMocks._returnResponseWithUpdatedTranslation)
-
     updated_translation = unbabelapi.request_translation_update(
         TRANSLATION_UID)
 
     assert EXPECTED_UPDATED_TRANSLATION == updated_translation
 
-    monkeypatch.setattr(
-        requests, 'get', RequestsMocks._returnResponseWithNonUpdatedTranslation)
+    unbabel_server.translations[TRANSLATION_UID] = MOCK_NONUPDATED_TRANSLATION
 
     nonupdated_translation = unbabelapi.request_translation_update(
         TRANSLATION_UID)
@@ -203,7 +176,7 @@ def test_request_translation_update_config_error(monkeypatch):
         unbabelapi.request_translation_update(TRANSLATION_UID)
 
 
-def test_request_translation_update_unsuccessful_http_response(monkeypatch):
+def test_request_translation_update_unsuccessful_http_response(unbabel_server):
     """
     Config is loaded, all the keys accounted for, but unsuccessful
     HTTP status code returned.
@@ -211,13 +184,8 @@ def test_request_translation_update_unsuccessful_http_response(monkeypatch):
 
     TRANSLATION_UID = 'uid0000005'
 
-    # Monkeypatch the config file loading so it returns the right keys
-    monkeypatch.setattr(unbabelapi,
-                        '_load_config', UnababelAPIMocks._returnConfig)
-
-    # Monkeypatch the requests object so it doesn't make an HTTP request
-    monkeypatch.setattr(
-        requests, 'get', RequestsMocks._returnUnsuccessfulResponse)
+    # Make the stand-in API answer with an error
+    unbabel_server.statuses = [404]
 
     with pytest.raises(unbabelapi.UnbabelAPIError):
         unbabelapi.request_translation_update(TRANSLATION_UID)
@@ -230,13 +198,63 @@ def test_load_config(tmp_path):
         "UNBABEL_API_KEY: 'secret-unbabel-api-key'"
     )
 
-    EXPECTED_CONIFG = MOCK_UNBABELAPI_CONFIG
+    EXPECTED_HEADERS = {
+        'Content-Type': 'application/json',
+        'Authorization': 'ApiKey unbabel-username:secret-unbabel-api-key'
+    }
 
     temp_config_file = tmp_path / 'unbabelapi.yaml'
     temp_config_file.write_text(YAML)
 
-    assert EXPECTED_CONIFG == unbabelapi._load_config(
-        path=temp_config_file)
+    unbabel_config = unbabelapi._load_config(path=temp_config_file)
+
+    assert unbabel_config.username == MOCK_UNBABELAPI_CONFIG['UNBABEL_USERNAME']
+    assert unbabel_config.api_key == MOCK_UNBABELAPI_CONFIG['UNBABEL_API_KEY']
+    assert EXPECTED_HEADERS == dict(unbabel_config.headers)
+    assert unbabel_config.client_settings == ()
+
+
+def test_load_config_is_cached(tmp_path, monkeypatch):
+    """
+    The Unbabel API config file is parsed once, and parsed again only
+    when it changes on disk.
+    """
+
+    YAML = (
+        "UNBABEL_USERNAME: 'unbabel-username'\n"
+        "UNBABEL_API_KEY: 'secret-unbabel-api-key'"
+    )
+
+    temp_config_file = tmp_path / 'unbabelapi.yaml'
+    temp_config_file.write_text(YAML)
+
+    parses = []
+    safe_load = yaml.safe_load
+    monkeypatch.setattr(yaml, 'safe_load',
+                        lambda stream: parses.append(stream) or safe_load(stream))
+
+    unbabel_config = unbabelapi._load_config(path=temp_config_file)
+
+    assert unbabelapi._load_config(path=temp_config_file) is unbabel_config
+    assert len(parses) == 1
+
+    temp_config_file.write_text(YAML + "\nUNBABEL_POOL_SIZE: 4")
+
+    reloaded_config = unbabelapi._load_config(path=temp_config_file)
+
+    assert reloaded_config is not unbabel_config
+    assert reloaded_config.client_settings == (('pool_size', 4), )
+    assert len(parses) == 2
+
+
+def test_load_config_missing_key(tmp_path):
+    """Load the Unbabel API config file with a missing key."""
+
+    temp_config_file = tmp_path / 'unbabelapi.yaml'
+    temp_config_file.write_text("UNBABEL_USERNAME: 'unbabel-username'")
+
+    with pytest.raises(KeyError):
+        unbabelapi._load_config(path=temp_config_file)
 
 
 def test_load_config_invalid_yaml(tmp_path):
@@ -257,3 +275,609 @@ def test_load_config_non_existent_file():
     """Load a non-existent Unbabel API config file."""
     with pytest.raises(FileNotFoundError):
         unbabelapi._load_config(path='non-existent-config-file.yaml')
+
+
+class TestUnbabelClient():
+    """
+    Test suite for the pooled Unbabel API client, driven against the
+    local stand-in API.
+    """
+
+    def test_connections_are_reused(self, unbabel_server):
+        """Consecutive calls share one keep-alive connection."""
+
+        unbabelapi.request_language_pairs()
+        unbabelapi.request_translation_update('uid0000005')
+        unbabelapi.request_translation('en', 'es', 'Sample text')
+
+        assert len(unbabel_server.requests) == 3
+        assert unbabel_server.connections == 1
+
+    def test_get_is_retried(self, unbabel_server):
+        """GETs answered with a gateway error are retried."""
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, retries=2, backoff_factor=0)
+        unbabel_server.statuses = [503, 503]
+
+        assert client.get('language_pair/', {}) == MOCK_LANGUAGE_PAIRS
+        assert len(unbabel_server.requests) == 3
+
+        client.close()
+
+    def test_get_with_deadline_is_not_retried(self, unbabel_server):
+        """
+        GETs with a deadline are sent once, so that a call given up on
+        doesn't keep retrying in the background.
+        """
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, retries=2, backoff_factor=0)
+        unbabel_server.statuses = [503, 503]
+
+        with pytest.raises(unbabelapi.UnbabelAPIError, match='503'):
+            client.get('language_pair/', {}, deadline=time.monotonic() + 5)
+        assert len(unbabel_server.requests) == 1
+
+        # Without a deadline, still retried
+        unbabel_server.statuses = [503]
+        assert client.get('language_pair/', {}) == MOCK_LANGUAGE_PAIRS
+        assert len(unbabel_server.requests) == 3
+
+        client.close()
+
+    def test_post_is_not_retried(self, unbabel_server):
+        """POSTs are never retried, not to request a translation twice."""
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, retries=2, backoff_factor=0)
+        unbabel_server.statuses = [503]
+
+        with pytest.raises(unbabelapi.UnbabelAPIError):
+            client.post('translation/', {}, {'text': 'Sample text'})
+
+        assert len(unbabel_server.requests) == 1
+
+        client.close()
+
+    def test_timeout(self, unbabel_server):
+        """A call slower than the read timeout raises UnbabelAPIError."""
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, read_timeout=0.05, retries=0)
+        unbabel_server.latency = 0.2
+
+        with pytest.raises(unbabelapi.UnbabelAPIError):
+            client.get('language_pair/', {})
+
+        client.close()
+
+    def test_get_client_is_shared(self, unbabel_server):
+        """The same client is returned until its settings change."""
+
+        client = unbabelapi.get_client()
+
+        assert unbabelapi.get_client() is client
+        assert client.base_url == unbabel_server.url
+
+        resized_client = unbabelapi.get_client(unbabelapi.UnbabelConfig.from_dict(
+            dict(MOCK_UNBABELAPI_CONFIG,
+                 UNBABEL_API_URL=unbabel_server.url,
+                 UNBABEL_POOL_SIZE=2)))
+
+        assert resized_client is not client
+        assert resized_client.pool_size == 2
+
+
+    def test_rate_limit(self, unbabel_server):
+        """
+        Reads and writes have their own rate limit, and calls that
+        can't wait for it fail fast.
+        """
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, read_rate=100, write_rate=0.1)
+
+        client.post('translation/', {}, {'text': 'Sample text'})
+        with pytest.raises(unbabelapi.RateLimitExceeded):
+            client.post('translation/', {}, {'text': 'Sample text'}, wait=0)
+        # Reads aren't held back by the writes
+        client.get('language_pair/', {}, wait=0)
+
+        assert len(unbabel_server.requests) == 2
+        stats = client.stats()['rate_limits']
+        assert stats['write']['consumed'] == 1
+        assert stats['write']['rejected'] == 1
+        assert stats['read']['consumed'] == 1
+
+        client.close()
+
+
+    def test_circuit_breaker(self, unbabel_server):
+        """
+        Once enough calls failed, the circuit opens and calls are
+        turned down without reaching the API. Client errors don't
+        count.
+        """
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, retries=0, breaker_minimum_calls=4)
+        unbabel_server.statuses = [404, 404, 404, 500, 503, 500]
+
+        for _ in range(5):
+            with pytest.raises(unbabelapi.UnbabelAPIError):
+                client.get('language_pair/', {})
+        # 2 failures out of 5 calls
+        assert client.breaker.state == 'closed'
+
+        with pytest.raises(unbabelapi.UnbabelAPIError):
+            client.get('language_pair/', {})
+        assert client.breaker.state == 'open'
+        with pytest.raises(unbabelapi.CircuitOpen):
+            client.get('language_pair/', {})
+
+        assert len(unbabel_server.requests) == 6
+        assert client.stats()['circuit_breaker']['rejected'] == 1
+
+        client.close()
+
+
+    def test_deadline(self, unbabel_server):
+        """
+        Calls past their deadline aren't made, and the others are cut
+        short to meet it.
+        """
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, read_timeout=10, retries=0)
+        unbabel_server.latency = 0.5
+
+        with pytest.raises(unbabelapi.DeadlineExceeded):
+            client.get('language_pair/', {}, deadline=time.monotonic())
+        assert unbabel_server.requests == []
+
+        start = time.monotonic()
+        with pytest.raises(unbabelapi.DeadlineExceeded):
+            client.get('language_pair/', {}, deadline=start + 0.1)
+        assert time.monotonic() - start < 0.4
+
+        client.close()
+
+    def test_deadline_not_a_failure(self, unbabel_server):
+        """
+        Timeouts cut short by a deadline don't count as failures: an API
+        slower than the deadline isn't down.
+        """
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, read_timeout=10, retries=0)
+        unbabel_server.latency = 0.3
+
+        for _ in range(client.breaker.minimum_calls):
+            with pytest.raises(unbabelapi.DeadlineExceeded):
+                client.get('language_pair/', {}, deadline=time.monotonic() + 0.05)
+
+        assert client.breaker.state == 'closed'
+        assert client.breaker.stats()['calls'] == 0
+        assert client.get('language_pair/', {}) == MOCK_LANGUAGE_PAIRS
+
+        client.close()
+
+    def _hedging_client(self, unbabel_server, **kwargs):
+        """Return a hedging client that knows reads take 10ms."""
+
+        client = unbabelapi.UnbabelClient(
+            base_url=unbabel_server.url, hedge_percentile=95, **kwargs)
+        for _ in range(client.hedging.minimum_samples):
+            client.hedging.observe(0.01)
+
+        return client
+
+    def test_hedged_read(self, unbabel_server):
+        """A slow read is hedged, and the first answer wins."""
+
+        client = self._hedging_client(unbabel_server, hedge_max_rate=1)
+        unbabel_server.latencies = [1]
+
+        start = time.monotonic()
+        assert client.get('language_pair/', {}) == MOCK_LANGUAGE_PAIRS
+        assert time.monotonic() - start < 0.5
+
+        assert len(unbabel_server.requests) == 2
+        stats = client.stats()['hedging']
+        assert stats['fired'] == 1
+        assert stats['won'] == 1
+
+        client.close()
+
+    def test_hedged_read_capped(self, unbabel_server):
+        """Reads aren't hedged beyond the hedge rate."""
+
+        client = self._hedging_client(unbabel_server, hedge_max_rate=0.5)
+        unbabel_server.latencies = [0.2, 0.2]
+
+        client.get('language_pair/', {})
+        client.get('language_pair/', {})
+
+        # Half a hedge earned by each read
+        stats = client.stats()['hedging']
+        assert stats['reads'] == 2
+        assert stats['capped'] == 1
+        assert stats['fired'] == 1
+
+        client.close()
+
+    def test_hedged_read_failures(self, unbabel_server):
+        """The error of the first read is raised when both fail."""
+
+        client = self._hedging_client(unbabel_server, hedge_max_rate=1, retries=0)
+        unbabel_server.latencies = [0.2]
+        unbabel_server.statuses = [500, 502]
+
+        with pytest.raises(unbabelapi.UnbabelAPIError, match='500'):
+            client.get('language_pair/', {})
+
+        client.close()
+
+    def test_hedge_delay_after_rate_limit(self, unbabel_server):
+        """The wait for the rate limit doesn't count towards the hedge delay."""
+
+        client = self._hedging_client(unbabel_server, hedge_max_rate=1, read_rate=5,
+                                      read_burst=1)
+        for _ in range(client.hedging.minimum_samples):
+            client.hedging.observe(0.1)
+        # The next token comes in 0.2 seconds, past the delay
+        client.read_bucket.acquire(0)
+
+        assert client.get('language_pair/', {}) == MOCK_LANGUAGE_PAIRS
+
+        assert len(unbabel_server.requests) == 1
+        assert client.stats()['hedging']['fired'] == 0
+
+        client.close()
+
+    def test_hedge_turned_down(self, unbabel_server):
+        """
+        A hedge turned down by the rate limit isn't counted as fired,
+        and its budget is given back.
+        """
+
+        client = self._hedging_client(unbabel_server, hedge_max_rate=1, read_rate=1,
+                                      read_burst=1)
+        unbabel_server.latencies = [0.2]
+
+        assert client.get('language_pair/', {}) == MOCK_LANGUAGE_PAIRS
+
+        assert len(unbabel_server.requests) == 1
+        assert client.stats()['hedging']['fired'] == 0
+        assert client.hedging.try_hedge()
+
+        client.close()
+
+
+class FakeClock():
+    """Clock moved forward by the sleeps, instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket():
+    """Test suite for the rate limiter of the Unbabel API calls."""
+
+    def test_burst(self):
+        """Bursts of up to capacity calls don't wait."""
+
+        clock = FakeClock()
+        bucket = unbabelapi.TokenBucket(2, 3, clock=clock, sleep=clock.sleep)
+
+        assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+        assert clock.sleeps == []
+
+    def test_wait(self):
+        """Once the bucket is empty, calls are spread at rate per second."""
+
+        clock = FakeClock()
+        bucket = unbabelapi.TokenBucket(2, 1, clock=clock, sleep=clock.sleep)
+
+        bucket.acquire()
+        bucket.acquire()
+        bucket.acquire()
+
+        assert clock.sleeps == [0.5, 0.5]
+        assert bucket.stats() == {'consumed': 3, 'waited': 1.0, 'rejected': 0,
+                                  'rate': 2, 'capacity': 1}
+
+    def test_refill(self):
+        """Tokens come back with time, up to the capacity."""
+
+        clock = FakeClock()
+        bucket = unbabelapi.TokenBucket(2, 2, clock=clock, sleep=clock.sleep)
+
+        bucket.acquire()
+        bucket.acquire()
+        clock.now += 10
+        bucket.acquire()
+        bucket.acquire()
+
+        assert clock.sleeps == []
+
+    def test_timeout(self):
+        """Calls that would wait longer than their timeout are rejected."""
+
+        clock = FakeClock()
+        bucket = unbabelapi.TokenBucket(1, 1, clock=clock, sleep=clock.sleep)
+
+        bucket.acquire()
+
+        with pytest.raises(unbabelapi.RateLimitExceeded):
+            bucket.acquire(timeout=0)
+        with pytest.raises(unbabelapi.RateLimitExceeded):
+            bucket.acquire(timeout=0.5)
+        assert bucket.acquire(timeout=1) == 1
+
+        assert bucket.stats()['rejected'] == 2
+        assert bucket.stats()['consumed'] == 2
+
+    def test_no_limit(self):
+        """Without a rate, calls are only counted."""
+
+        bucket = unbabelapi.TokenBucket(None)
+
+        assert all(bucket.acquire(timeout=0) == 0 for _ in range(100))
+        assert bucket.stats()['consumed'] == 100
+
+
+class TestCircuitBreaker():
+    """Test suite for the circuit breaker of the Unbabel API calls."""
+
+    def _call(self, breaker, duration=0, failed=False):
+        breaker.allow()
+        breaker.record(duration, failed)
+
+    def test_open_on_failures(self):
+        """The circuit opens once the failure rate is reached."""
+
+        clock = FakeClock()
+        breaker = unbabelapi.CircuitBreaker(
+            failure_rate=0.5, minimum_calls=4, cooldown=30, clock=clock)
+
+        self._call(breaker, failed=True)
+        self._call(breaker, failed=True)
+        self._call(breaker, failed=True)
+        assert breaker.state == 'closed'
+        self._call(breaker)
+        assert breaker.state == 'open'
+
+        with pytest.raises(unbabelapi.CircuitOpen):
+            breaker.allow()
+        assert breaker.stats()['retry_in'] == 30
+
+    def test_open_on_slow_calls(self):
+        """The circuit opens once the slow call rate is reached."""
+
+        clock = FakeClock()
+        breaker = unbabelapi.CircuitBreaker(
+            slow_call=1, slow_rate=0.5, minimum_calls=2, clock=clock)
+
+        self._call(breaker, duration=2)
+        self._call(breaker, duration=3)
+
+        assert breaker.state == 'open'
+
+    def test_window(self):
+        """Only the calls of the last window seconds count."""
+
+        clock = FakeClock()
+        breaker = unbabelapi.CircuitBreaker(minimum_calls=2, window=60, clock=clock)
+
+        self._call(breaker, failed=True)
+        clock.now += 61
+        self._call(breaker)
+        self._call(breaker)
+
+        assert breaker.state == 'closed'
+
+    def test_half_open(self):
+        """
+        After the cooldown, a trial call goes through: the circuit
+        closes if it succeeds, and opens again if it fails.
+        """
+
+        clock = FakeClock()
+        breaker = unbabelapi.CircuitBreaker(minimum_calls=1, cooldown=30, clock=clock)
+
+        self._call(breaker, failed=True)
+        clock.now += 30
+        assert breaker.state == 'half-open'
+
+        breaker.allow()
+        # Only one trial at a time
+        with pytest.raises(unbabelapi.CircuitOpen):
+            breaker.allow()
+        breaker.record(0, failed=True)
+        assert breaker.state == 'open'
+
+        clock.now += 30
+        self._call(breaker)
+        assert breaker.state == 'closed'
+        assert breaker.stats()['opened'] == 2
+
+    def test_cancel(self):
+        """Trial calls that weren't made free their slot."""
+
+        clock = FakeClock()
+        breaker = unbabelapi.CircuitBreaker(minimum_calls=1, cooldown=30, clock=clock)
+
+        self._call(breaker, failed=True)
+        clock.now += 30
+        breaker.allow()
+        breaker.cancel()
+        breaker.allow()
+
+
+class TestHedgingPolicy():
+    """Test suite for the hedging policy of the Unbabel API reads."""
+
+    def test_delay(self):
+        """Reads are hedged after the percentile of the recent latencies."""
+
+        policy = unbabelapi.HedgingPolicy(percentile=90, minimum_samples=10)
+
+        for latency in range(1, 10):
+            policy.observe(latency / 10)
+        assert policy.delay() is None
+
+        policy.observe(1.0)
+        assert policy.delay() == 1.0
+        policy.observe(0.1)
+        assert policy.delay() == 0.9
+
+    def test_budget(self):
+        """Hedges are capped at max_rate per read."""
+
+        policy = unbabelapi.HedgingPolicy(max_rate=0.25)
+
+        hedges = []
+        for _ in range(8):
+            policy.delay()
+            hedges.append(policy.try_hedge())
+
+        assert hedges.count(True) == 2
+        assert policy.stats()['capped'] == 6
+        # Only the hedges sent count as fired
+        assert policy.stats()['fired'] == 0
+
+        policy.refund()
+        assert policy.try_hedge()
+        policy.record_sent()
+        assert policy.stats()['fired'] == 1
+
+
+class TestLanguagePairCache():
+    """
+    Test suite for the TTL-cached language pairs.
+    """
+
+    @pytest.fixture()
+    def upstream(self, monkeypatch):
+        """
+        Count the calls to request_language_pairs, and let the tests
+        make it fail.
+        """
+
+        calls = []
+        failing = []
+
+        def request_language_pairs():
+            calls.append(1)
+            if failing:
+                raise unbabelapi.UnbabelAPIError
+            return MOCK_LANGUAGE_PAIRS
+
+        monkeypatch.setattr(unbabelapi, 'request_language_pairs',
+                            request_language_pairs)
+
+        return calls, failing
+
+    def test_language_pairs_snapshot(self):
+        """The snapshot validates pairs against the precomputed set."""
+
+        snapshot = unbabelapi.LanguagePairs.from_response(MOCK_LANGUAGE_PAIRS, 0)
+
+        assert snapshot.objects == tuple(MOCK_LANGUAGE_PAIRS['objects'])
+        assert snapshot.pairs == frozenset([('en', 'es'), ('pt', 'en')])
+        assert snapshot.is_available('en', 'es')
+        assert not snapshot.is_available('es', 'en')
+
+    def test_language_pairs_etag_is_stable(self):
+        """The same pairs always hash to the same ETag."""
+
+        snapshot = unbabelapi.LanguagePairs.from_response(MOCK_LANGUAGE_PAIRS, 0)
+        refetched_snapshot = unbabelapi.LanguagePairs.from_response(
+            json.loads(json.dumps(MOCK_LANGUAGE_PAIRS)), 60)
+        other_snapshot = unbabelapi.LanguagePairs.from_response(
+            {'objects': MOCK_LANGUAGE_PAIRS['objects'][:1]}, 60)
+
+        assert json.loads(snapshot.body) == MOCK_LANGUAGE_PAIRS['objects']
+        assert snapshot.etag == refetched_snapshot.etag
+        assert snapshot.etag != other_snapshot.etag
+
+    def test_get_is_cached(self, upstream):
+        """The pairs are fetched once, and served from cache until the TTL."""
+
+        calls, _ = upstream
+        now = [0]
+        cache = unbabelapi.LanguagePairCache(ttl=60, clock=lambda: now[0])
+
+        snapshot = cache.get()
+        now[0] = 59
+
+        assert cache.get() is snapshot
+        assert len(calls) == 1
+
+    def test_get_stale_while_revalidate(self, upstream):
+        """
+        Once the TTL runs out, the stale pairs are served while they
+        are refreshed in the background.
+        """
+
+        calls, _ = upstream
+        now = [0]
+        cache = unbabelapi.LanguagePairCache(ttl=60, clock=lambda: now[0])
+
+        stale_snapshot = cache.get()
+        now[0] = 60
+
+        assert cache.get() is stale_snapshot
+
+        cache._refresh_thread.join()
+
+        fresh_snapshot = cache.get()
+        assert fresh_snapshot is not stale_snapshot
+        assert fresh_snapshot.fetched_at == 60
+        assert len(calls) == 2
+
+    def test_get_stale_when_unbabel_is_down(self, upstream):
+        """
+        The stale pairs are still served when the refresh fails, and
+        the refresh is only retried after the retry interval.
+        """
+
+        calls, failing = upstream
+        now = [0]
+        cache = unbabelapi.LanguagePairCache(
+            ttl=60, retry_interval=30, clock=lambda: now[0])
+
+        stale_snapshot = cache.get()
+        failing.append(True)
+        now[0] = 60
+
+        assert cache.get() is stale_snapshot
+        cache._refresh_thread.join()
+
+        assert cache.get() is stale_snapshot
+        assert len(calls) == 2
+
+        now[0] = 90
+        cache.get()
+        cache._refresh_thread.join()
+
+        assert len(calls) == 3
+
+    def test_get_without_snapshot_when_unbabel_is_down(self, upstream):
+        """With nothing cached yet, the Unbabel API error is raised."""
+
+        _, failing = upstream
+        failing.append(True)
+
+        with pytest.raises(unbabelapi.UnbabelAPIError):
+            unbabelapi.LanguagePairCache().get()
@@ -2,88 +2,1120 @@
 This module defines a Flask Blueprint to encapsulate the translation
 feature of the app.
 
-The GET route to the '/' endpoint not only retrieves the Translation
-records but also passes each pending record through the Unbabel API
-to get the most updated data on the translation request. This is
-deliberate - every time the listing is called, it is updated first if
-needed, ensuring the user has the freshest data without having to
-explicitly ask for the update on their records. If all records are
-in a completed state, then no queries to the Unbabel API are made.
+The GET route to the '/' endpoint only reads the Translation records
+from the database. Pending records are kept up to date out of band by
+the poller (see cervantes.poller), so page views never wait on the
+Unbabel API. The old behavior - passing each pending record through
+the Unbabel API before listing - is still available on demand with
+the 'refresh' query parameter.
 
     bp : flask.Blueprint
         Blueprint initialization. Routes all requests to '/translations'
         to its own routes.
 
+    class RefreshError : unbabelapi.UnbabelAPIError
+        Raised when some translations couldn't be refreshed against the
+        Unbabel API (failed calls, or no time left for them).
+
+    function _fetch_translation_updates
+        Private function that queries the Unbabel API for the latest
+        data on a list of UIDs, concurrently, on a bounded thread pool.
+
     function _update_translations
         Private function in charge of taking a list of Transaction
         records and passing them to the Unbabel API for updated
-        information, mutating the list with the fresh information,
-        if it exists.
+        information, writing the fresh information in bulk, if it
+        exists.
+
+    translation_updates, refreshes : cervantes.singleflight.SingleFlight
+        Unbabel API lookups of a translation in flight, by UID, and
+        refresh of the pending translations in flight.
+
+    function _refresh_pending_translations
+        Private function that refreshes the pending translations and
+        commits, sharing the refresh in flight if there is one, within
+        a time budget.
+
+    function _read_batch
+        Private function that reads the items of a batch submission
+        (JSON array, CSV or NDJSON) from the request.
+
+    function _parse_batch_item
+        Private function that validates an item of a batch submission.
+
+    function _submit_translations
+        Private function that requests many translations from the
+        Unbabel API, concurrently, on a bounded thread pool.
+
+    function _save_new_translations
+        Private function that inserts and commits a chunk of the new
+        translations of a batch submission, reporting its items as
+        failed if that fails.
+
+    function _add_stale_header
+        Private function that tells which translations of a response
+        may be out of date, with a response header.
+
+    function _is_stale
+        Private function that tells whether a translation of the
+        response may be out of date.
+
+    function _start_fuzzy_memory_sync
+        Private function that starts syncing fuzzy_memory in the
+        background, once per process.
+
+    function _stop_fuzzy_memory_sync
+        Private function that stops syncing fuzzy_memory.
+
+    function _get_page_args
+        Private function that reads and validates the pagination query
+        parameters of the listing.
+
+    function _get_flag
+        Private function that reads a boolean query parameter.
+
+    function _get_since_arg
+        Private function that reads and validates the delta sync
+        cursor of the listing.
+
+    function _render_changes
+        Private function that renders the translations changed since a
+        delta sync cursor (JSON or HTML rows).
+
+    function _add_next_page_headers
+        Private function that points a page of the listing to the next
+        one with response headers.
+
+    function _dump_json
+        Private function that serializes JSON like jsonify, with orjson
+        if it is installed.
+
+    function _json_response
+        Private function that serializes the JSON listing into a
+        response.
+
+    function _stream_translations
+        Private function that streams the listing (JSON, NDJSON or
+        HTML) from a server-side cursor.
+
+    function _render_page
+        Private function that renders a page of the listing (JSON or
+        HTML).
+
+    listing_cache : cervantes.cache.LRUCache | FileSystemCache | SQLiteCache
+        Rendered pages of the listing, by format, pagination and
+        version of the listing. Set up from the TRANSLATIONS_LISTING_CACHE
+        app config (None when disabled), and emptied whenever a session
+        commits writes to the translations.
+
+    function _render_cached_page
+        Private function that renders a page of the listing, from
+        listing_cache when possible.
+
+    translation_memory : cervantes.cache.HitCounter
+        Hits and misses of the translation memory: new translation
+        requests answered by an earlier translation of the same content
+        (see Translation.find_by_content_hashes), or not.
+
+    fuzzy_memory : cervantes.memory.TranslationMemory
+        Completed translations, indexed to suggest the ones whose text
+        is similar to a new one. Synced with the database in the
+        background (see _start_fuzzy_memory_sync).
+
+    row_html_cache, row_json_cache : cervantes.cache.LRUCache
+        Rendered HTML rows and serialized JSON objects of the
+        translations that aren't pending anymore, by UID and date of
+        last update.
+
+    function _render_row
+        Private function that renders the table row of a translation,
+        from row_html_cache when possible. Available to the templates
+        as render_translation_row.
+
+    function _dictify_rows
+        Private function that serializes rows of the listing, from
+        row_json_cache when possible.
 
     Routes:
         GET '/'
             get_translations
-            Update and return all Translations. Optional JSON format.
+            Return all Translations, optionally updating the pending
+            ones first. Optional JSON format.
         POST '/'
             add_translation
             Request a new translation, hit the Unbabel API, and, if
             all goes well, store the new Translation in the database.
+            Requests of content translated (or being translated)
+            already reuse that translation instead.
+        POST '/batch'
+            add_translations
+            Request many translations at once (JSON array, CSV or
+            NDJSON file), and store the new Translations in bulk.
+            Reports the outcome of each item in JSON format.
+        GET '/suggest'
+            get_suggestions
+            Return the completed translations whose text is similar to
+            a given one, in JSON format.
+        GET '/stream'
+            stream_translation_events
+            Push the translation events as Server-Sent Events.
+        GET '/metrics'
+            get_metrics
+            Return the counters of the feature (e.g. cache hits, state
+            of the Unbabel API circuit breaker) in JSON format.
         GET '/language_pairs'
             get_language_pairs
             Return all available language pairs for translation in JSON
-            format.
+            format. Cacheable, with ETag validation.
 """
 
 
-from flask import Blueprint, jsonify, request, redirect, url_for, flash, render_template
+from concurrent.futures import (ThreadPoolExecutor, TimeoutError as FutureTimeoutError,
+                                as_completed)
+import csv
+from datetime import datetime
+import io
+from itertools import islice
+import json
+import threading
+import time
+
+from flask import (Blueprint, abort, current_app, g, jsonify, make_response, request,
+                   redirect, url_for, flash, render_template, stream_with_context)
+from markupsafe import Markup
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
 
-from cervantes.models import Translation, db
+from cervantes.cache import HitCounter, LRUCache, make_cache
+import cervantes.events as events
+from cervantes.memory import DEFAULT_SYNC_INTERVAL, MemorySync, TranslationMemory
+from cervantes.singleflight import SingleFlight, try_advisory_locks, wait_advisory_lock
+from cervantes.models import (PENDING_STATUSES, TRANSLATIONS_WRITTEN, Translation,
+                              TranslationsVersion, content_hash, db)
 import cervantes.unbabelapi as unbabelapi
 
+try:
+    import orjson
+except ImportError:
+    # Optional, the JSON listing falls back to the standard library
+    orjson = None
+
 
 bp = Blueprint('translations', __name__, url_prefix='/translations')
 
+# Rendered HTML row and serialized JSON object of the translations that
+# can't change anymore, by (uid, date_updated)
+row_html_cache = LRUCache()
+row_json_cache = LRUCache()
+
+# New translation requests answered by the translation memory, or not
+translation_memory = HitCounter()
+
+# Completed translations, to suggest the ones similar to a new text,
+# and the thread syncing them (see _start_fuzzy_memory_sync)
+fuzzy_memory = TranslationMemory()
+_fuzzy_memory_sync = None
+_fuzzy_memory_sync_lock = threading.Lock()
+
+# Default and maximum number of suggestions of the fuzzy memory
+DEFAULT_SUGGESTIONS = 5
+MAX_SUGGESTIONS = 20
+
+# Concurrent lookups of a translation, and concurrent refreshes, share
+# the one in flight
+translation_updates = SingleFlight()
+refreshes = SingleFlight()
+
+# Namespaces of the advisory locks of a translation being refreshed (by
+# UID), and of the refresh of the pending translations
+UPDATE_LOCK_NAMESPACE = 1
+REFRESH_LOCK_NAMESPACE = 2
+
+# Rendered pages of the listing, see _render_cached_page. Bumping the
+# generation (under the lock) keeps the pages rendered before a commit
+# from being cached after it.
+listing_cache = None
+_listing_generation = 0
+_listing_lock = threading.Lock()
+
+# Default number of concurrent Unbabel API calls when refreshing
+DEFAULT_REFRESH_WORKERS = 8
+
+# Default number of concurrent Unbabel API calls when submitting a batch
+DEFAULT_SUBMIT_WORKERS = 4
+
+# Maximum number of translations per batch submission, and names of
+# their fields (also the optional header of a CSV file)
+MAX_BATCH_SIZE = 1000
+BATCH_FIELDS = ('source', 'target', 'text')
+
+# New translations of a batch submission are committed this many at a
+# time, as the Unbabel API calls complete
+BATCH_COMMIT_SIZE = 100
+
+# Errors of the Unbabel API calls that were never sent: no time left,
+# circuit open, or rate limited. They say nothing of the translation.
+UNSENT_CALL_ERRORS = (unbabelapi.DeadlineExceeded, unbabelapi.CircuitOpen,
+                      unbabelapi.RateLimitExceeded)
+
+# Default seconds a refresh of the listing may take, at most
+DEFAULT_REFRESH_BUDGET = 5
+
+# Most UIDs listed in the 'X-Stale-Translations' header, '*' beyond
+MAX_STALE_HEADER_UIDS = 50
+
+# Default and maximum number of translations per page of the listing
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
-def _update_translations(translations=[]):
+# Number of rows fetched from the database at a time when streaming the
+# listing, and number of template chunks sent together
+STREAM_BATCH_SIZE = 1000
+STREAM_BUFFER_SIZE = 100
+
+# Seconds between two keep-alive comments of the events stream, and
+# lifetime of a stream connection (the browser reconnects after it)
+DEFAULT_STREAM_HEARTBEAT = 15
+DEFAULT_STREAM_TIMEOUT = 300
+# Milliseconds browsers wait before reconnecting to the events stream
+STREAM_RETRY = 3000
+
+# Default number of events streams open at a time in the process, at
+# most (each one holds a thread with a threaded server), 0 for no limit
+DEFAULT_STREAM_MAX_OPEN = 50
+# Seconds browsers are told to wait when no stream is available
+STREAM_BUSY_RETRY_AFTER = 30
+
+# Number of events streams open in the process
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
+# Default number of rendered rows (and of serialized rows) kept by the
+# row caches
+DEFAULT_ROW_CACHE_SIZE = 10000
+
+# Default backend and number of pages of the listing cache
+DEFAULT_LISTING_CACHE = 'memory'
+DEFAULT_LISTING_CACHE_SIZE = 100
+
+# Cache-Control of the language pairs, in seconds
+LANGUAGE_PAIRS_MAX_AGE = 3600
+LANGUAGE_PAIRS_STALE_WHILE_REVALIDATE = 86400
+
+
+class RefreshError(unbabelapi.UnbabelAPIError):
+    """
+    Some translations couldn't be refreshed against the Unbabel API.
+
+        uids : list<str>
+            UIDs of the translations that weren't refreshed.
     """
-    Takes a list of Translation requests and mutates each element based
+
+    def __init__(self, message, uids):
+        super().__init__(message)
+        self.uids = uids
+
+
+@bp.record_once
+def _configure_row_caches(state):
+    """Size the row caches from the TRANSLATIONS_ROW_CACHE_SIZE app config."""
+
+    maxsize = state.app.config.get('TRANSLATIONS_ROW_CACHE_SIZE', DEFAULT_ROW_CACHE_SIZE)
+    row_html_cache.maxsize = maxsize
+    row_json_cache.maxsize = maxsize
+
+
+@bp.record_once
+def _configure_listing_cache(state):
+    """Set up the listing cache from the TRANSLATIONS_LISTING_CACHE* app config."""
+
+    global listing_cache
+
+    config = state.app.config
+    listing_cache = make_cache(
+        config.get('TRANSLATIONS_LISTING_CACHE', DEFAULT_LISTING_CACHE),
+        maxsize=config.get('TRANSLATIONS_LISTING_CACHE_SIZE', DEFAULT_LISTING_CACHE_SIZE),
+        path=config.get('TRANSLATIONS_LISTING_CACHE_PATH'))
+
+
+@sa.event.listens_for(Session, 'after_commit')
+def _invalidate_listing_cache(session):
+    """Empty the listing cache once writes to the translations commit."""
+
+    global _listing_generation
+
+    if not session.info.pop(TRANSLATIONS_WRITTEN, False):
+        return
+
+    with _listing_lock:
+        _listing_generation += 1
+        if listing_cache is not None:
+            listing_cache.clear()
+
+
+@bp.app_template_global('render_translation_row')
+def _render_row(translation):
+    """
+    Render the table row of a translation. Rows of translations that
+    aren't pending anymore never change, so they are rendered once and
+    then served from row_html_cache.
+
+        translation : Translation
+            Or a row of Translation.query_all_rows.
+
+        Returns : markupsafe.Markup
+    """
+
+    cacheable = translation.status not in PENDING_STATUSES
+    if cacheable:
+        key = (translation.uid, translation.date_updated)
+        html = row_html_cache.get(key)
+        if html is not None:
+            return html
+
+    html = Markup(current_app.jinja_env.get_template(
+        'translation_row.html').render(translation=translation,
+                                       stale=_is_stale(translation)))
+
+    if cacheable:
+        row_html_cache.set(key, html)
+
+    return html
+
+
+def _dictify_rows(rows):
+    """
+    Same as Translation.dictify_rows, but the dictionaries of the
+    translations that aren't pending anymore are built once and then
+    served from row_json_cache. They are shared: never mutate them.
+    Pending translations that may be out of date (see _is_stale) are
+    flagged with '"stale": true'.
+
+        rows : list<tuple>
+            Rows of Translation.query_all_rows.
+
+        Returns : list<dict>
+    """
+
+    serialized_rows = []
+
+    for row in rows:
+        if row.status in PENDING_STATUSES:
+            serialized_row, = Translation.dictify_rows([row])
+            if _is_stale(row):
+                serialized_row['stale'] = True
+            serialized_rows.append(serialized_row)
+            continue
+
+        key = (row.uid, row.date_updated)
+        serialized_row = row_json_cache.get(key)
+        if serialized_row is None:
+            serialized_row, = Translation.dictify_rows([row])
+            row_json_cache.set(key, serialized_row)
+        serialized_rows.append(serialized_row)
+
+    return serialized_rows
+
+
+def _fetch_translation_updates(uids, max_in_flight=DEFAULT_REFRESH_WORKERS, deadline=None):
+    """
+    Queries the Unbabel API for the latest data on each UID. The calls
+    run concurrently on a thread pool, with at most max_in_flight of
+    them in flight at a time. Only the HTTP calls happen on the pool;
+    nothing here touches the database session. A lookup of a UID
+    already in flight in another thread is shared rather than made
+    again (see translation_updates).
+
+    With a deadline, the calls are cut short to meet it, and the ones
+    not done by then are given up on (their threads wind down on their
+    own), so this returns by the deadline whatever the Unbabel API does.
+
+        uids : list<str>
+            Translation request UIDs to query.
+        max_in_flight : int = DEFAULT_REFRESH_WORKERS
+            Maximum number of concurrent calls to the Unbabel API.
+        deadline : float = None
+            time.monotonic() time to be done by. No limit if None.
+
+        Returns : (dict<str, dict>, dict<str, unbabelapi.UnbabelAPIError>)
+            The fresh data by UID for the calls that succeeded, and the
+            error by UID for the ones that failed (DeadlineExceeded for
+            the ones that ran out of time).
+    """
+
+    updates, errors = {}, {}
+
+    if not uids:
+        return updates, errors
+
+    workers = max(1, min(max_in_flight, len(uids)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [(uid, executor.submit(translation_updates.do, uid,
+                                     unbabelapi.request_translation_update, uid,
+                                     deadline=deadline))
+               for uid in uids]
+
+    try:
+        for uid, future in futures:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                updates[uid] = future.result(timeout)
+            except FutureTimeoutError:
+                errors[uid] = unbabelapi.DeadlineExceeded(
+                    'No time left to refresh {}'.format(uid))
+            except unbabelapi.UnbabelAPIError as exc:
+                errors[uid] = exc
+    finally:
+        # Don't start the calls given up on, nor wait for the ones in flight
+        for uid, future in futures:
+            future.cancel()
+        executor.shutdown(wait=deadline is None)
+
+    return updates, errors
+
+
+def _update_translations(translations=[], max_in_flight=None, deadline=None):
+    """
+    Takes a list of Translation requests and updates each element based
     on data queried from the Unbabel API. If the data from Unbabel's API
     is fresher than the data in the database, updates the properties of
     the instance.
 
+    The Unbabel API calls are made concurrently, but the fresh data is
+    applied here, in the calling thread, so the SQLAlchemy session is
+    never shared between threads. The changes are written with batched
+    UPDATE statements (see Translation.bulk_update) rather than one per
+    record: one for the translations whose status changed, one for the
+    polling schedule of the others. Translations whose status didn't
+    change keep their date_updated. Status changes bump the version of
+    the listing (see TranslationsVersion), are tagged with it, and are
+    published as translation events once committed. When
+    some calls fail, the data from the ones that succeeded is still
+    written before the error is raised.
+
+    Every translation gets its next check scheduled: soon if its status
+    just changed, later and later (backing off) if it didn't or if the
+    call failed. Translations whose call was never sent (they ran out
+    of time, see deadline, or the circuit breaker or rate limiter of
+    the Unbabel API client turned it down, see UNSENT_CALL_ERRORS) are
+    left as they are, still due, without backing off.
+
+    Translations being refreshed by another transaction (e.g. by the
+    poller, or another web worker) are left to it: their advisory lock
+    (see cervantes.singleflight) is taken for the rest of the session's
+    transaction, and the ones already locked are skipped.
+
         translations : list<Translation>
-            List of Translation instances. The UIDs are used to query
-            the Unbabel API one by one. Fresh data is used to mutate
-            the Translation instance.
+            List of persistent Translation instances. The UIDs are used
+            to query the Unbabel API. Fresh data is written to the
+            database and set on the Translation instance.
+        max_in_flight : int = None
+            Maximum number of concurrent calls to the Unbabel API.
+            Defaults to the TRANSLATIONS_REFRESH_WORKERS app config.
+        deadline : float = None
+            time.monotonic() time to be done with the Unbabel API by.
+            No limit if None.
 
         Returns : list<Translation>
             Return the updated list.
 
         Raises
-            unbabelapi.UnbabelAPIError
-                When the call or request to the Unbabel API fails.
+            RefreshError
+                When the call or request to the Unbabel API fails (or
+                runs out of time) for any of the translations.
     """
 
-    for translation in translations:
-        updated_translation = unbabelapi.request_translation_update(
-            translation.uid)
+    if max_in_flight is None:
+        max_in_flight = current_app.config.get(
+            'TRANSLATIONS_REFRESH_WORKERS', DEFAULT_REFRESH_WORKERS)
+
+    locked_uids = try_advisory_locks(db.session, UPDATE_LOCK_NAMESPACE,
+                                     [translation.uid for translation in translations])
+    # Somebody else is already on the others
+    translations_to_update = [translation for translation in translations
+                              if translation.uid in locked_uids]
+
+    updates, errors = _fetch_translation_updates(
+        [translation.uid for translation in translations_to_update], max_in_flight,
+        deadline)
+
+    now = datetime.utcnow()
+    changes = []
+
+    for translation in translations_to_update:
+        if isinstance(errors.get(translation.uid), UNSENT_CALL_ERRORS):
+            # Never checked, keep it due
+            continue
+
+        updated_translation = updates.get(translation.uid)
+        # A failed call counts as a check that found nothing new, so it
+        # isn't retried right away
+        status_changed = updated_translation is not None and \
+            translation.status != updated_translation.get('status')
+
+        values = translation.next_check(reset=status_changed, now=now)
 
         # Status changed? Update the original Translation record
-        if translation.status != updated_translation.get('status'):
-            translation.status = updated_translation.get('status')
-            translation.translated_text = updated_translation.get(
-                'translatedText', None)
-            translation.text_length = len(
-                updated_translation.get('translatedText', ''))
+        if status_changed:
+            translated_text = updated_translation.get('translatedText', None)
+            values.update(
+                status=updated_translation.get('status'),
+                translated_text=translated_text,
+                text_length=len(translated_text or ''),
+                date_updated=now)
+
+        changes.append((translation, values))
+
+    status_changes = [(translation, values) for translation, values in changes
+                      if 'status' in values]
+    if status_changes:
+        # Every status change of this refresh makes one new version
+        version = TranslationsVersion.bump(now)
+        for translation, values in status_changes:
+            values['change_seq'] = version
+            events.record(db.session, {
+                'uid': translation.uid, 'status': values['status'], 'change_seq': version})
+
+    Translation.bulk_update(changes)
+
+    if errors:
+        raise RefreshError(
+            'Failed to update {} of {} translations: {}'.format(
+                len(errors), len(translations_to_update),
+                ', '.join(sorted(errors))),
+            sorted(errors))
+
+    return translations
+
+
+def _refresh_cycle(deadline=None):
+    """
+    Refresh the pending translations against the Unbabel API, and
+    commit, unless another process is at it already: then wait for it
+    to commit instead.
+
+        deadline : float = None
+            time.monotonic() time to be done by. No limit if None.
+
+        Returns : (bool, list<str>)
+            False if some of the Unbabel API calls failed (or ran out
+            of time), and the UIDs of the translations that weren't
+            refreshed. None instead of the UIDs if the other process
+            didn't commit in time: any pending translation may be
+            stale.
+    """
+
+    if not try_advisory_locks(db.session, REFRESH_LOCK_NAMESPACE, ['refresh']):
+        # Its commit releases the lock, and makes its writes visible
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        committed = wait_advisory_lock(db.session, REFRESH_LOCK_NAMESPACE, 'refresh',
+                                       timeout)
+        db.session.commit()
+        # Not committed in time: it may still be at it
+        return (True, []) if committed else (False, None)
+
+    try:
+        # Write the fresh data in the DB session, to be committed
+        _update_translations(Translation.get_all_pending(), deadline=deadline)
+        succeeded, stale_uids = True, []
+    except RefreshError as exc:
+        succeeded, stale_uids = False, exc.uids
+    except unbabelapi.UnbabelAPIError:
+        succeeded, stale_uids = False, None
+
+    # Whatever was refreshed before a failure is still worth keeping.
+    # The lock is released along.
+    db.session.commit()
+
+    return succeeded, stale_uids
+
+
+def _refresh_pending_translations(deadline=None):
+    """
+    Refresh the pending translations against the Unbabel API, and
+    commit. Concurrent refreshes are coalesced: a refresh started
+    while another is in flight in the process waits for it and shares
+    its outcome, and one started while another process refreshes
+    waits for its commit (see _refresh_cycle). Either way, the fresh
+    data is committed when this returns.
+
+        deadline : float = None
+            time.monotonic() time to be done by. No limit if None. A
+            refresh in flight keeps its own deadline.
+
+        Returns : (bool, list<str>)
+            See _refresh_cycle.
+    """
+
+    return refreshes.do('refresh', _refresh_cycle, deadline)
+
+
+def _add_stale_header(response, stale_uids):
+    """
+    Tell which translations of a response may be out of date, because
+    they couldn't be refreshed, with the 'X-Stale-Translations' header:
+    their UIDs, comma separated, or '*' for any pending translation
+    (also when there are more than MAX_STALE_HEADER_UIDS of them, the
+    rows of the body tell which). Nothing is added if they are all
+    fresh.
+
+        response : flask.Response
+        stale_uids : list<str>
+            UIDs of the translations that may be out of date. None for
+            any pending translation.
+
+        Returns : flask.Response
+            The same response.
+    """
+
+    if stale_uids is None or len(stale_uids) > MAX_STALE_HEADER_UIDS:
+        response.headers['X-Stale-Translations'] = '*'
+    elif stale_uids:
+        response.headers['X-Stale-Translations'] = ','.join(stale_uids)
+
+    return response
+
+
+def _is_stale(translation):
+    """
+    Tell whether a translation of the response may be out of date,
+    because the refresh of the request couldn't get to it. Only
+    pending translations ever are.
+
+        translation : Translation
+            Or a row of Translation.query_all_rows.
+
+        Returns : bool
+    """
+
+    stale_uids = g.get('stale_uids', ())
+
+    if translation.status not in PENDING_STATUSES:
+        return False
+    if stale_uids is None:
+        return True
+    return translation.uid in stale_uids
+
+
+def _get_flag(name):
+    """
+    Reads a boolean query parameter. Anything but '', '0' and 'false'
+    (in any case) counts as set.
+
+        name : str
+
+        Returns : bool
+            False if the parameter isn't given.
+    """
+
+    return request.args.get(name, 'false').lower() not in ('', '0', 'false')
+
+
+def _get_page_args(streaming=False):
+    """
+    Reads the 'limit' and 'after' query parameters of the listing.
+
+        streaming : bool = False
+            If set to True, the listing is streamed, so there are no
+            pages: the limit defaults to None (the whole listing) and
+            isn't capped.
+
+        Returns : (int, (int, datetime, str))
+            Page size, clamped to [1, MAX_PAGE_SIZE] and defaulting to
+            the TRANSLATIONS_PAGE_SIZE app config (None by default when
+            streaming), and the decoded 'after' cursor (None if not
+            given).
+
+        Raises
+            werkzeug.exceptions.BadRequest
+                When 'limit' isn't an integer or 'after' isn't a valid
+                cursor.
+    """
+
+    try:
+        limit = request.args.get('limit')
+        if limit is None and not streaming:
+            limit = current_app.config.get('TRANSLATIONS_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+        if limit is not None:
+            limit = int(limit)
+        after = request.args.get('after')
+        if after:
+            after = Translation.decode_cursor(after)
+    except ValueError:
+        abort(400)
+
+    if limit is not None:
+        limit = max(1, limit if streaming else min(limit, MAX_PAGE_SIZE))
+
+    return limit, after or None
+
+
+def _encode_sync_cursor(version, uid=None):
+    """
+    Turn a position in the changes of the listing into an opaque delta
+    sync cursor.
+
+        version : int
+            Version of the listing (see TranslationsVersion).
+        uid : str = None
+            UID of the last translation of that version already sent,
+            if only some of them were.
+
+        Returns : str
+    """
+
+    return str(version) if uid is None else '{}.{}'.format(version, uid)
+
+
+def _get_since_arg():
+    """
+    Reads the 'since' query parameter of the listing: a delta sync
+    cursor, as given in the 'X-Sync-Cursor' header.
+
+        Returns : (int, str)
+            Version of the listing and UID (None if not given) the
+            client is up to date with. None if 'since' isn't given.
+
+        Raises
+            werkzeug.exceptions.BadRequest
+                When 'since' isn't a valid cursor.
+    """
+
+    since = request.args.get('since')
+    if since is None:
+        return None
+
+    version, separator, uid = since.partition('.')
+
+    try:
+        version = int(version)
+    except ValueError:
+        abort(400)
+
+    if version < 0 or (separator and not uid.isalnum()):
+        abort(400)
+
+    return version, uid or None
+
+
+def _render_changes(output_format, since, limit, version):
+    """
+    Render the translations created or changed since a delta sync
+    cursor, in the order of the changes. The cursor to sync from next
+    time is returned in the 'X-Sync-Cursor' header; when there are
+    more changes than limit, the header 'X-Sync-More: true' tells to
+    sync again right away.
+
+        output_format : str
+            'json' for a JSON array, anything else for HTML table rows.
+        since : (int, str)
+            Version and UID from the 'since' cursor, see _get_since_arg.
+        limit : int
+            Maximum number of translations.
+        version : int
+            Current version of the listing, read before the changes.
+
+        Returns : flask.Response
+    """
+
+    # One extra record tells if there are more changes
+    translations = Translation.get_changed_since(*since, limit=limit + 1)
+    more = len(translations) > limit
+    translations = translations[:limit]
+
+    if output_format == 'json':
+        serialized_translations = [t.dictify() for t in translations]
+        for translation, serialized_translation in zip(translations,
+                                                       serialized_translations):
+            if _is_stale(translation):
+                serialized_translation['stale'] = True
+        response = _json_response(serialized_translations)
+    else:
+        response = make_response(render_template(
+            'translation_rows.html', translations=translations))
+
+    if more:
+        last = translations[-1]
+        response.headers['X-Sync-Cursor'] = _encode_sync_cursor(last.change_seq, last.uid)
+        response.headers['X-Sync-More'] = 'true'
+    else:
+        # Changes committed since the version was read may be sent again
+        response.headers['X-Sync-Cursor'] = _encode_sync_cursor(max(
+            [version] + [t.change_seq for t in translations[-1:]]))
+
+    return response
+
+
+def _add_next_page_headers(response, next_cursor):
+    """
+    Point a page of the listing to the next one, with the
+    'X-Next-Cursor' and 'Link: rel="next"' headers. Nothing is added
+    to the last page.
+
+        response : flask.Response
+        next_cursor : str
+            Cursor of the next page, None if there is none.
+
+        Returns : flask.Response
+            The same response.
+    """
+
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = '<{}>; rel="next"'.format(url_for(
+            'translations.get_translations', _external=True,
+            **dict(request.args.items(), after=next_cursor)))
+
+    return response
+
+
+def _dump_json(data):
+    """
+    Serialize data into compact JSON, byte for byte like jsonify would
+    (minus the trailing newline), but faster: with orjson when it is
+    installed, falling back to the standard library encoder otherwise.
+
+        data : list or dict
+            Document made of JSON types only (str, int, None, ...).
+
+        Returns : bytes
+    """
+
+    config = current_app.config
+    sort_keys = config.get('JSON_SORT_KEYS', True)
+    as_ascii = config.get('JSON_AS_ASCII', True)
+    body = None
+
+    if orjson is not None:
+        body = orjson.dumps(data, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+        # orjson never escapes non-ASCII characters (nor DEL, which the
+        # standard library escapes along with them)
+        if as_ascii and (not body.isascii() or b'\x7f' in body):
+            body = None
+
+    if body is None:
+        body = json.dumps(data, ensure_ascii=as_ascii, separators=(',', ':'),
+                          sort_keys=sort_keys).encode('utf-8')
+
+    return body
+
+
+def _json_response(data):
+    """
+    Serialize data into a JSON response, byte for byte like jsonify
+    would, with _dump_json. Pretty printed output (in debug mode) is
+    left to jsonify.
+
+        data : list or dict
+            Document made of JSON types only (str, int, None, ...).
+
+        Returns : flask.Response
+    """
+
+    config = current_app.config
+
+    if current_app.debug or config.get('JSONIFY_PRETTYPRINT_REGULAR'):
+        return jsonify(data)
+
+    return current_app.response_class(
+        _dump_json(data) + b'\n',
+        mimetype=config.get('JSONIFY_MIMETYPE', 'application/json'))
+
+
+def _batches(rows, size):
+    """Yield lists of up to size rows, consuming rows lazily."""
+
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+def _stream_json(rows):
+    """
+    Yield a JSON array of the serialized rows, a batch of rows at a
+    time. Put together, the chunks are the compact jsonify output.
+
+        rows : iterable<tuple>
+            Rows of Translation.query_all_rows.
+    """
+
+    yield b'['
+
+    separator = b''
+    for batch in _batches(rows, STREAM_BATCH_SIZE):
+        yield separator + _dump_json(_dictify_rows(batch))[1:-1]
+        separator = b','
+
+    yield b']\n'
+
+
+def _stream_ndjson(rows):
+    """
+    Yield the serialized rows as newline delimited JSON (one object
+    per line), a batch of rows at a time.
+
+        rows : iterable<tuple>
+            Rows of Translation.query_all_rows.
+    """
+
+    for batch in _batches(rows, STREAM_BATCH_SIZE):
+        yield b''.join(_dump_json(translation) + b'\n'
+                       for translation in _dictify_rows(batch))
+
+
+def _stream_translations(output_format, limit, after):
+    """
+    Stream the listing, instead of building it whole before sending
+    it. Rows are pulled from a server-side cursor, STREAM_BATCH_SIZE at
+    a time, and sent as soon as they are serialized, so memory stays
+    flat whatever the size of the listing.
+
+        output_format : str
+            'json' for a JSON array, 'ndjson' for newline delimited
+            JSON, anything else for the HTML table.
+        limit : int
+            Maximum number of translations. All of them if None.
+        after : (int, datetime, str)
+            Listing key to start after, as returned by decode_cursor.
+
+        Returns : flask.Response
+            Streamed response.
+    """
+
+    rows = Translation.query_all_rows(limit=limit, after=after).yield_per(
+        STREAM_BATCH_SIZE)
+
+    if output_format == 'json':
+        return current_app.response_class(
+            stream_with_context(_stream_json(rows)),
+            mimetype=current_app.config.get('JSONIFY_MIMETYPE', 'application/json'))
+
+    if output_format == 'ndjson':
+        return current_app.response_class(
+            stream_with_context(_stream_ndjson(rows)),
+            mimetype='application/x-ndjson')
+
+    # Flask 1.0 has no stream_template, render the template as a stream
+    # ourselves. The rows have the attributes the template needs.
+    template = current_app.jinja_env.get_template(
+        'translation_rows.html' if after is not None else 'translation_table.html')
+    context = {'translations': rows}
+    current_app.update_template_context(context)
+    stream = template.stream(context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+
+    return current_app.response_class(stream_with_context(stream), mimetype='text/html')
+
+
+def _render_page(output_format, limit, after):
+    """
+    Render a page of the listing, pointing to the next one if there
+    are more translations after it.
+
+        output_format : str
+            'json' for a JSON array, anything else for the HTML table
+            (or only its rows, for the pages after the first).
+        limit : int
+            Page size.
+        after : (int, datetime, str)
+            Listing key to start after, as returned by decode_cursor.
+
+        Returns : flask.Response
+    """
+
+    if output_format == 'json':
+        # Plain rows, no Translation instances: (much) faster to serialize
+        # One extra record tells if there is a next page
+        rows = Translation.query_all_rows(limit=limit + 1, after=after).all()
+        next_cursor = Translation.encode_cursor(
+            rows[limit - 1].text_length, rows[limit - 1].date_updated,
+            rows[limit - 1].uid) if len(rows) > limit else None
+
+        response = _json_response(_dictify_rows(rows[:limit]))
+        return _add_next_page_headers(response, next_cursor)
+
+    # One extra record tells if there is a next page
+    translations = Translation.get_all(limit=limit + 1, after=after)
+    next_cursor = translations[limit - 1].cursor if len(translations) > limit else None
+    translations = translations[:limit]
+
+    if after is not None:
+        # Following pages only need their rows, appended to the table
+        response = make_response(render_template(
+            'translation_rows.html', translations=translations))
+    else:
+        # If JSON wasn't requested, return a rendered HTML table with the results
+        response = make_response(render_template(
+            'translation_table.html', translations=translations))
+
+    return _add_next_page_headers(response, next_cursor)
+
+
+def _render_cached_page(output_format, limit, after, version):
+    """
+    Same as _render_page, but served from listing_cache when the same
+    page of the same version of the listing was already rendered.
+
+    The version is part of the key, so a page is never served once a
+    change of the listing is committed, by any process. Pages of this
+    process are also dropped as soon as it commits writes to the
+    translations, even the ones that don't bump the version.
+
+        output_format : str
+        limit : int
+        after : (int, datetime, str)
+            See _render_page.
+        version : int
+            Current version of the listing, read before rendering.
+
+        Returns : flask.Response
+    """
+
+    if listing_cache is None:
+        return _render_page(output_format, limit, after)
+
+    key = 'listing:{}:{}:{}:v{}'.format(
+        'json' if output_format == 'json' else 'html', limit,
+        Translation.encode_cursor(*after) if after is not None else '', version)
+
+    cached_page = listing_cache.get(key)
+    if cached_page is not None:
+        body, mimetype, next_cursor = cached_page
+        response = current_app.response_class(body, mimetype=mimetype)
+        return _add_next_page_headers(response, next_cursor)
+
+    generation = _listing_generation
+    response = _render_page(output_format, limit, after)
+
+    with _listing_lock:
+        if generation == _listing_generation:
+            listing_cache.set(key, (response.get_data(), response.mimetype,
+                                    response.headers.get('X-Next-Cursor')))
+
+    return response
 
 
 @bp.route('/')
 def get_translations():
     """
-    Retrieve Translation records, filtered by the ones that are pending,
-    and query the Unbabel API for each one, updating each record that
-    recieves a fresher status. Return all Translation records afterwards,
-    with optional JSON formatting.
+    Return the Translation records as stored in the database, a page
+    at a time, with optional JSON formatting. Pending records are
+    refreshed by the poller, not here, unless explicitly asked for.
+
+    When there are more records after the page, the cursor to the next
+    page is returned in the 'X-Next-Cursor' header (and as a 'next'
+    link in the 'Link' header). The cursor to sync the changes from
+    later on (see '?since') is returned in the 'X-Sync-Cursor' header.
+
+    Responses carry an ETag and a Last-Modified date, from the version
+    of the listing (see TranslationsVersion). Conditional requests
+    (If-None-Match, If-Modified-Since) get a 304 Not Modified without
+    loading any translation if the listing didn't change since. Pages
+    that aren't streamed are cached until the listing changes (see
+    _render_cached_page).
 
         Default
             Response : text/html
@@ -93,34 +1125,113 @@ def get_translations():
             Response : application/json
             Returns the Translations records as a JSON array of translation
             objects.
+
+        /?limit=<int>
+            Number of records per page. Defaults to the
+            TRANSLATIONS_PAGE_SIZE app config (100), at most 1000.
+
+        /?after=<cursor>
+            Return the page that follows the given cursor. For HTML,
+            only the table rows are rendered, to be appended to the
+            table of the previous pages.
+
+        /?format=ndjson
+            Response : application/x-ndjson
+            Stream the Translation records as newline delimited JSON,
+            one translation object per line.
+
+        /?stream=true
+            Stream the listing as it is read from the database, for
+            large listings. Without 'limit', the whole listing is
+            streamed (from 'after', if given) and there are no
+            next page headers. Streamed JSON is never pretty printed.
+
+        /?since=<cursor>
+            Only return the Translation records created or changed
+            since the cursor (from the 'X-Sync-Cursor' header of a
+            previous response), in the order of the changes: JSON, or
+            HTML table rows to merge into the table. Pages hold up to
+            'limit' records.
+
+        /?refresh=true
+            Before listing, retrieve the pending Translation records and
+            query the Unbabel API for each one, updating each record that
+            recieves a fresher status. Concurrent refreshes share the
+            one in flight. Skipped while the Unbabel API is down (see
+            unbabelapi.CircuitBreaker). The refresh takes at most
+            TRANSLATIONS_REFRESH_BUDGET seconds (5 by default, 0 for no
+            limit): whatever was refreshed by then is kept, and the
+            translations that couldn't be refreshed are listed as they
+            are, their UIDs given in the 'X-Stale-Translations' header
+            ('*' for any pending translation, or too many of them)
+            and flagged in the body: '"stale": true' in JSON, the
+            'stale' class on HTML table rows.
     """
 
-    pending_translations = Translation.get_all_pending()
+    succeeded, stale_uids = True, []
+    # For the rows of the body to flag, see _is_stale
+    g.stale_uids = set()
 
-    try:
-        # Mutate the list elements so we can commit the DB session
-        # and update the records
-        _update_translations(pending_translations)
-        db.session.commit()
-    except unbabelapi.UnbabelAPIError as exc:
-        # Something went wrong with the call to the Unbabel API, warn user
-        flash('Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.')
+    if _get_flag('refresh'):
+        if unbabelapi.is_available():
+            budget = current_app.config.get('TRANSLATIONS_REFRESH_BUDGET',
+                                            DEFAULT_REFRESH_BUDGET)
+            succeeded, stale_uids = _refresh_pending_translations(
+                time.monotonic() + budget if budget else None)
+        else:
+            # While the Unbabel API is down, don't even try: list what we have
+            succeeded, stale_uids = False, None
 
-    translations = Translation.get_all()
+        if not succeeded:
+            # Something went wrong with the call to the Unbabel API, warn user
+            flash('Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.')
 
-    if request.args.get('format') == 'json':
-        serialized_translations = [t.dictify() for t in translations]
-        return jsonify(serialized_translations)
+        g.stale_uids = None if stale_uids is None else set(stale_uids)
 
-    # If JSON wasn't requested, return a rendered HTML table with the results
-    return render_template('translation_table.html', translations=translations)
+    output_format = request.args.get('format')
+    streaming = output_format == 'ndjson' or _get_flag('stream')
+    limit, after = _get_page_args(streaming=streaming)
+    since = _get_since_arg()
+
+    # Answer conditional requests before loading any translation. The
+    # version is read first, so the rows are never older than it.
+    version, last_modified = TranslationsVersion.current()
+    etag = 'v{}'.format(version)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    elif since is not None:
+        return _add_stale_header(
+            _render_changes(output_format, since, limit, version), stale_uids)
+    elif streaming:
+        response = _stream_translations(output_format, limit, after)
+    elif not succeeded or stale_uids != []:
+        # Pages with stale rows flagged are for this response only
+        response = _render_page(output_format, limit, after)
+    else:
+        response = _render_cached_page(output_format, limit, after, version)
+
+    # Where to sync the deltas from, once this listing is loaded
+    response.headers['X-Sync-Cursor'] = _encode_sync_cursor(version)
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Cacheable, but always revalidated: it changes with every translation
+    response.headers['Cache-Control'] = 'no-cache'
+
+    return _add_stale_header(response, stale_uids)
 
 
 @bp.route('/', methods=('POST',))
 def add_translation():
     """
     Accept a translation request and hit the Unbabel API, subsequently
-    storing it in the database for easier access later.
+    storing it in the database for easier access later. Fails right
+    away while the Unbabel API is down (see unbabelapi.CircuitBreaker).
+
+    The same content (see models.content_hash) is never requested
+    twice: when it was translated already, or is being translated, that
+    translation is listed as is and the Unbabel API isn't called.
 
         Default
             Response : null
@@ -142,23 +1253,27 @@ def add_translation():
         flash('Please submit all required inputs!')
         return redirect(url_for('index'))
 
+    # Asked for already? Then it is in the listing, or on its way
+    request_hash = content_hash(translation_input['source_lang'],
+                                translation_input['target_lang'], translation_input['text'])
+    existing_translation = Translation.find_by_content_hashes([request_hash]).get(request_hash)
+    translation_memory.count(existing_translation is not None)
+    if existing_translation is not None:
+        return redirect(url_for('index'))
+
+    # The Unbabel API is down, don't keep the user waiting on it
+    if not unbabelapi.is_available():
+        flash('Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.')
+        return redirect(url_for('index'))
+
     try:
         # Before we submit the translation to the API, make sure the
-        # language pair is available
-        language_pairs = unbabelapi.request_language_pairs().get('objects', [])
-        available_pair = False
-        for language_pair in language_pairs:
-            source_language = language_pair['lang_pair']['source_language']['shortname']
-            target_language = language_pair['lang_pair']['target_language']['shortname']
-
-            if (source_language == translation_input['source_lang']
-                    and target_language == translation_input['target_lang']):
-                # It's valid, no need to keep looking
-                available_pair = True
-                break
-
-        if not available_pair:
-            # We've exhausted all possible pairs - it's not available
+        # language pair is available (the pairs are cached, so this
+        # seldom reaches the Unbabel API)
+        language_pairs = unbabelapi.language_pairs.get()
+
+        if not language_pairs.is_available(translation_input['source_lang'],
+                                           translation_input['target_lang']):
             flash(
                 'Our robots are still learning how to translate that, sorry! Try another language pair please.')
             return redirect(url_for('index'))
@@ -179,6 +1294,13 @@ def add_translation():
             source_language=new_translation['source_language'],
             target_language=new_translation['target_language'],
             text=new_translation['text'])
+        # Don't check on it before Unbabel had a chance to work on it
+        new_record.schedule_next_check(reset=True)
+
+        new_record.change_seq = TranslationsVersion.bump()
+        events.record(db.session, {
+            'uid': new_record.uid, 'status': new_record.status,
+            'change_seq': new_record.change_seq})
 
         db.session.add(new_record)
         db.session.commit()
@@ -189,20 +1311,579 @@ def add_translation():
     return redirect(url_for('index'))
 
 
+def _read_batch():
+    """
+    Reads the items of a batch submission from the request: either an
+    uploaded file (the 'file' form field) or the request body. The
+    format is told by the file extension or the content type:
+
+        JSON (.json, application/json)
+            An array of items.
+        CSV (.csv, text/csv)
+            One item per row, with an optional header row.
+        NDJSON (.ndjson or .jsonl, application/x-ndjson)
+            One item per line.
+
+        Returns : list
+            The items, as they were given (see _parse_batch_item). A
+            ValueError stands in for each NDJSON line that isn't valid
+            JSON, so that it fails on its own.
+
+        Raises
+            ValueError
+                When the document can't be read, or its format is
+                unknown.
+    """
+
+    upload = request.files.get('file')
+    if upload is not None:
+        name, mimetype, data = (upload.filename or '').lower(), upload.mimetype, upload.read()
+    else:
+        name, mimetype, data = '', request.mimetype, request.get_data()
+
+    try:
+        document = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError('The batch must be encoded in UTF-8')
+
+    if name.endswith('.csv') or mimetype == 'text/csv':
+        try:
+            rows = [row for row in csv.reader(io.StringIO(document)) if row]
+        except csv.Error as exc:
+            raise ValueError('Invalid CSV: {}'.format(exc))
+        header = [value.strip().lower() for value in rows[0]] if rows else None
+        if header in (list(BATCH_FIELDS), ['source_language', 'target_language', 'text']):
+            rows = rows[1:]
+        return rows
+
+    if name.endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson',
+                                                            'application/jsonl'):
+        items = []
+        for number, line in enumerate(document.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                items.append(ValueError('Invalid JSON on line {}: {}'.format(number, exc)))
+        return items
+
+    if name.endswith('.json') or (upload is None and request.is_json):
+        items = json.loads(document)
+        if not isinstance(items, list):
+            raise ValueError('Expected a JSON array of translations')
+        return items
+
+    raise ValueError('Expected a JSON array, or a CSV or NDJSON file')
+
+
+def _parse_batch_item(item):
+    """
+    Validates an item of a batch submission.
+
+        item : dict or list or ValueError
+            {source, target, text} (or {source_language,
+            target_language, text}) object, or [source, target, text]
+            array (or CSV row). A ValueError (an NDJSON line that
+            couldn't be read, see _read_batch) is raised.
+
+        Returns : (str, str, str)
+            Source language, target language and text.
+
+        Raises
+            ValueError
+                When the item isn't shaped as expected, or a field is
+                missing or empty.
+    """
+
+    if isinstance(item, ValueError):
+        raise item
+
+    if isinstance(item, dict):
+        item = (item.get('source', item.get('source_language')),
+                item.get('target', item.get('target_language')),
+                item.get('text'))
+
+    if not isinstance(item, (list, tuple)) or len(item) != len(BATCH_FIELDS):
+        raise ValueError('Expected a source, a target and a text')
+
+    source_lang, target_lang, text = item
+    if not all(isinstance(value, str) and value.strip() for value in item):
+        raise ValueError('Missing source, target or text')
+
+    return source_lang.strip(), target_lang.strip(), text
+
+
+def _submit_translations(items, max_in_flight=DEFAULT_SUBMIT_WORKERS):
+    """
+    Requests a translation from the Unbabel API for each item. The
+    calls run concurrently on a thread pool, with at most max_in_flight
+    of them in flight at a time (and within the rate limit of the
+    Unbabel API client). Nothing here touches the database session.
+
+        items : list<(str, str, str)>
+            Source language, target language and text of each
+            translation.
+        max_in_flight : int = DEFAULT_SUBMIT_WORKERS
+            Maximum number of concurrent calls to the Unbabel API.
+
+        Yields : (int, dict | unbabelapi.UnbabelAPIError)
+            As soon as each call completes: the position of its item,
+            and the new translation request as returned by the Unbabel
+            API, or the error of the call.
+    """
+
+    if not items:
+        return
+
+    workers = max(1, min(max_in_flight, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        positions = {executor.submit(unbabelapi.request_translation, *item): position
+                     for position, item in enumerate(items)}
+
+        for future in as_completed(positions):
+            try:
+                yield positions[future], future.result()
+            except unbabelapi.UnbabelAPIError as exc:
+                yield positions[future], exc
+
+
+def _save_new_translations(new_records, result_indexes, results, now):
+    """
+    Inserts a chunk of the new translations of a batch submission with
+    a single bulk INSERT (see Translation.bulk_insert), as a new
+    version of the listing, and commits. If that fails, rolls back and
+    reports the items of the chunk as failed, with their UIDs (Unbabel
+    has them).
+
+        new_records : list<Translation>
+            Transient Translation instances.
+        result_indexes : list<list<int>>
+            For each translation, the indexes of the items it's the
+            result of.
+        results : list<dict>
+            Results of the items of the batch, updated in place.
+        now : datetime
+            Time of the submission.
+
+        Returns : int
+            Number of translations saved.
+    """
+
+    try:
+        version = TranslationsVersion.bump(now)
+        for new_record in new_records:
+            new_record.change_seq = version
+            events.record(db.session, {
+                'uid': new_record.uid, 'status': new_record.status,
+                'change_seq': version})
+
+        Translation.bulk_insert(new_records)
+        db.session.commit()
+    except sa.exc.SQLAlchemyError as exc:
+        db.session.rollback()
+        current_app.logger.exception('Failed to save the translations of a batch')
+
+        for new_record, indexes in zip(new_records, result_indexes):
+            for index in indexes:
+                results[index] = {
+                    'index': index, 'ok': False, 'uid': new_record.uid,
+                    'error': 'The translation couldn\'t be saved ({})'.format(
+                        type(exc).__name__)}
+        return 0
+
+    return len(new_records)
+
+
+@bp.route('/batch', methods=('POST',))
+def add_translations():
+    """
+    Accept many translation requests at once, hit the Unbabel API for
+    each of them, and store the new Translations in the database as
+    the calls complete, with a bulk INSERT and a commit every
+    BATCH_COMMIT_SIZE of them (see _save_new_translations).
+
+    Every language pair is validated against a single lookup of the
+    (cached) language pairs. The Unbabel API calls are made
+    concurrently, at most TRANSLATIONS_SUBMIT_WORKERS (4) at a time.
+    Invalid items (e.g. an NDJSON line that isn't JSON), the ones whose
+    call fails and the ones that couldn't be saved are reported without
+    failing the others. At most MAX_BATCH_SIZE translations per batch.
+
+    Like with add_translation, content translated (or being translated)
+    already isn't requested again, nor is the same content twice in a
+    batch: those items get the UID of the translation they share.
+
+        Default
+            Request : application/json
+            Array of {source, target, text} objects (or [source, target,
+            text] arrays).
+
+        Request : multipart/form-data
+            The 'file' field holds a JSON, CSV (source,target,text rows,
+            optional header) or NDJSON (one object or array per line)
+            file, told apart by its extension. The CSV or NDJSON
+            document can be the body itself too (text/csv,
+            application/x-ndjson).
+
+        Response : application/json
+            {"submitted": int, "failed": int, "results": [...]}, with,
+            for each item, in order: {"index", "ok": true, "uid",
+            "status", "reused"} or {"index", "ok": false, "error"} (and
+            the "uid" Unbabel gave it, if it couldn't be saved).
+            "submitted" counts the new translations saved only. 400 if the
+            batch can't be read, 413 if it is too large, 503 if the
+            Unbabel API is down.
+    """
+
+    try:
+        items = _read_batch()
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if not items:
+        return jsonify({'error': 'The batch is empty'}), 400
+
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': 'At most {} translations per batch'.format(
+            MAX_BATCH_SIZE)}), 413
+
+    # The Unbabel API is down, don't keep the user waiting on it
+    if not unbabelapi.is_available():
+        return jsonify({'error': 'The Unbabel API is unavailable'}), 503
+
+    try:
+        # One lookup for the whole batch (and seldom an Unbabel API call)
+        language_pairs = unbabelapi.language_pairs.get()
+    except unbabelapi.UnbabelAPIError:
+        return jsonify({'error': 'The Unbabel API is unavailable'}), 503
+
+    results = [None] * len(items)
+    valid_items = []
+
+    for index, item in enumerate(items):
+        try:
+            source_lang, target_lang, text = _parse_batch_item(item)
+        except ValueError as exc:
+            results[index] = {'index': index, 'ok': False, 'error': str(exc)}
+            continue
+
+        if not language_pairs.is_available(source_lang, target_lang):
+            results[index] = {'index': index, 'ok': False,
+                              'error': 'Language pair not available'}
+            continue
+
+        valid_items.append((index, (source_lang, target_lang, text)))
+
+    # One lookup of the translation memory for the whole batch
+    item_hashes = {index: content_hash(*item) for index, item in valid_items}
+    existing_translations = Translation.find_by_content_hashes(list(item_hashes.values()))
+    translation_memory.count(True, sum(1 for request_hash in item_hashes.values()
+                                       if request_hash in existing_translations))
+
+    # Items to submit (the first of each content), and the ones sharing them
+    items_to_submit, duplicates = [], {}
+
+    for index, item in valid_items:
+        request_hash = item_hashes[index]
+        existing_translation = existing_translations.get(request_hash)
+        if existing_translation is not None:
+            results[index] = {'index': index, 'ok': True, 'uid': existing_translation.uid,
+                              'status': existing_translation.status, 'reused': True}
+        elif request_hash in duplicates:
+            duplicates[request_hash].append(index)
+        else:
+            duplicates[request_hash] = []
+            items_to_submit.append((index, item))
+
+    translation_memory.count(False, len(items_to_submit))
+    translation_memory.count(True, sum(len(indexes) for indexes in duplicates.values()))
+
+    submitted = _submit_translations(
+        [item for _, item in items_to_submit],
+        current_app.config.get('TRANSLATIONS_SUBMIT_WORKERS', DEFAULT_SUBMIT_WORKERS))
+
+    saved, new_records, new_indexes = 0, [], []
+    now = datetime.utcnow()
+
+    for position, new_translation in submitted:
+        index, item = items_to_submit[position]
+        result_indexes = [index] + duplicates[item_hashes[index]]
+
+        if isinstance(new_translation, unbabelapi.UnbabelAPIError):
+            for result_index in result_indexes:
+                results[result_index] = {'index': result_index, 'ok': False,
+                                         'error': str(new_translation)}
+            continue
+
+        new_record = Translation(
+            uid=new_translation['uid'],
+            status=new_translation['status'],
+            source_language=new_translation['source_language'],
+            target_language=new_translation['target_language'],
+            text=new_translation['text'])
+        # Don't check on it before Unbabel had a chance to work on it
+        new_record.schedule_next_check(reset=True, now=now)
+        new_records.append(new_record)
+        new_indexes.append(result_indexes)
+
+        for result_index in result_indexes:
+            results[result_index] = {'index': result_index, 'ok': True,
+                                     'uid': new_record.uid, 'status': new_record.status,
+                                     'reused': result_index != index}
+
+        # Save as the calls complete, not after the slowest of them
+        if len(new_records) >= BATCH_COMMIT_SIZE:
+            saved += _save_new_translations(new_records, new_indexes, results, now)
+            new_records, new_indexes = [], []
+
+    if new_records:
+        saved += _save_new_translations(new_records, new_indexes, results, now)
+
+    return jsonify({
+        'submitted': saved,
+        'failed': sum(1 for result in results if not result['ok']),
+        'results': results,
+    })
+
+
+def _start_fuzzy_memory_sync():
+    """
+    Start syncing fuzzy_memory with the database in the background
+    (see cervantes.memory.MemorySync), every
+    TRANSLATIONS_SUGGEST_SYNC_INTERVAL seconds (30) and as translations
+    complete. Only the first call of the process starts it.
+    """
+
+    global _fuzzy_memory_sync
+
+    with _fuzzy_memory_sync_lock:
+        if _fuzzy_memory_sync is not None:
+            return
+
+        # Completions of the other processes too, if they are relayed
+        events.start_listener(db.engine)
+
+        _fuzzy_memory_sync = MemorySync(
+            current_app._get_current_object(), fuzzy_memory, events.broker,
+            current_app.config.get('TRANSLATIONS_SUGGEST_SYNC_INTERVAL',
+                                   DEFAULT_SYNC_INTERVAL))
+        _fuzzy_memory_sync.start()
+
+
+def _stop_fuzzy_memory_sync():
+    """Stop syncing fuzzy_memory, and wait for the thread to finish."""
+
+    global _fuzzy_memory_sync
+
+    with _fuzzy_memory_sync_lock:
+        if _fuzzy_memory_sync is None:
+            return
+
+        _fuzzy_memory_sync.stop()
+        _fuzzy_memory_sync.join()
+        _fuzzy_memory_sync = None
+
+
+@bp.route('/suggest')
+def get_suggestions():
+    """
+    Suggest completed translations whose text is similar to a given one
+    (e.g. differing in whitespace, punctuation or a word), from the
+    fuzzy translation memory, without calling the Unbabel API nor
+    reading the database. The memory is synced in the background: the
+    first lookup of the process starts indexing the completed
+    translations, and gets no suggestion until it is done.
+
+        /suggest?source=<code>&target=<code>&text=<text>
+            Response : application/json
+            JSON array of {uid, text, translated_text, similarity}
+            objects, the most similar (1 for the same text) first. 400
+            if a parameter is missing.
+
+        /suggest?limit=<int>
+            Maximum number of suggestions. 5 by default, at most 20.
+    """
+
+    source_lang = request.args.get('source', '').strip()
+    target_lang = request.args.get('target', '').strip()
+    text = request.args.get('text', '')
+
+    if not (source_lang and target_lang and text.strip()):
+        abort(400)
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SUGGESTIONS))
+    except ValueError:
+        abort(400)
+
+    _start_fuzzy_memory_sync()
+
+    return _json_response(fuzzy_memory.suggest(
+        source_lang, target_lang, text, limit=max(1, min(limit, MAX_SUGGESTIONS))))
+
+
+@bp.route('/stream')
+def stream_translation_events():
+    """
+    Push the translation events (a translation was requested, or its
+    status changed) to the browser as they are committed, as
+    Server-Sent Events.
+
+    Each event is a 'translation' event with the change_seq as its ID,
+    and {uid, status, change_seq} as its JSON data. Events are hints:
+    clients catch up on missed ones by syncing the listing with
+    '/translations/?since=<cursor>'.
+
+    An idle connection only holds a queue and the thread streaming to
+    it, which mostly sleeps; no database connection is held while
+    streaming. With a cooperative server (e.g. gunicorn's gevent
+    workers), that thread is a cheap greenlet. Connections are closed
+    after TRANSLATIONS_STREAM_TIMEOUT seconds, and browsers reconnect
+    on their own.
+
+    With a threaded server, that thread isn't available to serve pages,
+    so at most TRANSLATIONS_STREAM_MAX_OPEN streams (50, 0 for no
+    limit) are open at a time in the process: beyond that, idle pages
+    get a 503 and fall back to polling, instead of starving the others.
+
+        Default
+            Response : text/event-stream
+            503 (with Retry-After) if too many streams are open.
+    """
+
+    global _open_streams
+
+    config = current_app.config
+    heartbeat = config.get('TRANSLATIONS_STREAM_HEARTBEAT', DEFAULT_STREAM_HEARTBEAT)
+    timeout = config.get('TRANSLATIONS_STREAM_TIMEOUT', DEFAULT_STREAM_TIMEOUT)
+    max_open = config.get('TRANSLATIONS_STREAM_MAX_OPEN', DEFAULT_STREAM_MAX_OPEN)
+
+    with _open_streams_lock:
+        if max_open and _open_streams >= max_open:
+            response = current_app.response_class(
+                'Too many open event streams\n', status=503, mimetype='text/plain')
+            response.headers['Retry-After'] = str(STREAM_BUSY_RETRY_AFTER)
+            return response
+        _open_streams += 1
+
+    events.start_listener(db.engine)
+    subscription = events.broker.subscribe()
+    closed = []
+
+    def close():
+        """Release the stream, once: the response may close unread."""
+
+        global _open_streams
+
+        with _open_streams_lock:
+            if closed:
+                return
+            closed.append(True)
+            _open_streams -= 1
+
+        events.broker.unsubscribe(subscription)
+
+    def generate():
+        try:
+            yield 'retry: {}\n\n'.format(STREAM_RETRY)
+
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                event = subscription.get(
+                    timeout=min(heartbeat, max(0, deadline - time.monotonic())))
+                if event is None:
+                    # Keeps proxies from closing the connection, and
+                    # tells when the browser went away
+                    yield ': keep-alive\n\n'
+                    continue
+
+                yield 'id: {}\nevent: translation\ndata: {}\n\n'.format(
+                    event['change_seq'], json.dumps(event))
+        finally:
+            close()
+
+    response = current_app.response_class(generate(), mimetype='text/event-stream')
+    response.call_on_close(close)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+@bp.route('/metrics')
+def get_metrics():
+    """
+    Return the counters of the translation feature, to size and watch
+    it, in JSON format.
+
+        Default
+            Response : application/json
+            {"row_cache": {"html": {...}, "json": {...}},
+             "listing_cache": {...}, "single_flight": {...}}, with the
+            stats of each row cache and of the listing cache (see
+            LRUCache.stats; null if the listing cache is disabled), and
+            of the coalesced calls (see SingleFlight.stats), and
+            "open_streams", the events streams open. Then
+            "translation_memory": {...}, the new translation requests
+            that reused an earlier translation, or not (see
+            HitCounter.stats), "fuzzy_memory": {...}, the size and
+            lookups of the fuzzy translation memory (see
+            TranslationMemory.stats), and "unbabel": {...}, the
+            counters of the Unbabel API client (see UnbabelClient.stats;
+            null until it is first used).
+    """
+
+    return jsonify({
+        'row_cache': {
+            'html': row_html_cache.stats(),
+            'json': row_json_cache.stats(),
+        },
+        'listing_cache': listing_cache.stats() if listing_cache is not None else None,
+        'translation_memory': translation_memory.stats(),
+        'fuzzy_memory': fuzzy_memory.stats(),
+        'open_streams': _open_streams,
+        'single_flight': {
+            'translation_updates': translation_updates.stats(),
+            'refreshes': refreshes.stats(),
+        },
+        'unbabel': unbabelapi.get_client_stats(),
+    })
+
+
 @bp.route('/language_pairs')
 def get_language_pairs():
     """
     Retrieve all language pairs available through the Unbabel API in
-    JSON format.
+    JSON format. The pairs are served from the process-level cache,
+    stale if need be, so this seldom reaches the Unbabel API.
+
+    The response carries a stable hash of the pairs as its ETag and
+    can be cached by browsers and proxies (Cache-Control max-age and
+    stale-while-revalidate).
 
         Default
             Response : application/json
             Returns the available source / target language pairs for
             translation.
+
+        If-None-Match: <etag>
+            Response : null (304 Not Modified)
+            The client already holds the current language pairs.
     """
 
     try:
-        return jsonify(unbabelapi.request_language_pairs().get('objects', []))
+        language_pairs = unbabelapi.language_pairs.get()
     except unbabelapi.UnbabelAPIError as exc:
         flash('Uh oh - Unbabel isn\'t picking up the phone. Try again later, please.')
         return redirect(url_for('index'))
+
+    response = current_app.response_class(
+        language_pairs.body, mimetype='application/json')
+    response.set_etag(language_pairs.etag)
+    response.headers['Cache-Control'] = 'public, max-age={}, stale-while-revalidate={}'.format(
+        LANGUAGE_PAIRS_MAX_AGE, LANGUAGE_PAIRS_STALE_WHILE_REVALIDATE)
+
+    # Answers 304 Not Modified, without a body, to a matching If-None-Match
+    return response.make_conditional(request)
@@ -4,15 +4,74 @@ It fetches the authorization to make calls to the Unbabel API from a
 local config and defines the helper functions that make the calls to
 the API in sandbox mode.
 
+All calls go through a single long-lived UnbabelClient, which keeps a
+pool of keep-alive connections to the API so that consecutive calls
+don't pay for a new TCP + TLS handshake each time.
+
 Unbabel API docs: https://developers.unbabel.com/v2/docs
 
     class UnbabelAPIError : Exception
         Raised when something goes wrong during the call to the
         Unbabel API.
 
+    class RateLimitExceeded : UnbabelAPIError
+        Raised when a call to the Unbabel API would exceed our own rate
+        limit for longer than the caller is willing to wait.
+
+    class TokenBucket
+        Thread-safe token bucket rate limiter, with counters.
+
+    class DeadlineExceeded : UnbabelAPIError
+        Raised when a call to the Unbabel API can't be made before the
+        caller's deadline.
+
+    class CircuitOpen : UnbabelAPIError
+        Raised instead of calling the Unbabel API while it is deemed
+        down.
+
+    class CircuitBreaker
+        Thread-safe circuit breaker: stops the calls to the Unbabel API
+        for a while once too many of them fail or are too slow.
+
+    class HedgingPolicy
+        When to send a duplicate of a slow read, from the latency of
+        the recent reads, within a budget of duplicates.
+
+    class UnbabelConfig
+        Frozen configuration for the Unbabel API, with the request
+        headers already built.
+
+    class UnbabelClient
+        Long-lived HTTP client for the Unbabel API. Wraps a pooled
+        requests.Session with timeouts and a retry adapter.
+
+    function _timed_out
+        Private function that tells whether a failed request ran into
+        its connect or its read timeout.
+
+    function get_client
+        Return the process-wide UnbabelClient, building it from the
+        config the first time (or whenever its settings change).
+
+    function reset_client
+        Close the process-wide UnbabelClient and forget it.
+
+    function get_client_stats
+        Return the counters of the process-wide UnbabelClient, if it
+        was built.
+
+    function is_available
+        Tell if the Unbabel API is deemed up, i.e. if the circuit
+        breaker lets calls through.
+
     function _load_config
         Private function that loads and parses the YAML configuration
-        file that allows access to the Unbabel API.
+        file that allows access to the Unbabel API. The file is parsed
+        once and re-parsed only when it changes on disk.
+
+    function _get_config
+        Private function that returns the UnbabelConfig, translating
+        config errors into UnbabelAPIError.
 
     function request_language_pairs
         Sends a GET request to the Unbabel API to retrieve a list
@@ -25,28 +84,1079 @@ Unbabel API docs: https://developers.unbabel.com/v2/docs
     function request_translation_update
         Sends a GET request with an Unbabel-generated UID to query the
         latest status of a previously requested translation.
+
+    class LanguagePairs
+        Frozen snapshot of the available language pairs, with a
+        precomputed set of (source, target) shortnames for validation
+        and a precomputed JSON body and ETag for serving them.
+
+    class LanguagePairCache
+        Process-level cache of the language pairs, with a TTL and
+        stale-while-revalidate refresh.
+
+    language_pairs : LanguagePairCache
+        The process-wide language pair cache.
 """
 
 
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+from dataclasses import dataclass
+import hashlib
+import json
+import threading
+import time
+from types import MappingProxyType
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, ReadTimeoutError
+from urllib3.util.retry import Retry
 import yaml
 
+from cervantes.config import cached_yaml_file
+
+
+UNBABEL_API_URL = 'https://sandbox.unbabel.com/tapi/v2/'
+
 
 class UnbabelAPIError(Exception):
     """Something went wrong when calling the Unbabel API."""
     pass
 
 
+class RateLimitExceeded(UnbabelAPIError):
+    """A call to the Unbabel API was turned down by our rate limiter."""
+    pass
+
+
+class TokenBucket():
+    """
+    Token bucket rate limiter. Tokens are added at a steady rate, up
+    to the capacity of the bucket; each call takes one. Bursts of up to
+    capacity calls go through at once, then calls are spread at rate
+    per second. Thread-safe.
+
+    A call that finds the bucket empty reserves the next token and
+    waits for it, unless it would wait longer than its timeout: then it
+    is rejected right away, without waiting at all.
+
+        rate : float
+            Tokens added per second. None for no limit.
+        capacity : float = None
+            Maximum number of tokens, i.e. size of the bursts. Defaults
+            to rate (one second worth of calls), and is at least 1.
+        clock : callable = time.monotonic
+            Returns the current time, in seconds.
+        sleep : callable = time.sleep
+            Called with the number of seconds to wait for a token.
+
+        method acquire
+            Take a token, waiting for it up to a timeout.
+
+        method stats
+            Return the counters of the bucket.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(1, capacity if capacity is not None else rate or 1)
+        self.consumed = 0
+        self.rejected = 0
+        self.waited = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Take a token, waiting for it if the bucket is empty.
+
+            timeout : float = None
+                Seconds the caller is willing to wait. 0 to fail fast
+                when the bucket is empty, None to wait as long as it
+                takes.
+
+            Returns : float
+                Seconds waited.
+
+            Raises
+                RateLimitExceeded
+                    When the token can't be had within timeout.
+        """
+
+        if self.rate is None:
+            with self._lock:
+                self.consumed += 1
+            return 0.0
+
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            # Tokens already reserved by the waiting calls count as taken
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                self.rejected += 1
+                raise RateLimitExceeded(
+                    'Unbabel API rate limit reached ({} calls per second)'.format(self.rate))
+
+            self._tokens -= 1
+            self.consumed += 1
+            self.waited += wait
+
+        if wait > 0:
+            self._sleep(wait)
+
+        return wait
+
+    def stats(self):
+        """
+        Return the counters of the bucket.
+
+            Returns : dict
+                consumed (tokens taken), waited (total seconds spent
+                waiting for them), rejected (calls turned down), rate
+                and capacity.
+        """
+
+        with self._lock:
+            return {'consumed': self.consumed, 'waited': round(self.waited, 6),
+                    'rejected': self.rejected, 'rate': self.rate,
+                    'capacity': self.capacity}
+
+
+class DeadlineExceeded(UnbabelAPIError):
+    """A call to the Unbabel API ran out of time."""
+    pass
+
+
+class CircuitOpen(UnbabelAPIError):
+    """A call to the Unbabel API was stopped by the circuit breaker."""
+    pass
+
+
+class CircuitBreaker():
+    """
+    Circuit breaker of the calls to the Unbabel API. Thread-safe.
+
+    Closed, calls go through and their outcomes are recorded. Once
+    enough calls were made in the last window seconds, and too many of
+    them failed or were too slow, the circuit opens: calls are turned
+    down right away (with CircuitOpen) instead of waiting on an API
+    that is down or struggling. After cooldown seconds, the circuit is
+    half-open: a few trial calls go through, and the others are still
+    turned down. If the trials all succeed, the circuit closes again,
+    otherwise it opens for another cooldown.
+
+        failure_rate : float = 0.5
+            Share of failed calls opening the circuit.
+        slow_call : float = 5
+            Seconds past which a call counts as slow.
+        slow_rate : float = 0.8
+            Share of slow calls opening the circuit.
+        minimum_calls : int = 10
+            Number of calls in the window before the rates count.
+        window : float = 60
+            Seconds of calls the rates are computed on.
+        cooldown : float = 30
+            Seconds the circuit stays open before trial calls.
+        trial_calls : int = 1
+            Number of trial calls of the half-open circuit.
+        clock : callable = time.monotonic
+            Returns the current time, in seconds.
+
+        method allow
+            Let a call through, or turn it down.
+
+        method record
+            Record the outcome of a call let through.
+
+        method cancel
+            Forget a call let through that wasn't made after all.
+
+        property state
+            'closed', 'open' or 'half-open'.
+
+        method stats
+            Return the state and the counters of the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_rate=0.5, slow_call=5, slow_rate=0.8, minimum_calls=10,
+                 window=60, cooldown=30, trial_calls=1, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.trial_calls = trial_calls
+        self.opened = 0
+        self.rejected = 0
+        self._clock = clock
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._trials = 0
+        self._trial_successes = 0
+        # (time, failed, slow) of the calls in the window
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._update_state(self._clock())
+
+    def _update_state(self, now):
+        """Half-open the circuit once the cooldown is over. Needs the lock."""
+
+        if self._state == self.OPEN and now - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._trials = 0
+            self._trial_successes = 0
+
+        return self._state
+
+    def _open(self, now):
+        """Open the circuit. Needs the lock."""
+
+        self._state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.opened += 1
+
+    def allow(self):
+        """
+        Let a call through, unless the circuit is open (or half-open,
+        with its trial calls already going). Calls let through must
+        then be recorded (or cancelled).
+
+            Raises
+                CircuitOpen
+                    When the call is turned down.
+        """
+
+        with self._lock:
+            now = self._clock()
+            state = self._update_state(now)
+
+            if state == self.CLOSED:
+                return
+
+            if state == self.HALF_OPEN and self._trials < self.trial_calls:
+                self._trials += 1
+                return
+
+            self.rejected += 1
+            raise CircuitOpen('The Unbabel API is unavailable, retrying in {:.0f}s'.format(
+                max(0, self._opened_at + self.cooldown - now)))
+
+    def record(self, duration, failed):
+        """
+        Record the outcome of a call let through.
+
+            duration : float
+                Seconds the call took.
+            failed : bool
+                Whether the API failed to answer properly.
+        """
+
+        with self._lock:
+            now = self._clock()
+            slow = duration >= self.slow_call
+
+            if self._state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.trial_calls:
+                        self._state = self.CLOSED
+                return
+
+            if self._state == self.OPEN:
+                # Let through before the circuit opened
+                return
+
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and self._outcomes[0][0] <= now - self.window:
+                self._outcomes.popleft()
+
+            calls = len(self._outcomes)
+            if calls >= self.minimum_calls:
+                failures = sum(1 for _, failed, _ in self._outcomes if failed)
+                slow_calls = sum(1 for _, _, slow in self._outcomes if slow)
+                if failures >= self.failure_rate * calls or \
+                        slow_calls >= self.slow_rate * calls:
+                    self._open(now)
+
+    def cancel(self):
+        """Forget a call let through that wasn't made after all."""
+
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._trials > self._trial_successes:
+                self._trials -= 1
+
+    def stats(self):
+        """
+        Return the state and the counters of the breaker.
+
+            Returns : dict
+                state, calls (in the window), failures and slow_calls
+                (among them), opened (times the circuit opened),
+                rejected (calls turned down) and retry_in (seconds
+                before trial calls, while open).
+        """
+
+        with self._lock:
+            now = self._clock()
+            state = self._update_state(now)
+            return {
+                'state': state,
+                'calls': len(self._outcomes),
+                'failures': sum(1 for _, failed, _ in self._outcomes if failed),
+                'slow_calls': sum(1 for _, _, slow in self._outcomes if slow),
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'retry_in': round(max(0, self._opened_at + self.cooldown - now), 3)
+                if state == self.OPEN else None,
+            }
+
+
+class HedgingPolicy():
+    """
+    Hedging policy of the reads of the Unbabel API: when a read hasn't
+    answered after the given percentile of the latency of the recent
+    reads, a duplicate (hedge) is sent, and the first answer wins.
+    Thread-safe.
+
+    Hedges are capped by a budget: each read earns max_rate of a
+    hedge, and each hedge spends a whole one, so hedges are at most
+    max_rate of the reads (plus a small burst). When the API is slow
+    across the board, hedging stops instead of doubling the load.
+
+        percentile : float = 95
+            Percentile of the recent latencies to hedge after.
+        max_rate : float = 0.1
+            Hedges per read, at most.
+        window : int = 100
+            Number of recent latencies kept.
+        minimum_samples : int = 20
+            Number of latencies needed before hedging.
+        burst : float = 10
+            Hedges that can be saved up.
+
+        method delay
+            Return the seconds to wait before hedging a read.
+
+        method observe
+            Record the latency of a read that answered.
+
+        method try_hedge
+            Spend a hedge of the budget, if there is one.
+
+        method record_sent
+            Count a hedge that was sent.
+
+        method refund
+            Give back the budget of a hedge that was never sent.
+
+        method record_win
+            Count a hedge that answered first.
+
+        method stats
+            Return the counters of the policy.
+    """
+
+    def __init__(self, percentile=95, max_rate=0.1, window=100, minimum_samples=20,
+                 burst=10):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.minimum_samples = minimum_samples
+        self.burst = burst
+        self.reads = 0
+        self.fired = 0
+        self.won = 0
+        self.capped = 0
+        self._budget = 0.0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """
+        Count a read, and return the seconds to wait for it before
+        hedging.
+
+            Returns : float
+                None if there aren't enough latencies to go by yet.
+        """
+
+        with self._lock:
+            self.reads += 1
+            self._budget = min(self.burst, self._budget + self.max_rate)
+
+            return self._delay()
+
+    def _delay(self):
+        """Return the percentile of the latencies, if enough. Needs the lock."""
+
+        if len(self._latencies) < self.minimum_samples:
+            return None
+
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))]
+
+    def observe(self, latency):
+        """Record the latency of a read that answered, in seconds."""
+
+        with self._lock:
+            self._latencies.append(latency)
+
+    def try_hedge(self):
+        """
+        Spend a hedge of the budget. The hedge is only counted as fired
+        once it is sent (see record_sent).
+
+            Returns : bool
+                False if the budget is spent: don't hedge.
+        """
+
+        with self._lock:
+            if self._budget < 1:
+                self.capped += 1
+                return False
+
+            self._budget -= 1
+            return True
+
+    def record_sent(self):
+        """Count a hedge that was sent."""
+
+        with self._lock:
+            self.fired += 1
+
+    def refund(self):
+        """
+        Give back the budget spent on a hedge that was never sent
+        (turned down by the circuit breaker or the rate limit).
+        """
+
+        with self._lock:
+            self._budget = min(self.burst, self._budget + 1)
+
+    def record_win(self):
+        """Count a hedge that answered first."""
+
+        with self._lock:
+            self.won += 1
+
+    def stats(self):
+        """
+        Return the counters of the policy.
+
+            Returns : dict
+                reads, fired (hedges sent), won (hedges that answered
+                first), capped (hedges not sent for lack of budget),
+                and delay (current seconds to hedge after, None until
+                there are enough latencies).
+        """
+
+        with self._lock:
+            delay = self._delay()
+            return {'reads': self.reads, 'fired': self.fired, 'won': self.won,
+                    'capped': self.capped,
+                    'delay': round(delay, 6) if delay is not None else None}
+
+
+# Optional config keys that tune the UnbabelClient, by keyword argument
+_CLIENT_SETTINGS_KEYS = (
+    ('base_url', 'UNBABEL_API_URL'),
+    ('pool_size', 'UNBABEL_POOL_SIZE'),
+    ('connect_timeout', 'UNBABEL_CONNECT_TIMEOUT'),
+    ('read_timeout', 'UNBABEL_READ_TIMEOUT'),
+    ('retries', 'UNBABEL_RETRIES'),
+    ('read_rate', 'UNBABEL_READ_RATE'),
+    ('read_burst', 'UNBABEL_READ_BURST'),
+    ('write_rate', 'UNBABEL_WRITE_RATE'),
+    ('write_burst', 'UNBABEL_WRITE_BURST'),
+    ('rate_limit_wait', 'UNBABEL_RATE_LIMIT_WAIT'),
+    ('breaker_failure_rate', 'UNBABEL_BREAKER_FAILURE_RATE'),
+    ('breaker_slow_call', 'UNBABEL_BREAKER_SLOW_CALL'),
+    ('breaker_slow_rate', 'UNBABEL_BREAKER_SLOW_RATE'),
+    ('breaker_minimum_calls', 'UNBABEL_BREAKER_MINIMUM_CALLS'),
+    ('breaker_cooldown', 'UNBABEL_BREAKER_COOLDOWN'),
+    ('hedge_percentile', 'UNBABEL_HEDGE_PERCENTILE'),
+    ('hedge_max_rate', 'UNBABEL_HEDGE_MAX_RATE'),
+)
+
+
+@dataclass(frozen=True)
+class UnbabelConfig():
+    """
+    Frozen configuration for the Unbabel API. Built once per parse of
+    the config file and shared by every call, so the Authorization
+    header isn't rebuilt on each request.
+
+        username : str
+            Unbabel API username.
+        api_key : str
+            Unbabel API key.
+        headers : MappingProxyType
+            Read-only request headers, Authorization included.
+        client_settings : tuple<(str, any)>
+            (keyword, value) pairs for UnbabelClient, taken from the
+            optional UNBABEL_API_URL, UNBABEL_POOL_SIZE,
+            UNBABEL_CONNECT_TIMEOUT, UNBABEL_READ_TIMEOUT,
+            UNBABEL_RETRIES, UNBABEL_READ_RATE, UNBABEL_READ_BURST,
+            UNBABEL_WRITE_RATE, UNBABEL_WRITE_BURST,
+            UNBABEL_RATE_LIMIT_WAIT, UNBABEL_BREAKER_* and
+            UNBABEL_HEDGE_* keys.
+
+        classmethod from_dict
+            Build an UnbabelConfig from a parsed config document.
+    """
+
+    username: str
+    api_key: str
+    headers: MappingProxyType
+    client_settings: tuple = ()
+
+    @classmethod
+    def from_dict(cls, unbabel_config):
+        """
+        Build an UnbabelConfig from a parsed config document.
+
+            unbabel_config : dict
+                Dictionary of config keys and their values.
+
+            Returns : UnbabelConfig
+
+            Raises
+                KeyError
+                    When UNBABEL_USERNAME or UNBABEL_API_KEY is missing.
+                TypeError
+                    When the document is not a mapping.
+        """
+
+        headers = MappingProxyType({
+            'Content-Type': 'application/json',
+            'Authorization': 'ApiKey {UNBABEL_USERNAME}:{UNBABEL_API_KEY}'.format(**unbabel_config)
+        })
+        client_settings = tuple((kwarg, unbabel_config[key])
+                                for kwarg, key in _CLIENT_SETTINGS_KEYS
+                                if key in unbabel_config)
+
+        return cls(username=unbabel_config['UNBABEL_USERNAME'],
+                   api_key=unbabel_config['UNBABEL_API_KEY'],
+                   headers=headers,
+                   client_settings=client_settings)
+
+
+class UnbabelClient():
+    """
+    Long-lived HTTP client for the Unbabel API.
+
+    Holds a requests.Session mounted with an HTTPAdapter, so that
+    connections to the API are kept alive and reused across calls
+    instead of being opened (and TLS-negotiated) once per call.
+    Idempotent requests (GET) that fail on connection errors or
+    gateway errors are retried with exponential backoff. POSTs are
+    never retried, so a translation is never requested twice. Neither
+    are requests with a deadline: they go through a second session,
+    without retries, so that a call given up on doesn't keep retrying
+    in the background.
+
+    Calls are rate limited on our side, so that bursts (of page loads,
+    of submissions) don't trip the API's throttling: reads (GET) and
+    writes (POST) each go through their own TokenBucket. When the API
+    is down or struggling, a CircuitBreaker turns the calls down right
+    away for a while, rather than having each of them wait on it.
+
+    Optionally, slow reads are hedged (see HedgingPolicy): a duplicate
+    GET is sent, and the first answer wins. GETs are idempotent, so
+    this is safe; POSTs are never hedged.
+
+        base_url : str = UNBABEL_API_URL
+            Root URL of the API. Paths passed to get/post are joined
+            to it.
+        pool_size : int = 10
+            Maximum number of keep-alive connections kept open to
+            the API host, per session.
+        connect_timeout : float = 3.05
+            Seconds to wait for a connection to be established.
+        read_timeout : float = 10
+            Seconds to wait between bytes received from the API.
+        retries : int = 2
+            Number of retries for idempotent requests.
+        backoff_factor : float = 0.2
+            Backoff factor between retries, as used by urllib3.
+        read_rate, write_rate : float = 20, 5
+            Reads and writes per second. None for no limit.
+        read_burst, write_burst : float = None
+            Capacity of the read and write buckets. Default to their
+            rate.
+        rate_limit_wait : float = 10
+            Seconds a call waits for its rate limit at most, unless
+            the call says otherwise.
+        breaker_failure_rate, breaker_slow_call, breaker_slow_rate,
+        breaker_minimum_calls, breaker_cooldown
+            failure_rate, slow_call, slow_rate, minimum_calls and
+            cooldown of the CircuitBreaker. Its defaults if None.
+        hedge_percentile : float = None
+            Hedge the reads slower than this percentile of the recent
+            reads. No hedging if None.
+        hedge_max_rate : float = 0.1
+            Hedges per read, at most.
+
+        method get
+            Send a GET request and return the decoded JSON body.
+
+        method post
+            Send a POST request with a JSON body and return the
+            decoded JSON body.
+
+        method close
+            Close the session and every pooled connection.
+
+        method stats
+            Return the counters of the client.
+    """
+
+    def __init__(self, base_url=UNBABEL_API_URL, pool_size=10,
+                 connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff_factor=0.2, read_rate=20, read_burst=None,
+                 write_rate=5, write_burst=None, rate_limit_wait=10,
+                 breaker_failure_rate=None, breaker_slow_call=None,
+                 breaker_slow_rate=None, breaker_minimum_calls=None,
+                 breaker_cooldown=None, hedge_percentile=None, hedge_max_rate=0.1):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.read_bucket = TokenBucket(read_rate, read_burst)
+        self.write_bucket = TokenBucket(write_rate, write_burst)
+        self.rate_limit_wait = rate_limit_wait
+        breaker_settings = {
+            'failure_rate': breaker_failure_rate,
+            'slow_call': breaker_slow_call,
+            'slow_rate': breaker_slow_rate,
+            'minimum_calls': breaker_minimum_calls,
+            'cooldown': breaker_cooldown,
+        }
+        self.breaker = CircuitBreaker(**{name: value for name, value in breaker_settings.items()
+                                         if value is not None})
+        self.hedging = None
+        self._hedging_executor = None
+        if hedge_percentile is not None:
+            self.hedging = HedgingPolicy(hedge_percentile, hedge_max_rate)
+            # Each hedged read runs with its hedge, off the calling thread
+            self._hedging_executor = ThreadPoolExecutor(
+                max_workers=2 * pool_size, thread_name_prefix='unbabel-read')
+
+        # urllib3 only retries idempotent methods by default, so POSTs
+        # to '/translation' are left alone
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Requests with a deadline are tried once, the deadline is up to
+        # the caller
+        no_retry_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                       max_retries=Retry(total=0, raise_on_status=False))
+        self._deadline_session = requests.Session()
+        self._deadline_session.mount('https://', no_retry_adapter)
+        self._deadline_session.mount('http://', no_retry_adapter)
+
+    def _request(self, method, path, headers, timeout=None, wait=None, deadline=None,
+                 on_send=None, **kwargs):
+        """
+        Send a request through the pooled session and return the
+        decoded JSON body, once the circuit breaker and the rate limit
+        of its method allow. on_send, if given, is called (without
+        arguments) right before the request is sent.
+
+        With a deadline, neither the wait for the rate limit nor the
+        connect and read timeouts go past it, and the request is sent
+        once, without retries.
+
+        Connection errors, timeouts, throttling (429) and server errors
+        (5xx) count as failures for the circuit breaker; other errors
+        (e.g. an unknown UID) come from a working API. A timeout cut
+        short by the deadline only tells the API is slower than the
+        caller can wait for, so it isn't recorded at all.
+
+            Raises
+                DeadlineExceeded
+                    When the deadline is already past, or the request
+                    timed out on a timeout cut short by the deadline.
+                CircuitOpen
+                    When the circuit breaker turns the request down.
+                RateLimitExceeded
+                    When the rate limit doesn't allow the request
+                    within wait seconds (or before the deadline).
+                UnbabelAPIError
+                    When the request could not be completed (connection
+                    error, timeout) or the API answered with a non-OK
+                    HTTP status.
+        """
+
+        if wait is None:
+            wait = self.rate_limit_wait
+
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded('No time left to call the Unbabel API')
+            wait = min(wait, remaining) if wait is not None else remaining
+
+        self.breaker.allow()
+
+        bucket = self.read_bucket if method == 'GET' else self.write_bucket
+        try:
+            bucket.acquire(wait)
+        except RateLimitExceeded:
+            self.breaker.cancel()
+            raise
+
+        if on_send is not None:
+            on_send()
+
+        timeout = timeout or self.timeout
+        # Which of the (connect, read) timeouts the deadline cut short
+        shortened = (False, False)
+        if deadline is not None:
+            # The wait for the rate limit took some of the time left
+            remaining = max(0.001, deadline - time.monotonic())
+            parts = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            shortened = tuple(part is None or part > remaining for part in parts)
+            timeout = tuple(remaining if cut else part
+                            for part, cut in zip(parts, shortened))
+
+        started = time.monotonic()
+        # None when the outcome says nothing of the API's health
+        failed = True
+        session = self.session if deadline is None else self._deadline_session
+        try:
+            response = session.request(
+                method, self.base_url + path, headers=headers,
+                timeout=timeout, **kwargs)
+            failed = response.status_code == 429 or response.status_code >= 500
+            # Did anything go wrong?
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            timed_out = _timed_out(exc)
+            if timed_out is not None and shortened[timed_out]:
+                failed = None
+                raise DeadlineExceeded(
+                    'The Unbabel API didn\'t answer before the deadline: {}'.format(exc))
+            raise UnbabelAPIError(exc)
+        finally:
+            latency = time.monotonic() - started
+            if failed is None:
+                self.breaker.cancel()
+            else:
+                self.breaker.record(latency, failed)
+
+        if method == 'GET' and self.hedging is not None:
+            self.hedging.observe(latency)
+
+        # We're scot-free
+        return response.json()
+
+    def get(self, path, headers, timeout=None, wait=None, deadline=None):
+        """
+        Send a GET request to base_url + path.
+
+            path : str
+                Path relative to the API root.
+            headers : dict
+                Request headers, including Authorization.
+            timeout : float | (float, float) = None
+                Per-call timeout. Defaults to the client's
+                (connect, read) timeout.
+            wait : float = None
+                Seconds to wait for the read rate limit at most, 0 to
+                fail fast. Defaults to the client's rate_limit_wait.
+            deadline : float = None
+                time.monotonic() time the call must be done by.
+
+            Returns : dict
+                Decoded JSON body of the response.
+
+            Raises
+                DeadlineExceeded
+                    When the deadline is already past.
+                CircuitOpen
+                    When the circuit breaker turns the call down.
+                RateLimitExceeded
+                    When the rate limit doesn't allow the call in time.
+                UnbabelAPIError
+                    When the call or request to the Unbabel API fails.
+        """
+
+        if self.hedging is None:
+            return self._request('GET', path, headers, timeout=timeout, wait=wait,
+                                 deadline=deadline)
+
+        return self._hedged_get(path, headers, timeout, wait, deadline)
+
+    def _hedged_get(self, path, headers, timeout, wait, deadline):
+        """
+        Send a GET request, and a duplicate if it is slow to answer
+        (see HedgingPolicy). The first successful answer wins; the
+        other request is left to finish on its own. The hedge never
+        waits for the rate limit, and isn't sent when the circuit
+        breaker or the rate limit turn it down.
+
+        The delay runs from when the request is sent, not from when it
+        starts waiting for the rate limit.
+
+            Raises
+                UnbabelAPIError
+                    The error of the first request, when neither
+                    answered successfully.
+        """
+
+        delay = self.hedging.delay()
+        primary_sent = threading.Event()
+        primary = self._hedging_executor.submit(
+            self._request, 'GET', path, headers, timeout=timeout, wait=wait,
+            deadline=deadline, on_send=primary_sent.set)
+
+        if delay is None:
+            return primary.result()
+
+        # Also done waiting when it fails before being sent
+        primary.add_done_callback(lambda _: primary_sent.set())
+        primary_sent.wait()
+
+        if wait_futures([primary], timeout=delay).done or not self.hedging.try_hedge():
+            return primary.result()
+
+        hedge_sent = threading.Event()
+
+        def send_hedge():
+            hedge_sent.set()
+            self.hedging.record_sent()
+
+        hedge = self._hedging_executor.submit(
+            self._request, 'GET', path, headers, timeout=timeout, wait=0,
+            deadline=deadline, on_send=send_hedge)
+        # A hedge turned down by the circuit breaker or the rate limit
+        # costs nothing
+        hedge.add_done_callback(
+            lambda _: hedge_sent.is_set() or self.hedging.refund())
+        pending = {primary, hedge}
+
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.hedging.record_win()
+                    return future.result()
+
+        # Both failed, the hedge's error (e.g. its rate limit) matters less
+        return primary.result()
+
+    def post(self, path, headers, body, timeout=None, wait=None, deadline=None):
+        """
+        Send a POST request to base_url + path with a JSON body.
+
+            path : str
+                Path relative to the API root.
+            headers : dict
+                Request headers, including Authorization.
+            body : dict
+                Serialized as the JSON body of the request.
+            timeout : float | (float, float) = None
+                Per-call timeout. Defaults to the client's
+                (connect, read) timeout.
+            wait : float = None
+                Seconds to wait for the write rate limit at most, 0 to
+                fail fast. Defaults to the client's rate_limit_wait.
+            deadline : float = None
+                time.monotonic() time the call must be done by.
+
+            Returns : dict
+                Decoded JSON body of the response.
+
+            Raises
+                DeadlineExceeded
+                    When the deadline is already past.
+                CircuitOpen
+                    When the circuit breaker turns the call down.
+                RateLimitExceeded
+                    When the rate limit doesn't allow the call in time.
+                UnbabelAPIError
+                    When the call or request to the Unbabel API fails.
+        """
+
+        return self._request('POST', path, headers, timeout=timeout,
+                             wait=wait, deadline=deadline, json=body)
+
+    def close(self):
+        """Close the sessions and every pooled connection."""
+        if self._hedging_executor is not None:
+            self._hedging_executor.shutdown(wait=False)
+        self.session.close()
+        self._deadline_session.close()
+
+    def stats(self):
+        """
+        Return the counters of the client.
+
+            Returns : dict
+                {"rate_limits": {"read": {...}, "write": {...}},
+                 "circuit_breaker": {...}, "hedging": {...}}, with the
+                stats of each bucket (see TokenBucket.stats), of the
+                breaker (see CircuitBreaker.stats) and of the hedging
+                policy (see HedgingPolicy.stats; None if reads aren't
+                hedged).
+        """
+
+        return {'rate_limits': {'read': self.read_bucket.stats(),
+                                'write': self.write_bucket.stats()},
+                'circuit_breaker': self.breaker.stats(),
+                'hedging': self.hedging.stats() if self.hedging is not None else None}
+
+
+_client = None
+_client_settings = None
+_client_lock = threading.Lock()
+
+
+def _timed_out(exc):
+    """
+    Private function that tells which timeout a failed request ran
+    into. Through the retrying adapter, timeouts come as connection
+    errors wrapping urllib3's MaxRetryError, so its reason is checked
+    too.
+
+        exc : requests.RequestException
+
+        Returns : int or None
+            0 for the connect timeout, 1 for the read timeout, None if
+            the request didn't time out.
+    """
+
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, 'reason', reason)
+
+    if isinstance(exc, requests.ConnectTimeout) or isinstance(reason, ConnectTimeoutError):
+        return 0
+    if isinstance(exc, requests.Timeout) or isinstance(reason, ReadTimeoutError):
+        return 1
+    return None
+
+
+def get_client(unbabel_config=None):
+    """
+    Return the process-wide UnbabelClient.
+
+    The client is built on first use and then shared by every call (and
+    every thread) in the process, so its connection pool stays warm.
+    It is only rebuilt if the client settings in the config change.
+
+        unbabel_config : UnbabelConfig = None
+            Config to build the client from. Loaded from the config
+            file if not given.
+
+        Returns : UnbabelClient
+
+        Raises
+            UnbabelAPIError
+                When the config has to be loaded and fails to.
+    """
+
+    global _client, _client_settings
+
+    if unbabel_config is None:
+        unbabel_config = _get_config()
+
+    settings = unbabel_config.client_settings
+
+    with _client_lock:
+        if _client is None or settings != _client_settings:
+            if _client is not None:
+                _client.close()
+            _client = UnbabelClient(**dict(settings))
+            _client_settings = settings
+
+        return _client
+
+
+def reset_client():
+    """Close the process-wide UnbabelClient and forget it."""
+
+    global _client, _client_settings
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_settings = None
+
+
+def get_client_stats():
+    """
+    Return the counters of the process-wide UnbabelClient, without
+    building it.
+
+        Returns : dict
+            See UnbabelClient.stats. None if the client wasn't built
+            yet.
+    """
+
+    client = _client
+    return client.stats() if client is not None else None
+
+
+def is_available():
+    """
+    Tell if calls to the Unbabel API would be let through by the
+    circuit breaker of the process-wide UnbabelClient, without calling
+    it. Callers use it to skip (or fail) early while the API is down.
+
+        Returns : bool
+            False while the circuit is open. True if the client wasn't
+            built yet.
+    """
+
+    client = _client
+    return client is None or client.breaker.state != CircuitBreaker.OPEN
+
+
 def _load_config(path='unbabelapi.yaml'):
     """
-    Returns the configuration values to access the Unbabel API.
+    Returns the configuration values to access the Unbabel API. The
+    file is parsed once, and only parsed again when it is modified or
+    replaced on disk (or after config.reload_config_files()).
 
         path : str = 'unbabelapi.yaml'
             Path to the YAML configuration file. Defaults to the
             default configuration file.
 
-        Returns : dict
-            Dictionary of config keys and their values
+        Returns : UnbabelConfig
+            Frozen config, with the request headers already built.
 
         Raises
             FileNotFoundError
@@ -54,39 +1164,30 @@ def _load_config(path='unbabelapi.yaml'):
             yaml.YAMLError
                 When the file being read isn't a valid YAML file or
                 has syntax errors.
+            KeyError
+                When a required config key is missing.
     """
 
-    with open(path, 'r') as config_file:
-        return yaml.safe_load(config_file)
+    return cached_yaml_file(path, UnbabelConfig.from_dict).load()
 
 
-def request_language_pairs():
+def _get_config():
     """
-    Sends a GET request to the '/language_pair' Unbabel API endpoint
-    and retrieves a list of the possible combinations for source and
-    target languages for translation requests.
+    Returns the UnbabelConfig, translating config errors into
+    UnbabelAPIError.
 
-        Returns : dict
-            If UnbabelAPIError is not raised, the returned dict will
-            have a key 'objects' that holds a list of 'lang_pair'
-            dicts representing the source and target languages
-            available.
+        Returns : UnbabelConfig
 
         Raises
             UnbabelAPIError
-                When the call or request to the Unbabel API fails.
+                When the config file can't be read or parsed, or is
+                missing a required key.
     """
 
     try:
-        unbabel_config = _load_config()
-    except (FileNotFoundError, yaml.YAMLError) as exc:
+        return _load_config()
+    except (FileNotFoundError, yaml.YAMLError, TypeError) as exc:
         raise UnbabelAPIError('API Service Config File Error: {}'.format(exc))
-
-    try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': 'ApiKey {UNBABEL_USERNAME}:{UNBABEL_API_KEY}'.format(**unbabel_config)
-        }
     # Instead of a default value, that will result in a 401 response,
     # explicitly warn the user they're missing a config key and tell
     # them which one
@@ -94,20 +1195,37 @@ def request_language_pairs():
         raise UnbabelAPIError(
             'API Service Config Value Missing: {}'.format(exc))
 
-    response = requests.get(
-        'https://sandbox.unbabel.com/tapi/v2/language_pair/', headers=headers)
 
-    # Did anything go wrong?
-    try:
-        response.raise_for_status()
-    except requests.HTTPError as exc:
-        raise UnbabelAPIError(exc)
+def request_language_pairs(wait=None):
+    """
+    Sends a GET request to the '/language_pair' Unbabel API endpoint
+    and retrieves a list of the possible combinations for source and
+    target languages for translation requests.
+
+        wait : float = None
+            Seconds to wait for the rate limit at most, 0 to fail fast.
+            Defaults to the UNBABEL_RATE_LIMIT_WAIT config key (10).
+
+        Returns : dict
+            If UnbabelAPIError is not raised, the returned dict will
+            have a key 'objects' that holds a list of 'lang_pair'
+            dicts representing the source and target languages
+            available.
+
+        Raises
+            RateLimitExceeded
+                When the rate limit doesn't allow the call in time.
+            UnbabelAPIError
+                When the call or request to the Unbabel API fails.
+    """
+
+    unbabel_config = _get_config()
 
-    # We're scot-free
-    return response.json()
+    return get_client(unbabel_config).get(
+        'language_pair/', unbabel_config.headers, wait=wait)
 
 
-def request_translation(source_lang, target_lang, text):
+def request_translation(source_lang, target_lang, text, wait=None):
     """
     Sends a POST request to the '/translation' Unbabel API endpoint,
     specifying the correct Authorization header format, and the
@@ -119,6 +1237,9 @@ def request_translation(source_lang, target_lang, text):
             Language code of the translation.
         text : str
             Text to the translated.
+        wait : float = None
+            Seconds to wait for the rate limit at most, 0 to fail fast.
+            Defaults to the UNBABEL_RATE_LIMIT_WAIT config key (10).
 
         Returns : dict
             If UnbabelAPIError is not raised, the returned dict will
@@ -126,26 +1247,13 @@ def request_translation(source_lang, target_lang, text):
             the Unbabel API.
 
         Raises
+            RateLimitExceeded
+                When the rate limit doesn't allow the call in time.
             UnbabelAPIError
                 When the call or request to the Unbabel API fails.
     """
 
-    try:
-        unbabel_config = _load_config()
-    except (FileNotFoundError, yaml.YAMLError) as exc:
-        raise UnbabelAPIError('API Service Config File Error: {}'.format(exc))
-
-    try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': 'ApiKey {UNBABEL_USERNAME}:{UNBABEL_API_KEY}'.format(**unbabel_config)
-        }
-    # Instead of a default value, that will result in a 401 response,
-    # explicitly warn the user they're missing a config key and tell
-    # them which one
-    except KeyError as exc:
-        raise UnbabelAPIError(
-            'API Service Config Value Missing: {}'.format(exc))
+    unbabel_config = _get_config()
 
     body = {
         'text': text,
@@ -154,20 +1262,11 @@ def request_translation(source_lang, target_lang, text):
         'text_format': 'text'
     }
 
-    response = requests.post(
-        'https://sandbox.unbabel.com/tapi/v2/translation/', json=body, headers=headers)
+    return get_client(unbabel_config).post(
+        'translation/', unbabel_config.headers, body, wait=wait)
 
-    # Did anything go wrong?
-    try:
-        response.raise_for_status()
-    except requests.HTTPError as exc:
-        raise UnbabelAPIError(exc)
 
-    # We're scot-free
-    return response.json()
-
-
-def request_translation_update(translationId):
+def request_translation_update(translationId, wait=None, deadline=None):
     """
     Sends a GET request to the '/translation/:uid' Unbabel API
     endpoint, specifying the correct Authorization header format,
@@ -175,6 +1274,12 @@ def request_translation_update(translationId):
 
         translationId : str
             List of translation request UIDs 
+        wait : float = None
+            Seconds to wait for the rate limit at most, 0 to fail fast.
+            Defaults to the UNBABEL_RATE_LIMIT_WAIT config key (10).
+        deadline : float = None
+            time.monotonic() time the call must be done by: the wait
+            and the timeouts are cut short to meet it.
 
         Returns : dict
             If UnbabelAPIError is not raised, the returned dict will
@@ -182,36 +1287,212 @@ def request_translation_update(translationId):
             returned by the Unbabel API.
 
         Raises
+            RateLimitExceeded
+                When the rate limit doesn't allow the call in time.
             UnbabelAPIError
                 When the call or request to the Unbabel API fails.
     """
 
-    try:
-        unbabel_config = _load_config()
-    except (FileNotFoundError, yaml.YAMLError) as exc:
-        raise UnbabelAPIError('API Service Config File Error: {}'.format(exc))
+    unbabel_config = _get_config()
 
-    try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': 'ApiKey {UNBABEL_USERNAME}:{UNBABEL_API_KEY}'.format(**unbabel_config)
-        }
-    # Instead of a default value, that will result in a 401 response,
-    # explicitly warn the user they're missing a config key and tell
-    # them which one
-    except KeyError as exc:
-        raise UnbabelAPIError(
-            'API Service Config Value Missing: {}'.format(exc))
+    return get_client(unbabel_config).get(
+        'translation/{}'.format(translationId), unbabel_config.headers, wait=wait,
+        deadline=deadline)
 
-    response = requests.get(
-        'https://sandbox.unbabel.com/tapi/v2/translation/{}'.format(
-            translationId), headers=headers)
 
-    # Did anything go wrong?
-    try:
-        response.raise_for_status()
-    except requests.HTTPError as exc:
-        raise UnbabelAPIError(exc)
+@dataclass(frozen=True)
+class LanguagePairs():
+    """
+    Frozen snapshot of the language pairs available through the Unbabel
+    API.
+
+        objects : tuple<dict>
+            The 'lang_pair' objects, as returned by the Unbabel API.
+        pairs : frozenset<(str, str)>
+            (source, target) shortnames of every available pair, for
+            O(1) validation.
+        fetched_at : float
+            Clock time at which the snapshot was fetched.
+        body : bytes
+            The objects serialized as a JSON array.
+        etag : str
+            Hash of the body. Stable across fetches for as long as the
+            pairs don't change.
+
+        classmethod from_response
+            Build a snapshot from the body returned by
+            request_language_pairs.
+
+        method is_available
+            Check if a source / target language pair is available.
+    """
+
+    objects: tuple
+    pairs: frozenset
+    fetched_at: float
+    body: bytes = b'[]'
+    etag: str = ''
+
+    @classmethod
+    def from_response(cls, response, fetched_at):
+        """
+        Build a snapshot from the body returned by request_language_pairs.
+
+            response : dict
+                Body returned by request_language_pairs.
+            fetched_at : float
+                Clock time at which the response was fetched.
+
+            Returns : LanguagePairs
+        """
+
+        objects = tuple(response.get('objects', []))
+        pairs = frozenset(
+            (language_pair['lang_pair']['source_language']['shortname'],
+             language_pair['lang_pair']['target_language']['shortname'])
+            for language_pair in objects)
+
+        # Serialized once per fetch, with sorted keys so the same pairs
+        # always hash to the same ETag
+        body = json.dumps(objects, sort_keys=True,
+                          separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+
+        return cls(objects=objects, pairs=pairs, fetched_at=fetched_at,
+                   body=body, etag=etag)
+
+    def is_available(self, source_language, target_language):
+        """
+        Check if a source / target language pair is available.
+
+            source_language : str
+                Shortname of the language of the text to be translated.
+            target_language : str
+                Shortname of the language of the translation.
+
+            Returns : bool
+        """
+
+        return (source_language, target_language) in self.pairs
+
+
+class LanguagePairCache():
+    """
+    Process-level cache of the language pairs available through the
+    Unbabel API. The list hardly ever changes, so it is fetched once
+    and kept for ttl seconds.
+
+    Once the ttl runs out, the cached (stale) snapshot keeps being
+    served while a background thread fetches a fresh one. If that fetch
+    fails, the stale snapshot is still served, and the fetch is tried
+    again after retry_interval seconds. Only when there is no snapshot
+    at all does a caller wait on (and see the errors of) the Unbabel
+    API.
+
+        ttl : float = 3600
+            Seconds a snapshot is served before being refreshed.
+        retry_interval : float = 60
+            Seconds to wait before retrying a failed refresh.
+        clock : callable = time.monotonic
+            Returns the current time, in seconds.
+
+        method get
+            Return the cached snapshot, fetching it if there is none
+            and refreshing it in the background if it is stale.
+
+        method refresh
+            Fetch a fresh snapshot and cache it, in the calling thread.
+
+        method clear
+            Forget the cached snapshot.
+    """
+
+    def __init__(self, ttl=3600, retry_interval=60, clock=time.monotonic):
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._snapshot = None
+        self._refreshing = False
+        self._retry_at = 0
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the cached language pairs.
+
+            Returns : LanguagePairs
+
+            Raises
+                UnbabelAPIError
+                    When there is no snapshot cached yet and the call
+                    to the Unbabel API fails.
+        """
+
+        snapshot = self._snapshot
+
+        if snapshot is None:
+            with self._lock:
+                # Another thread may have fetched it while we waited
+                if self._snapshot is None:
+                    self._snapshot = self._fetch()
+                return self._snapshot
+
+        if self._clock() - snapshot.fetched_at >= self.ttl:
+            self._revalidate()
+
+        return snapshot
+
+    def refresh(self):
+        """
+        Fetch a fresh snapshot and cache it, in the calling thread.
+
+            Returns : LanguagePairs
+
+            Raises
+                UnbabelAPIError
+                    When the call to the Unbabel API fails. The cached
+                    snapshot is left untouched.
+        """
+
+        snapshot = self._fetch()
+        self._snapshot = snapshot
+        return snapshot
+
+    def clear(self):
+        """Forget the cached snapshot."""
+        with self._lock:
+            self._snapshot = None
+            self._retry_at = 0
+
+    def _fetch(self):
+        """Fetch a snapshot from the Unbabel API."""
+        return LanguagePairs.from_response(
+            request_language_pairs(), self._clock())
+
+    def _revalidate(self):
+        """
+        Start a background refresh, unless one is already running or
+        the last one failed less than retry_interval seconds ago.
+        """
+
+        with self._lock:
+            if self._refreshing or self._clock() < self._retry_at:
+                return
+            self._refreshing = True
+
+        self._refresh_thread = threading.Thread(
+            target=self._background_refresh, daemon=True)
+        self._refresh_thread.start()
+
+    def _background_refresh(self):
+        """Refresh the snapshot, keeping the stale one if it fails."""
+        try:
+            self.refresh()
+        except UnbabelAPIError:
+            self._retry_at = self._clock() + self.retry_interval
+        finally:
+            self._refreshing = False
+
 
-    # We're scot-free
-    return response.json()
+language_pairs = LanguagePairCache()